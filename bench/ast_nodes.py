@@ -0,0 +1,73 @@
+"""Memory used by syntax tree nodes and the cost of dispatching on them
+
+usage: python -m bench.ast_nodes
+"""
+import io
+import pathlib
+import time
+import tracemalloc
+from contextlib import redirect_stdout
+
+from lox.error_handler import ErrorHandler
+from lox.interpreter import Interpreter
+from lox.parser_ import Parser
+from lox.resolver import Resolver
+from lox.scanner import Scanner
+
+# every benchmark program pasted together this many times
+COPIES = 200
+
+
+def count_nodes(node):
+    """Number of syntax tree nodes under (and including) node"""
+    if isinstance(node, (list, tuple)):
+        return sum(count_nodes(child) for child in node)
+    if not hasattr(node, "fields"):
+        return 0
+    return 1 + sum(count_nodes(getattr(node, f)) for f in node.fields)
+
+
+def parse(source):
+    tokens = Scanner(source=source, error_handler=ErrorHandler()).scan_tokens()
+    return Parser(tokens=tokens, error_handler=ErrorHandler()).parse()
+
+
+def main():
+    programs = sorted(pathlib.Path("bench").glob("*.lox"))
+    # each program goes in its own block so their variables don't clash
+    source = "\n".join(
+        "{\n" + p.read_text(encoding="utf-8") + "\n}" for p in programs
+    )
+    source = "\n".join([source] * COPIES)
+
+    tokens = Scanner(source=source, error_handler=ErrorHandler()).scan_tokens()
+    tracemalloc.start()
+    statements = Parser(tokens=tokens, error_handler=ErrorHandler()).parse()
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    nodes = count_nodes(statements)
+    print(f"nodes:            {nodes}")
+    print(f"memory:           {size / 1024 / 1024:.2f} MiB")
+    print(f"bytes per node:   {size / nodes:.1f}")
+
+    # the resolver visits every node once, so it's mostly dispatch
+    interpreter = Interpreter(error_handler=ErrorHandler())
+    start = time.perf_counter()
+    Resolver(interpreter=interpreter).resolve(*statements)
+    elapsed = time.perf_counter() - start
+    print(f"resolve:          {elapsed:.3f}s")
+    print(f"ns per node:      {elapsed / nodes * 1e9:.0f}")
+
+    # tree-walking dispatches on every node it evaluates
+    statements = parse((pathlib.Path("bench") / "loop.lox").read_text())
+    Resolver(interpreter=interpreter).resolve(*statements)
+    with redirect_stdout(io.StringIO()):
+        start = time.perf_counter()
+        interpreter.interperet(statements)
+        elapsed = time.perf_counter() - start
+    print(f"interpret loop:   {elapsed:.3f}s")
+
+
+if __name__ == "__main__":
+    main()
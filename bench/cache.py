@@ -0,0 +1,63 @@
+"""Startup time of a large script with its syntax tree cached in
+__loxcache__ and without
+
+usage: python -m bench.cache
+"""
+import pathlib
+import subprocess
+import sys
+import tempfile
+import time
+
+# functions in the generated script, which only calls one of them
+FUNCTIONS = 5_000
+# best of this many runs
+RUNS = 3
+
+
+def generate():
+    """Lox source that defines lots of functions and does little else, like
+    a job that loads a big library
+    """
+    lines = []
+    for i in range(FUNCTIONS):
+        lines.append(f"fun f{i}(a, b) {{")
+        lines.append(f"  var x = (a + {i}) * b - {i} / 2;")
+        lines.append(f"  if (x > {i}.5 and a != b) {{ return f{i}(x, b); }}")
+        lines.append("  for (var i = 0; i < a; i = i + 1) { x = x + i; }")
+        lines.append("  return x;")
+        lines.append("}")
+    lines.append("print f0(0, 1);")
+    return "\n".join(lines)
+
+
+def run(script, *args):
+    """Seconds it takes to run script in a new interpreter process"""
+    start = time.perf_counter()
+    subprocess.run(
+        [sys.executable, "main.py", str(script), *args],
+        check=True,
+        stdout=subprocess.DEVNULL,
+    )
+    return time.perf_counter() - start
+
+
+def main():
+    with tempfile.TemporaryDirectory() as directory:
+        script = pathlib.Path(directory) / "script.lox"
+        script.write_text(generate(), encoding="utf-8")
+        size = script.stat().st_size / 1e6
+        print(f"script:  {size:.2f} MB, {FUNCTIONS} functions")
+
+        cold = min(run(script, "--no-cache") for _ in range(RUNS))
+        # the first cached run saves the tree, and the rest load it
+        first = run(script)
+        warm = min(run(script) for _ in range(RUNS))
+
+    print(f"cold:    {cold:.3f}s")
+    print(f"saving:  {first:.3f}s")
+    print(f"warm:    {warm:.3f}s")
+
+
+if __name__ == "__main__":
+    main()
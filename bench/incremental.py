@@ -0,0 +1,81 @@
+"""Time it takes to remake the syntax tree of a 10,000 line script after a
+one character edit, from scratch and with an IncrementalProgram
+
+usage: python -m bench.incremental
+"""
+import random
+import time
+
+from lox.incremental import IncrementalProgram
+from lox.lox_ import Lox
+from lox.regex_scanner import RegexScanner
+
+# functions in the generated script, which have 5 lines each
+FUNCTIONS = 2_000
+# edits timed
+EDITS = 200
+
+
+def generate():
+    lines = []
+    for i in range(FUNCTIONS):
+        lines.append(f"fun f{i}(a, b) {{")
+        lines.append(f"  var x = (a + {i}) * b - {i} / 2;")
+        lines.append(f"  if (x > {i}.5 and a != b) {{ return f{i}(x, b); }}")
+        lines.append("  return x;")
+        lines.append("}")
+    return "\n".join(lines)
+
+
+def edits(source):
+    """One character edits (start, end, text) all through the source,
+    which keep it a valid program
+    """
+    rng = random.Random(0)
+    digits = [i for i, char in enumerate(source) if char.isdigit()]
+    for _ in range(EDITS):
+        position = rng.choice(digits)
+        if rng.random() < 0.5:
+            # change a digit
+            yield position, position + 1, str(rng.randrange(10))
+        else:
+            # add a blank line before the digit's line, which moves every
+            # line after it
+            line_start = source.rfind("\n", 0, position) + 1
+            yield line_start, line_start, "\n"
+
+
+def main():
+    source = generate()
+    lox = Lox(test=True)
+    print(f"script:       {len(source.splitlines())} lines")
+
+    start = time.perf_counter()
+    scanner = RegexScanner(source=source, error_handler=lox.error_handler)
+    lox.front_end(tokens=scanner.stream_tokens())
+    full = time.perf_counter() - start
+    print(f"from scratch: {full * 1000:.1f} ms")
+
+    program = IncrementalProgram(source=source, lox=lox)
+    elapsed = []
+    for start, end, text in edits(source):
+        before = time.perf_counter()
+        program.edit(start=start, end=end, text=text)
+        elapsed.append(time.perf_counter() - before)
+        # undo it, so every edit is to the same program
+        program.edit(
+            start=start, end=start + len(text), text=source[start:end]
+        )
+
+    elapsed.sort()
+    print(
+        f"incremental:  {sum(elapsed) / len(elapsed) * 1000:.2f} ms "
+        f"(median {elapsed[len(elapsed) // 2] * 1000:.2f} ms, "
+        f"slowest {elapsed[-1] * 1000:.2f} ms)"
+    )
+    if program.had_error or program.source != source:
+        print("the edits broke the program")
+
+
+if __name__ == "__main__":
+    main()
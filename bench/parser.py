@@ -0,0 +1,55 @@
+"""Throughput of the Parser on a large script, in tokens and MB of source
+a second
+
+usage: python -m bench.parser
+"""
+import pathlib
+import time
+
+from lox.error_handler import ErrorHandler
+from lox.parser_ import Parser
+from lox.regex_scanner import RegexScanner
+
+# every benchmark program pasted together this many times
+COPIES = 100
+# generated lines full of expressions added to them
+EXPRESSIONS = 20_000
+# best of this many runs
+RUNS = 3
+
+
+def generate():
+    """Lox source with the kinds of expressions programs are made of"""
+    lines = []
+    for i in range(EXPRESSIONS):
+        lines.append(
+            f"var v{i} = a.b[{i}] + f(x, -y * 2, \"s\") / (c - {i}) "
+            f"<= d or !e and g == nil;"
+        )
+    return "\n".join(lines)
+
+
+def main():
+    programs = sorted(pathlib.Path("bench").glob("*.lox"))
+    source = "\n".join(p.read_text(encoding="utf-8") for p in programs)
+    source = "\n".join([source] * COPIES + [generate()])
+    size = len(source.encode("utf-8")) / 1e6
+
+    scanner = RegexScanner(source=source, error_handler=ErrorHandler())
+    tokens = scanner.scan_tokens()
+    print(f"source:  {size:.2f} MB, {len(tokens)} tokens")
+
+    elapsed = float("inf")
+    for _ in range(RUNS):
+        start = time.perf_counter()
+        Parser(tokens=tokens, error_handler=ErrorHandler()).parse()
+        elapsed = min(elapsed, time.perf_counter() - start)
+
+    print(
+        f"parser:  {len(tokens) / elapsed / 1e6:.2f} M tokens/s, "
+        f"{size / elapsed:.2f} MB/s"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,52 @@
+"""Throughput of the Scanner and the RegexScanner, in MB of source a second
+
+usage: python -m bench.scanner
+"""
+import pathlib
+import time
+
+from lox.error_handler import ErrorHandler
+from lox.regex_scanner import RegexScanner
+from lox.scanner import Scanner
+
+# every benchmark program and test pasted together this many times
+COPIES = 20
+# best of this many runs of each scanner
+RUNS = 3
+
+
+def scan(scanner, source):
+    """Returns the tokens scanner makes of source and how long it took"""
+    start = time.perf_counter()
+    tokens = scanner(source=source, error_handler=ErrorHandler()).scan_tokens()
+    return tokens, time.perf_counter() - start
+
+
+def main():
+    programs = sorted(pathlib.Path("bench").glob("*.lox")) + sorted(
+        path for path in pathlib.Path("test").rglob("*.lox")
+        # tests of scanning errors would print them
+        if "Error" not in path.read_text(encoding="utf-8")
+    )
+    source = "\n".join(p.read_text(encoding="utf-8") for p in programs)
+    source = "\n".join([source] * COPIES)
+    size = len(source.encode("utf-8")) / 1e6
+    print(f"source:           {size:.2f} MB")
+
+    results = {}
+    for scanner in (Scanner, RegexScanner):
+        tokens, elapsed = min(
+            (scan(scanner, source) for _ in range(RUNS)),
+            key=lambda result: result[1],
+        )
+        results[scanner] = [
+            (t.type, t.lexeme, t.literal, t.line) for t in tokens
+        ]
+        print(f"{scanner.__name__ + ':':<18}{size / elapsed:.2f} MB/s")
+
+    if results[Scanner] != results[RegexScanner]:
+        print("the scanners made different tokens")
+
+
+if __name__ == "__main__":
+    main()
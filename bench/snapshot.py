@@ -0,0 +1,67 @@
+"""Time it takes to get an interpreter to the state a large prelude leaves it
+in, by running the prelude and by loading a snapshot of it
+
+usage: python -m bench.snapshot
+"""
+import pathlib
+import tempfile
+import time
+
+from lox.lox_ import Lox
+from lox.snapshot import load_snapshot, save_snapshot
+
+# classes and functions the generated prelude defines
+CLASSES = 500
+FUNCTIONS = 2_000
+# instances the prelude makes and keeps in a linked list
+INSTANCES = 20_000
+
+
+def generate():
+    """Lox prelude with lots of definitions and some data, like a library
+    that builds tables when it's loaded
+    """
+    lines = []
+    for i in range(CLASSES):
+        lines.append(f"class C{i} {{")
+        lines.append(f"  init(x) {{ this.x = x; this.y = x * {i}; }}")
+        lines.append("  sum() { return this.x + this.y; }")
+        lines.append("}")
+    for i in range(FUNCTIONS):
+        lines.append(f"fun f{i}(a) {{ var b = a + {i}; return b * b; }}")
+    lines.append("class Node { init(value, next) {")
+    lines.append("  this.value = value; this.next = next; } }")
+    lines.append("var table = nil;")
+    lines.append(f"for (var i = 0; i < {INSTANCES}; i = i + 1) {{")
+    lines.append(f"  table = Node(C{CLASSES - 1}(i), table);")
+    lines.append("}")
+    return "\n".join(lines)
+
+
+def main():
+    prelude = generate()
+    with tempfile.TemporaryDirectory() as directory:
+        path = pathlib.Path(directory) / "prelude.snapshot"
+
+        start = time.perf_counter()
+        lox = Lox(test=True)
+        lox.run(source=prelude)
+        print(f"running prelude:  {time.perf_counter() - start:.3f}s")
+
+        save_snapshot(interpreter=lox.interpreter, path=path)
+        size = path.stat().st_size / 1e6
+
+        start = time.perf_counter()
+        lox = Lox(test=True)
+        load_snapshot(interpreter=lox.interpreter, path=path)
+        print(
+            f"loading snapshot: {time.perf_counter() - start:.3f}s "
+            f"({size:.1f} MB)"
+        )
+
+        # the loaded interpreter carries on like the one that ran it
+        lox.run(source="print table.value.sum() + f1(1);")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,63 @@
+"""Peak memory used parsing a large generated script, with the tokens scanned
+into a list first and streamed into the parser
+
+usage: python -m bench.token_memory
+"""
+import gc
+import tracemalloc
+
+from lox.error_handler import ErrorHandler
+from lox.parser_ import Parser
+from lox.regex_scanner import RegexScanner
+
+# functions in the generated script
+FUNCTIONS = 10_000
+
+
+def generate():
+    """Lox source with lots of small functions, like generated code has"""
+    lines = []
+    for i in range(FUNCTIONS):
+        lines.append(f"fun f{i}(a, b) {{")
+        lines.append(f"  var x = (a + {i}) * b - \"s{i}\";")
+        lines.append(f"  if (x > {i}.5) {{ return f{i}(x, b); }}")
+        lines.append("  return nil;")
+        lines.append("}")
+    return "\n".join(lines)
+
+
+def parse_list(source):
+    scanner = RegexScanner(source=source, error_handler=ErrorHandler())
+    tokens = scanner.scan_tokens()
+    return Parser(tokens=tokens, error_handler=ErrorHandler()).parse()
+
+
+def parse_stream(source):
+    scanner = RegexScanner(source=source, error_handler=ErrorHandler())
+    tokens = scanner.stream_tokens()
+    return Parser(tokens=tokens, error_handler=ErrorHandler()).parse()
+
+
+def measure(parse, source):
+    """Peak memory allocated by a parse, not counting the source"""
+    gc.collect()
+    tracemalloc.start()
+    statements = parse(source)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del statements
+    return peak
+
+
+def main():
+    source = generate()
+    size = len(source.encode("utf-8")) / 1e6
+    print(f"source:      {size:.2f} MB, {len(source.splitlines())} lines")
+
+    for name, parse in (("list", parse_list), ("stream", parse_stream)):
+        peak = measure(parse, source)
+        print(f"{name + ':':<13}{peak / 1e6:.1f} MB peak")
+
+
+if __name__ == "__main__":
+    main()
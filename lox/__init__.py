@@ -1,15 +1,32 @@
 import sys
 
+from .adaptive_interpreter import *
+from .cache import *
 from .callable_ import *
+from .chunk import *
+from .closure_interpreter import *
+from .compiler import *
 from .environment import *
 from .error_handler import *
 from .exceptions import *
 from .expr import *
+from .incremental import *
 from .interpreter import *
 from .lox_ import *
+from .natives import *
+from .optimizer import *
 from .parser_ import *
+from .regex_scanner import *
 from .resolver import *
+from .rope import *
 from .scanner import *
+from .shape import *
+from .snapshot import *
+from .stack_interpreter import *
 from .stmt import *
+from .tiered_interpreter import *
 from .token_ import *
 from .token_type import *
+from .transpiler import *
+from .type_checker import *
+from .vm import *
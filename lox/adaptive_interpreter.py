@@ -0,0 +1,183 @@
+import operator
+import sys
+from collections import Counter
+
+from . import expr as Expr
+from .interpreter import UNCHECKED_OPERATIONS, Interpreter
+from .rope import STRINGS, Rope, concat
+from .token_type import (
+    MINUS, PLUS, SLASH, STAR, BANG_EQUAL, EQUAL_EQUAL, GREATER, GREATER_EQUAL,
+    LESS, LESS_EQUAL,
+)
+
+
+# times a binary expression runs before it's specialized, so ones that only
+# run a few times aren't rewritten, and ones whose operand types change
+# early on are never specialized
+WARMUP = 8
+
+# type of operand that each Python type of Lox value is specialized as
+OPERAND_TYPES = {float: float, str: str, Rope: str}
+# Python types of Lox numbers, like STRINGS for strings
+FLOATS = (float,)
+
+
+class SpecializedBinary(Expr.Binary):
+    """Binary expression rewritten for the type of operands it has seen
+
+    Each subclass has the Python types both operands have to be one of
+    (operands) and what to do with them when they are (operation).
+    """
+    __slots__ = ()
+    operands = ()
+    operation = None
+
+
+class GenericBinary(Expr.Binary):
+    """Binary expression that's given up on being specialized"""
+    __slots__ = ()
+
+
+class UncheckedBinary(Expr.Binary):
+    """Binary expression whose operand types the type checker has proven,
+    so there's nothing to check
+    """
+    __slots__ = ()
+
+
+def specialization(name, operands, operation):
+    return type(name, (SpecializedBinary,), {
+        "__slots__": (),
+        "operands": operands,
+        "operation": staticmethod(operation),
+    })
+
+
+# specialized forms of binary expressions by operator and operand type
+SPECIALIZATIONS = {
+    (PLUS, float): specialization("FloatAdd", FLOATS, operator.add),
+    (MINUS, float): specialization("FloatSubtract", FLOATS, operator.sub),
+    (STAR, float): specialization("FloatMultiply", FLOATS, operator.mul),
+    (SLASH, float): specialization("FloatDivide", FLOATS, operator.truediv),
+    (GREATER, float): specialization("FloatGreater", FLOATS, operator.gt),
+    (GREATER_EQUAL, float): specialization(
+        "FloatGreaterEqual", FLOATS, operator.ge
+    ),
+    (LESS, float): specialization("FloatLess", FLOATS, operator.lt),
+    (LESS_EQUAL, float): specialization("FloatLessEqual", FLOATS, operator.le),
+    (EQUAL_EQUAL, float): specialization("FloatEqual", FLOATS, operator.eq),
+    (BANG_EQUAL, float): specialization("FloatNotEqual", FLOATS, operator.ne),
+    (PLUS, str): specialization("StringConcat", STRINGS, concat),
+    (EQUAL_EQUAL, str): specialization("StringEqual", STRINGS, operator.eq),
+    (BANG_EQUAL, str): specialization("StringNotEqual", STRINGS, operator.ne),
+}
+
+
+class AdaptiveInterpreter(Interpreter):
+    """Tree-walk interpreter whose binary expressions specialize themselves
+
+    Once a binary expression has run WARMUP times with the same types of
+    operands, and there's a specialization for them, it changes its class to
+    a SpecializedBinary. Dispatch is by class, so from then on it goes
+    straight to code that checks both operands are that type and applies
+    the operator, instead of going through every operator and type check.
+    If its operand types change while it warms up, or there's no
+    specialization for them, it changes its class to GenericBinary instead.
+
+    If the check fails the expression is deoptimized - it changes its class
+    to GenericBinary and uses the interpreter's usual binary from then on.
+
+    Expressions the type checker has proven (unchecked) aren't warmed up or
+    specialized, since they don't check their operands anyway. They change
+    their class to UncheckedBinary the first time they run, and just apply
+    the operator from then on.
+    """
+
+    def __init__(self, error_handler):
+        super().__init__(error_handler=error_handler)
+        # number of expressions specialized/deoptimized, by specialization
+        self.specialized = Counter()
+        self.deoptimized = Counter()
+        # number of expressions that were never specialized
+        self.generic = 0
+
+        self.exprs[GenericBinary] = super().binary
+        self.exprs[UncheckedBinary] = self.unchecked_binary
+        for specialized in SPECIALIZATIONS.values():
+            self.exprs[specialized] = self.specialized_binary
+
+    def binary(self, expr):
+        if expr.unchecked:
+            expr.__class__ = UncheckedBinary
+            self.specialized[UncheckedBinary.__name__] += 1
+            return self.unchecked_binary(expr)
+
+        left = self.evaluate(expr=expr.left)
+        right = self.evaluate(expr=expr.right)
+
+        specialized = None
+        operand = OPERAND_TYPES.get(left.__class__)
+        if operand is not None and operand is OPERAND_TYPES.get(
+            right.__class__
+        ):
+            specialized = SPECIALIZATIONS.get((expr.operator.type, operand))
+
+        # the node keeps its count and specialization while it warms up
+        if specialized is None or (
+            expr.runs and specialized is not expr.specialization
+        ):
+            expr.__class__ = GenericBinary
+            self.generic += 1
+        elif expr.runs + 1 < WARMUP:
+            expr.runs += 1
+            expr.specialization = specialized
+        else:
+            expr.__class__ = specialized
+            self.specialized[specialized.__name__] += 1
+
+        return self.binary_operation(
+            operator=expr.operator, left=left, right=right
+        )
+
+    def specialized_binary(self, expr):
+        exprs = self.exprs
+        left = exprs[expr.left.__class__](expr.left)
+        right = exprs[expr.right.__class__](expr.right)
+
+        operands = expr.operands
+        if left.__class__ in operands and right.__class__ in operands:
+            try:
+                return expr.operation(left, right)
+            except ZeroDivisionError:
+                # the usual binary reports it as a runtime error
+                pass
+        else:
+            self.deoptimized[expr.__class__.__name__] += 1
+            expr.__class__ = GenericBinary
+
+        return self.binary_operation(
+            operator=expr.operator, left=left, right=right
+        )
+
+    def unchecked_binary(self, expr):
+        exprs = self.exprs
+        left = exprs[expr.left.__class__](expr.left)
+        right = exprs[expr.right.__class__](expr.right)
+        return UNCHECKED_OPERATIONS[expr.operator.type](left, right)
+
+    def print_stats(self):
+        """Prints how many expressions were specialized and deoptimized"""
+        names = sorted(self.specialized.keys() | self.deoptimized.keys())
+        print(
+            f"{'specialization':<20}{'specialized':>12}{'deoptimized':>12}",
+            file=sys.stderr,
+        )
+        for name in names:
+            print(
+                f"{name:<20}{self.specialized[name]:>12}"
+                f"{self.deoptimized[name]:>12}",
+                file=sys.stderr,
+            )
+        print(
+            f"{'not specialized':<20}{self.generic:>12}", file=sys.stderr
+        )
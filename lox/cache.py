@@ -0,0 +1,101 @@
+import gc
+import hashlib
+import os
+import pathlib
+import pickle
+import sys
+
+
+# directory next to a script that its cached syntax tree is kept in
+CACHE_DIRECTORY = "__loxcache__"
+
+
+def without_gc(function, *args):
+    """Calls function with the garbage collector paused
+
+    Pickling a tree makes or visits hundreds of thousands of nodes, none of
+    them garbage, so collecting while it's going just wastes time.
+    """
+    enabled = gc.isenabled()
+    gc.disable()
+    try:
+        return function(*args)
+    finally:
+        if enabled:
+            gc.enable()
+
+
+def interpreter_version():
+    """Hash of every module of the interpreter
+
+    Cached trees are pickled instances of its classes, annotated by its
+    resolver, optimizer and type checker, so any change to it makes them
+    stale.
+    """
+    digest = hashlib.sha256()
+    for module in sorted(pathlib.Path(__file__).parent.glob("*.py")):
+        digest.update(module.name.encode("utf-8"))
+        digest.update(module.read_bytes())
+    return digest.hexdigest()
+
+
+class ProgramCache:
+    """Syntax tree of a script, kept on disk after it's been scanned, parsed,
+    resolved, optimized and type checked, like __pycache__ keeps bytecode
+
+    Each script and optimization level has one cache file, which starts with
+    a hash of the source, the optimization level and the interpreter. If the
+    hash doesn't match the one for the source being run, the file is stale
+    and is overwritten once the new tree has been made. The resolver keeps
+    its results on the nodes it resolves, so those are cached with the tree.
+
+    Loading a cache file unpickles it, so it should be no more writable than
+    the script is.
+    """
+    version = None
+
+    def __init__(self, script, optimize):
+        script = pathlib.Path(script)
+        self.optimize = optimize
+        level = f".opt-{optimize}" if optimize else ""
+        self.path = script.parent / CACHE_DIRECTORY / (
+            f"{script.name}.{sys.implementation.cache_tag}{level}.pickle"
+        )
+
+    def key(self, source):
+        if ProgramCache.version is None:
+            ProgramCache.version = interpreter_version()
+
+        digest = hashlib.sha256()
+        digest.update(ProgramCache.version.encode("utf-8"))
+        digest.update(str(self.optimize).encode("utf-8"))
+        digest.update(source.encode("utf-8"))
+        return digest.hexdigest()
+
+    def load(self, source):
+        """Cached statements for source, or None if they aren't cached"""
+        try:
+            with open(self.path, "rb") as f:
+                if pickle.load(f) != self.key(source):
+                    return None
+                return without_gc(pickle.load, f)
+        except Exception:
+            # missing, unreadable and corrupt cache files are all misses
+            return None
+
+    def store(self, source, statements):
+        """Caches the statements made from source, if it can"""
+        # written to a temporary file first, so a run reading the cache at the
+        # same time never sees half a file
+        temporary = self.path.with_name(f"{self.path.name}.{os.getpid()}.tmp")
+        try:
+            self.path.parent.mkdir(exist_ok=True)
+            with open(temporary, "wb") as f:
+                pickle.dump(self.key(source), f)
+                without_gc(
+                    pickle.dump, statements, f, pickle.HIGHEST_PROTOCOL
+                )
+            os.replace(temporary, self.path)
+        except (OSError, RecursionError, pickle.PicklingError):
+            # not being able to cache a script never stops it running
+            temporary.unlink(missing_ok=True)
@@ -1,10 +1,29 @@
 from time import time
 
-from .exceptions import Return, RuntimeException
+from .exceptions import RuntimeException
 from .environment import Environment
+from .shape import POLYMORPHIC_LIMIT, Shape
 
 INIT = "init"
 
+# statements complete with None normally and with the value being returned
+# after a return statement - a bare "return" or "return nil" can't use None,
+# so it completes with this instead
+RETURN_NIL = object()
+
+
+class TailCall:
+    """What a return statement completes with when it returns a call
+
+    The function being returned from makes the call once it has returned,
+    so a chain of calls in tail position uses a constant amount of stack.
+    """
+    __slots__ = ("function", "arguments")
+
+    def __init__(self, function, arguments):
+        self.function = function
+        self.arguments = arguments
+
 
 # simplifies checking if a variable is callable in the interpreter
 class LoxCallable:
@@ -51,26 +70,32 @@ class LoxFunction(LoxCallable):
         )
 
     def call(self, interpreter, arguments):
-        # define args in environment so they can be used while executing block
-        environment = Environment(enclosing=self.closure)
-        # don't need to check that the correct number of args are passed in -
-        # already checked in the interpreter
-        for param, arg in zip(self.declaration.params, arguments):
-            environment.define(name=param.lexeme, value=arg)
-
-        try:
-            interpreter.execute_block(
-                statements=self.declaration.body, environment=environment
+        function = self
+        while True:
+            # args are the first slots of the environment so they can be used
+            # while executing block. Don't need to check that the correct
+            # number of args are passed in - already checked in the interpreter
+            environment = Environment(enclosing=function.closure)
+            environment.values = arguments
+
+            completion = interpreter.execute_block(
+                statements=function.declaration.body, environment=environment
             )
-        except Return as r:
-            # always return instance when initializer is called, even if return
-            # is explicitly called
-            if self.is_initializer:
-                return self.closure.get_at(distance=0, name="this")
-            return r.value
 
-        if self.is_initializer:
-            return self.closure.get_at(distance=0, name="this")
+            # run a call in tail position in this loop instead of recursing
+            if completion.__class__ is not TailCall:
+                break
+            function = completion.function
+            arguments = completion.arguments
+
+        # always return instance when initializer is called, even if return
+        # is explicitly called. "this" is the only value in the environment
+        # made by bind
+        if function.is_initializer:
+            return function.closure.values[0]
+        if completion is RETURN_NIL:
+            return None
+        return completion
 
     def arity(self):
         return len(self.declaration.params)
@@ -83,56 +108,113 @@ class LoxClass(LoxCallable):
     def __init__(self, name, superclass, methods):
         self.name = name
         self.superclass = superclass
-        self.methods = methods
+
+        # copy the superclass's methods down (which already include its
+        # superclasses') so finding a method never walks the hierarchy
+        self.methods = {}
+        if superclass is not None:
+            self.methods.update(superclass.methods)
+        self.methods.update(methods)
+
+        self.initializer = self.methods.get(INIT)
+        # shape of instances that don't have any fields yet
+        self.shape = Shape(class_=self, indexes={})
 
     def call(self, interpreter, arguments):
         instance = LoxInstance(class_=self)
-        intializer = self.find_method(name=INIT)
-        if intializer is not None:
-            intializer.bind(instance=instance).call(
+        if self.initializer is not None:
+            self.initializer.bind(instance=instance).call(
                 interpreter=interpreter, arguments=arguments
             )
         return instance
 
     def arity(self):
-        initializer = self.find_method(name=INIT)
-        if initializer is None:
+        if self.initializer is None:
             return 0
-        return initializer.arity()
+        return self.initializer.arity()
 
     def find_method(self, name):
-        if name in self.methods:
-            return self.methods[name]
-        # traverse the inheritance hierarchy to find method
-        if self.superclass is not None:
-            return self.superclass.find_method(name=name)
-        return None
+        return self.methods.get(name)
 
     def __str__(self):
         return self.name
 
 
 class LoxInstance:
+    __slots__ = ("class_", "shape", "values", "bound_methods")
+
     def __init__(self, class_):
         self.class_ = class_
-        self.fields = {}
+        # field values are stored in the order the shape gives them
+        self.shape = class_.shape
+        self.values = []
+        # methods bound to this instance by get_method, made when first needed
+        self.bound_methods = None
 
-    def get(self, name):
-        if name.lexeme in self.fields:
-            return self.fields[name.lexeme]
+    def find(self, name, cache):
+        """Where a property is for this instance's shape, see Shape.lookup
+
+        cache is the inline cache of the expression accessing the property.
+        """
+        shape = self.shape
+        found = cache.get(shape)
+        if found is None:
+            found = shape.lookup(name=name.lexeme)
+            if found is None:
+                raise RuntimeException(
+                    token=name,
+                    message=f"Undefined property '{name.lexeme}'.",
+                )
+            if len(cache) < POLYMORPHIC_LIMIT:
+                cache[shape] = found
+
+        return found
+
+    def get(self, name, cache):
+        found = self.find(name=name, cache=cache)
+        if found.__class__ is int:
+            return self.values[found]
 
         # bind instance to method
-        method = self.class_.find_method(name=name.lexeme)
-        if method is not None:
-            return method.bind(instance=self)
+        return found.bind(instance=self)
 
-        raise RuntimeException(
-            token=name,
-            message=f"Undefined property '{name.lexeme}'.",
-        )
+    def get_method(self, name, cache):
+        """Like get, for a property that's called straight away
 
-    def set(self, name, value):
-        self.fields[name.lexeme] = value
+        The bound method is never seen by Lox code, so the same one can be
+        used for every call instead of binding the method again.
+        """
+        found = self.find(name=name, cache=cache)
+        if found.__class__ is int:
+            return self.values[found]
+
+        if self.bound_methods is None:
+            self.bound_methods = {}
+        bound = self.bound_methods.get(found)
+        if bound is None:
+            bound = self.bound_methods[found] = found.bind(instance=self)
+        return bound
+
+    def set(self, name, value, cache):
+        """cache is the inline cache of the Set expression
+
+        It holds the index of the field for shapes that already have it, and
+        the shape to move to for ones that don't.
+        """
+        shape = self.shape
+        found = cache.get(shape)
+        if found is None:
+            found = shape.indexes.get(name.lexeme)
+            if found is None:
+                found = shape.add(name=name.lexeme)
+            if len(cache) < POLYMORPHIC_LIMIT:
+                cache[shape] = found
+
+        if found.__class__ is int:
+            self.values[found] = value
+        else:
+            self.shape = found
+            self.values.append(value)
 
     def __str__(self):
         return self.class_.name + " instance"
@@ -0,0 +1,102 @@
+"""Bytecode for the virtual machine
+
+Instructions are stored in a flat list of ints. Every instruction is an opcode
+followed by its operands; constants, names and nested functions live in a
+per-chunk constant pool and are referenced by index.
+"""
+
+# push/pop values
+OP_CONSTANT = 0         # constant index
+OP_NIL = 1
+OP_TRUE = 2
+OP_FALSE = 3
+OP_POP = 4
+
+# variables
+OP_GET_LOCAL = 5        # stack slot
+OP_SET_LOCAL = 6        # stack slot
+OP_GET_GLOBAL = 7       # name constant index
+OP_DEFINE_GLOBAL = 8    # name constant index
+OP_SET_GLOBAL = 9       # name constant index
+OP_GET_UPVALUE = 10     # upvalue index
+OP_SET_UPVALUE = 11     # upvalue index
+OP_GET_PROPERTY = 12    # name constant index
+OP_SET_PROPERTY = 13    # name constant index
+OP_GET_SUPER = 14       # name constant index
+
+# operators
+OP_EQUAL = 15
+OP_NOT_EQUAL = 16
+OP_GREATER = 17
+OP_GREATER_EQUAL = 18
+OP_LESS = 19
+OP_LESS_EQUAL = 20
+OP_ADD = 21
+OP_SUBTRACT = 22
+OP_MULTIPLY = 23
+OP_DIVIDE = 24
+OP_NOT = 25
+OP_NEGATE = 26
+
+# statements and control flow
+OP_PRINT = 27
+OP_JUMP = 28            # absolute target
+OP_JUMP_IF_FALSE = 29   # absolute target, leaves the condition on the stack
+
+# functions and classes
+OP_CALL = 30            # argument count
+OP_INVOKE = 31          # name constant index, argument count
+OP_SUPER_INVOKE = 32    # name constant index, argument count
+# function constant index, then (is_local, index) for each upvalue
+OP_CLOSURE = 33
+OP_CLOSE_UPVALUE = 34
+OP_RETURN = 35
+OP_CLASS = 36           # name constant index
+OP_INHERIT = 37
+OP_METHOD = 38          # name constant index
+
+# bonus
+OP_ARRAY = 39           # number of elements
+OP_GET_INDEX = 40
+OP_SET_INDEX = 41
+
+
+class Chunk:
+    def __init__(self):
+        self.code = []
+        self.constants = []
+        # token responsible for each entry of code, used to report the same
+        # errors (and lines) as the tree-walk interpreter
+        self.tokens = []
+        # index of each constant that can be shared, see add_constant
+        self.constant_indexes = {}
+
+    def write(self, byte, token):
+        self.code.append(byte)
+        self.tokens.append(token)
+
+    def add_constant(self, value):
+        # numbers and strings (including names) that are used more than once
+        # share a constant
+        if isinstance(value, (float, str)):
+            if value not in self.constant_indexes:
+                self.constant_indexes[value] = len(self.constants)
+                self.constants.append(value)
+            return self.constant_indexes[value]
+
+        self.constants.append(value)
+        return len(self.constants) - 1
+
+
+class ObjFunction:
+    """A compiled Lox function: everything about a function but its closure"""
+    def __init__(self, name, arity=0):
+        self.name = name
+        self.arity = arity
+        self.upvalue_count = 0
+        self.chunk = Chunk()
+
+    def __str__(self):
+        if self.name is None:
+            return "<script>"
+        return f"<fn {self.name}>"
@@ -0,0 +1,665 @@
+from . import expr as Expr
+from .callable_ import (
+    INIT, RETURN_NIL, LoxCallable, LoxClass, LoxFunction, LoxInstance,
+    TailCall,
+)
+from .environment import Environment
+from .exceptions import NativeException, RuntimeException
+from .interpreter import (
+    UNCHECKED_OPERATIONS, Interpreter, check_element, check_index, is_equal,
+    is_truthy, stringify,
+)
+from .rope import STRINGS, concat
+from .token_type import (
+    MINUS, PLUS, SLASH, STAR, BANG, BANG_EQUAL, EQUAL_EQUAL, GREATER,
+    GREATER_EQUAL, LESS, LESS_EQUAL, OR,
+)
+
+
+class CompiledFunction(LoxFunction):
+    """LoxFunction whose body has already been compiled into a closure"""
+    def __init__(self, declaration, closure, body, is_initializer=False):
+        super().__init__(
+            declaration=declaration,
+            closure=closure,
+            is_initializer=is_initializer,
+        )
+        self.body = body
+
+    def bind(self, instance):
+        environment = Environment(enclosing=self.closure)
+        environment.define(name="this", value=instance)
+        return CompiledFunction(
+            declaration=self.declaration,
+            closure=environment,
+            body=self.body,
+            is_initializer=self.is_initializer,
+        )
+
+    def call(self, interpreter, arguments):
+        function = self
+        while True:
+            environment = Environment(enclosing=function.closure)
+            environment.values = arguments
+
+            completion = function.body(environment)
+
+            if completion.__class__ is not TailCall:
+                break
+            function = completion.function
+            arguments = completion.arguments
+
+        if function.is_initializer:
+            return function.closure.values[0]
+        if completion is RETURN_NIL:
+            return None
+        return completion
+
+
+class ClosureInterpreter(Interpreter):
+    """Compiles the resolved syntax tree into nested Python closures
+
+    Every node is visited once before running. Node-specific work (routing on
+    the node type, resolver depths, operator types, literal values) happens
+    while compiling, so running a closure only does the work that actually
+    depends on runtime values. Compiled statements and expressions take the
+    environment they run in as their only argument.
+    """
+    def __init__(self, error_handler):
+        super().__init__(error_handler=error_handler)
+        # how many blocks and functions the code being compiled is in - code
+        # that isn't in any defines globals by name rather than locals by slot
+        self.scope_depth = 0
+
+    def interperet(self, statements):
+        try:
+            program = self.compile_statements(statements)
+            program(self.environment)
+        except RuntimeException as e:
+            self.error_handler.runtime_error(error=e)
+
+    # # #
+    # # #   Statements
+    # # #
+    def compile_stmt(self, stmt):
+        """Routes statements to method for compiling"""
+        # Interpreter's tables route to the methods here, which override the
+        # ones that process nodes straight away
+        return self.stmts[stmt.__class__](stmt)
+
+    def compile_statements(self, statements):
+        """Compiles a list of statements that run one after another"""
+        runners = tuple(self.compile_stmt(stmt) for stmt in statements)
+
+        if len(runners) == 1:
+            return runners[0]
+
+        def run(environment):
+            for runner in runners:
+                completion = runner(environment)
+                if completion is not None:
+                    return completion
+
+        return run
+
+    def block(self, stmt):
+        body = self.compile_scope(stmt.statements)
+
+        def block(environment):
+            return body(Environment(enclosing=environment))
+
+        return block
+
+    def compile_scope(self, statements):
+        """Compiles statements that run in a new environment"""
+        self.scope_depth += 1
+        body = self.compile_statements(statements)
+        self.scope_depth -= 1
+        return body
+
+    def class_(self, stmt):
+        name = stmt.name.lexeme
+        is_global = self.scope_depth == 0
+        superclass_expr = stmt.superclass
+        superclass_value = (
+            None if superclass_expr is None
+            else self.compile_expr(superclass_expr)
+        )
+        methods = [
+            (
+                method,
+                self.compile_scope(method.body),
+                method.name.lexeme == INIT,
+            ) for method in stmt.methods
+        ]
+
+        def class_(environment):
+            superclass = None
+            if superclass_value is not None:
+                superclass = superclass_value(environment)
+                if not isinstance(superclass, LoxClass):
+                    raise RuntimeException(
+                        token=superclass_expr.name,
+                        message="Superclass must be a class."
+                    )
+
+            # methods close over the scope where "super" is defined
+            closure = environment
+            if superclass is not None:
+                closure = Environment(enclosing=environment)
+                closure.define(name="super", value=superclass)
+
+            class_ = LoxClass(
+                name=name,
+                superclass=superclass,
+                methods={
+                    method.name.lexeme: CompiledFunction(
+                        declaration=method,
+                        closure=closure,
+                        body=body,
+                        is_initializer=is_initializer,
+                    ) for method, body, is_initializer in methods
+                },
+            )
+            if is_global:
+                environment.values[name] = class_
+            else:
+                environment.values.append(class_)
+
+        return class_
+
+    def expression(self, stmt):
+        expression = self.compile_expr(stmt.expression)
+
+        def expression_(environment):
+            expression(environment)
+
+        return expression_
+
+    def function(self, stmt):
+        name = stmt.name.lexeme
+        body = self.compile_scope(stmt.body)
+
+        if self.scope_depth == 0:
+            def function(environment):
+                environment.values[name] = CompiledFunction(
+                    declaration=stmt, closure=environment, body=body
+                )
+
+            return function
+
+        def local_function(environment):
+            environment.values.append(CompiledFunction(
+                declaration=stmt, closure=environment, body=body
+            ))
+
+        return local_function
+
+    def if_(self, stmt):
+        condition = self.compile_expr(stmt.condition)
+        then_branch = self.compile_stmt(stmt.then_branch)
+
+        if stmt.else_branch is None:
+            def if_(environment):
+                value = condition(environment)
+                if value is not None and value is not False:
+                    return then_branch(environment)
+
+            return if_
+
+        else_branch = self.compile_stmt(stmt.else_branch)
+
+        def if_else(environment):
+            value = condition(environment)
+            if value is not None and value is not False:
+                return then_branch(environment)
+            return else_branch(environment)
+
+        return if_else
+
+    def print_(self, stmt):
+        expression = self.compile_expr(stmt.expression)
+
+        def print_(environment):
+            print(stringify(obj=expression(environment)))
+
+        return print_
+
+    def return_(self, stmt):
+        if stmt.value is None:
+            return lambda environment: RETURN_NIL
+
+        value = self.compile_expr(stmt.value)
+
+        def return_(environment):
+            result = value(environment)
+            return RETURN_NIL if result is None else result
+
+        return return_
+
+    def var(self, stmt):
+        name = stmt.name.lexeme
+        initializer = (
+            (lambda environment: None) if stmt.initializer is None
+            else self.compile_expr(stmt.initializer)
+        )
+
+        if self.scope_depth == 0:
+            def var(environment):
+                environment.values[name] = initializer(environment)
+
+            return var
+
+        def local_var(environment):
+            environment.values.append(initializer(environment))
+
+        return local_var
+
+    def while_(self, stmt):
+        condition = self.compile_expr(stmt.condition)
+        body = self.compile_stmt(stmt.body)
+
+        def while_(environment):
+            while True:
+                value = condition(environment)
+                if value is None or value is False:
+                    return None
+                completion = body(environment)
+                if completion is not None:
+                    return completion
+
+        return while_
+
+    # # #
+    # # #   Expressions
+    # # #
+    def compile_expr(self, expr):
+        """Routes expressions to methods for compiling"""
+        return self.exprs[expr.__class__](expr)
+
+    def array(self, expr):
+        values = tuple(self.compile_expr(value) for value in expr.values)
+
+        def array(environment):
+            return [value(environment) for value in values]
+
+        return array
+
+    def assign(self, expr):
+        value = self.compile_expr(expr.value)
+        name = expr.name
+        lexeme = name.lexeme
+
+        if expr.depth is None:
+            values = self.globals.values
+
+            def assign_global(environment):
+                result = value(environment)
+                if lexeme not in values:
+                    raise RuntimeException(
+                        token=name,
+                        message=f"Undefined variable '{lexeme}'.",
+                    )
+                values[lexeme] = result
+                return result
+
+            return assign_global
+
+        distance, slot = expr.depth, expr.slot
+
+        if distance == 0:
+            def assign_local(environment):
+                result = environment.values[slot] = value(environment)
+                return result
+
+            return assign_local
+
+        def assign_enclosing(environment):
+            result = value(environment)
+            environment.ancestor(distance).values[slot] = result
+            return result
+
+        return assign_enclosing
+
+    def binary(self, expr):
+        left = self.compile_expr(expr.left)
+        right = self.compile_expr(expr.right)
+        operator = expr.operator
+        type_ = operator.type
+
+        if expr.unchecked:
+            operation = UNCHECKED_OPERATIONS[type_]
+            return lambda environment: operation(
+                left(environment), right(environment)
+            )
+
+        if type_ == PLUS:
+            def add(environment):
+                a = left(environment)
+                b = right(environment)
+                if isinstance(a, float) and isinstance(b, float):
+                    return a + b
+                if isinstance(a, STRINGS) and isinstance(b, STRINGS):
+                    return concat(a, b)
+                raise RuntimeException(
+                    token=operator,
+                    message="Operands must be two numbers or two strings.",
+                )
+
+            return add
+
+        if type_ == EQUAL_EQUAL:
+            return lambda environment: is_equal(
+                a=left(environment), b=right(environment)
+            )
+        if type_ == BANG_EQUAL:
+            return lambda environment: not is_equal(
+                a=left(environment), b=right(environment)
+            )
+
+        if type_ == SLASH:
+            def divide(environment):
+                a = left(environment)
+                b = right(environment)
+                if isinstance(a, float) and isinstance(b, float):
+                    if b == 0.0:
+                        raise RuntimeException(
+                            token=operator,
+                            message="Division by zero error.",
+                        )
+                    return a / b
+                raise RuntimeException(
+                    token=operator, message="Operands must be numbers."
+                )
+
+            return divide
+
+        # the most common numeric operations get their own closure so they
+        # don't have to go through a method call
+        if type_ == LESS:
+            def less(environment):
+                a = left(environment)
+                b = right(environment)
+                if isinstance(a, float) and isinstance(b, float):
+                    return a < b
+                raise RuntimeException(
+                    token=operator, message="Operands must be numbers."
+                )
+
+            return less
+
+        if type_ == MINUS:
+            def subtract(environment):
+                a = left(environment)
+                b = right(environment)
+                if isinstance(a, float) and isinstance(b, float):
+                    return a - b
+                raise RuntimeException(
+                    token=operator, message="Operands must be numbers."
+                )
+
+            return subtract
+
+        # everything else is a less common operation on two numbers
+        operation = {
+            GREATER: float.__gt__,
+            GREATER_EQUAL: float.__ge__,
+            LESS: float.__lt__,
+            LESS_EQUAL: float.__le__,
+            MINUS: float.__sub__,
+            STAR: float.__mul__,
+        }[type_]
+
+        def numeric(environment):
+            a = left(environment)
+            b = right(environment)
+            if isinstance(a, float) and isinstance(b, float):
+                return operation(a, b)
+            raise RuntimeException(
+                token=operator, message="Operands must be numbers."
+            )
+
+        return numeric
+
+    def call(self, expr):
+        if isinstance(expr.callee, Expr.Get):
+            callee = self.compile_get_method(expr.callee)
+        else:
+            callee = self.compile_expr(expr.callee)
+        arguments = tuple(self.compile_expr(arg) for arg in expr.expressions)
+        paren = expr.paren
+        tail = expr.tail
+
+        def call(environment):
+            function = callee(environment)
+
+            if not isinstance(function, LoxCallable):
+                raise RuntimeException(
+                    token=paren,
+                    message="Can only call functions and classes."
+                )
+
+            args = [argument(environment) for argument in arguments]
+
+            if len(args) != function.arity():
+                raise RuntimeException(
+                    token=paren,
+                    message=f"Expected {function.arity()} arguments but got {len(args)}."  # noqa: E501
+                )
+
+            if tail and isinstance(function, LoxFunction):
+                return TailCall(function=function, arguments=args)
+
+            try:
+                return function.call(interpreter=self, arguments=args)
+            except RecursionError:
+                raise RuntimeException(
+                    token=paren, message="Stack overflow."
+                ) from None
+            except NativeException as e:
+                raise RuntimeException(
+                    token=paren, message=e.message
+                ) from None
+
+        return call
+
+    def get(self, expr):
+        object_ = self.compile_expr(expr.object)
+        name = expr.name
+        cache = expr.cache
+
+        def get(environment):
+            obj = object_(environment)
+            if isinstance(obj, LoxInstance):
+                # fields of shapes that have been seen here before are found
+                # without calling anything
+                found = cache.get(obj.shape)
+                if found.__class__ is int:
+                    return obj.values[found]
+                return obj.get(name=name, cache=cache)
+
+            raise RuntimeException(
+                token=name, message="Only instances have properties."
+            )
+
+        return get
+
+    def compile_get_method(self, expr):
+        """Get for a callee, which can reuse bound methods"""
+        object_ = self.compile_expr(expr.object)
+        name = expr.name
+        cache = expr.cache
+
+        def get_method(environment):
+            obj = object_(environment)
+            if isinstance(obj, LoxInstance):
+                return obj.get_method(name=name, cache=cache)
+
+            raise RuntimeException(
+                token=name, message="Only instances have properties."
+            )
+
+        return get_method
+
+    def grouping(self, expr):
+        return self.compile_expr(expr.expression)
+
+    def index(self, expr):
+        array_ = self.compile_expr(expr.object)
+        index_ = self.compile_expr(expr.index)
+        bracket = expr.bracket
+
+        def index(environment):
+            array = array_(environment)
+            i = check_index(
+                array=array, index=index_(environment), token=bracket
+            )
+            return array[i]
+
+        return index
+
+    def literal(self, expr):
+        value = expr.value
+        return lambda environment: value
+
+    def logical(self, expr):
+        left = self.compile_expr(expr.left)
+        right = self.compile_expr(expr.right)
+
+        if expr.operator.type == OR:
+            def or_(environment):
+                value = left(environment)
+                if value is not None and value is not False:
+                    return value
+                return right(environment)
+
+            return or_
+
+        def and_(environment):
+            value = left(environment)
+            if value is None or value is False:
+                return value
+            return right(environment)
+
+        return and_
+
+    def set_(self, expr):
+        object_ = self.compile_expr(expr.object)
+        value = self.compile_expr(expr.value)
+        name = expr.name
+        cache = expr.cache
+
+        def set_(environment):
+            obj = object_(environment)
+
+            if not isinstance(obj, LoxInstance):
+                raise RuntimeException(
+                    token=name, message="Only instances have fields."
+                )
+
+            result = value(environment)
+            found = cache.get(obj.shape)
+            if found.__class__ is int:
+                obj.values[found] = result
+            else:
+                obj.set(name=name, value=result, cache=cache)
+            return result
+
+        return set_
+
+    def set_index(self, expr):
+        array_ = self.compile_expr(expr.object)
+        index_ = self.compile_expr(expr.index)
+        value_ = self.compile_expr(expr.value)
+        bracket = expr.bracket
+
+        def set_index(environment):
+            array = array_(environment)
+            index = index_(environment)
+            value = value_(environment)
+            i = check_index(array=array, index=index, token=bracket)
+            check_element(array=array, value=value, token=bracket)
+            array[i] = value
+            return value
+
+        return set_index
+
+    def super_(self, expr):
+        distance, slot = expr.depth, expr.slot
+        method_name = expr.method
+
+        def super_(environment):
+            scope = environment.ancestor(distance)
+            superclass = scope.values[slot]
+            # the scope where "this" is defined is always right inside the
+            # one where "super" is defined
+            obj = environment.ancestor(distance - 1).values[0]
+            method = superclass.find_method(name=method_name.lexeme)
+
+            if method is None:
+                raise RuntimeException(
+                    token=method_name,
+                    message=f"Undefined property '{method_name.lexeme}'.",
+                )
+
+            return method.bind(instance=obj)
+
+        return super_
+
+    def this(self, expr):
+        return self.compile_variable(name=expr.keyword, expr=expr)
+
+    def unary(self, expr):
+        right = self.compile_expr(expr.right)
+        operator = expr.operator
+
+        if operator.type == BANG:
+            return lambda environment: not is_truthy(obj=right(environment))
+        if expr.unchecked:
+            return lambda environment: -right(environment)
+
+        def negate(environment):
+            value = right(environment)
+            if isinstance(value, float):
+                return -value
+            raise RuntimeException(
+                token=operator, message="Operand must be a number."
+            )
+
+        return negate
+
+    def variable(self, expr):
+        return self.compile_variable(name=expr.name, expr=expr)
+
+    def compile_variable(self, name, expr):
+        """Used by 'variable' and 'this'"""
+        lexeme = name.lexeme
+
+        if expr.depth is None:
+            values = self.globals.values
+
+            def global_(environment):
+                try:
+                    return values[lexeme]
+                except KeyError:
+                    raise RuntimeException(
+                        token=name,
+                        message=f"Undefined variable '{lexeme}'.",
+                    ) from None
+
+            return global_
+
+        distance, slot = expr.depth, expr.slot
+
+        if distance == 0:
+            return lambda environment: environment.values[slot]
+        if distance == 1:
+            return lambda environment: environment.enclosing.values[slot]
+        if distance == 2:
+            return lambda environment: (
+                environment.enclosing.enclosing.values[slot]
+            )
+
+        return lambda environment: (
+            environment.ancestor(distance).values[slot]
+        )
@@ -0,0 +1,490 @@
+from . import expr as Expr
+from . import stmt as Stmt
+from .callable_ import INIT
+from .chunk import (
+    ObjFunction, OP_CONSTANT, OP_NIL, OP_TRUE, OP_FALSE, OP_POP, OP_GET_LOCAL,
+    OP_SET_LOCAL, OP_GET_GLOBAL, OP_DEFINE_GLOBAL, OP_SET_GLOBAL,
+    OP_GET_UPVALUE, OP_SET_UPVALUE, OP_GET_PROPERTY, OP_SET_PROPERTY,
+    OP_GET_SUPER, OP_EQUAL, OP_NOT_EQUAL, OP_GREATER, OP_GREATER_EQUAL,
+    OP_LESS, OP_LESS_EQUAL, OP_ADD, OP_SUBTRACT, OP_MULTIPLY, OP_DIVIDE,
+    OP_NOT, OP_NEGATE, OP_PRINT, OP_JUMP, OP_JUMP_IF_FALSE, OP_CALL,
+    OP_INVOKE, OP_SUPER_INVOKE, OP_CLOSURE, OP_CLOSE_UPVALUE, OP_RETURN,
+    OP_CLASS, OP_INHERIT, OP_METHOD, OP_ARRAY, OP_GET_INDEX, OP_SET_INDEX,
+)
+from .token_type import (
+    MINUS, PLUS, SLASH, STAR, BANG, BANG_EQUAL, EQUAL_EQUAL, GREATER,
+    GREATER_EQUAL, LESS, LESS_EQUAL, OR,
+)
+
+
+# constants for the kind of function being compiled
+SCRIPT = "script"
+FUNCTION = "function"
+INITIALIZER = "initializer"
+METHOD = "method"
+
+BINARY_OPS = {
+    BANG_EQUAL: OP_NOT_EQUAL,
+    EQUAL_EQUAL: OP_EQUAL,
+    GREATER: OP_GREATER,
+    GREATER_EQUAL: OP_GREATER_EQUAL,
+    LESS: OP_LESS,
+    LESS_EQUAL: OP_LESS_EQUAL,
+    MINUS: OP_SUBTRACT,
+    PLUS: OP_ADD,
+    SLASH: OP_DIVIDE,
+    STAR: OP_MULTIPLY,
+}
+
+
+class Local:
+    def __init__(self, name, depth):
+        self.name = name
+        self.depth = depth
+        self.is_captured = False
+
+
+class FunctionState:
+    """Locals and upvalues of the function currently being compiled"""
+    def __init__(self, enclosing, function, type):
+        self.enclosing = enclosing
+        self.function = function
+        self.type = type
+        self.scope_depth = 0
+        self.upvalues = []
+
+        # slot zero holds "this" in methods and the function being called
+        # otherwise, which can't be referred to by name
+        self.locals = [Local(name="this" if type in (
+            METHOD, INITIALIZER
+        ) else "", depth=0)]
+
+
+class Compiler:
+    """Compiles resolved statements into bytecode for the virtual machine
+
+    Works like the resolver: a single pass over the syntax tree that keeps
+    track of scopes. Instead of recording the depth of each variable, it
+    decides which stack slot (or upvalue) holds it. Static errors were already
+    reported by the resolver, so this doesn't report any of its own.
+    """
+    def __init__(self):
+        self.state = None
+
+        # methods that compile each class of node
+        self.stmts = {
+            Stmt.Block: self.block,
+            Stmt.Class: self.class_,
+            Stmt.Expression: self.expression,
+            Stmt.Function: self.function,
+            Stmt.If: self.if_,
+            Stmt.Print: self.print_,
+            Stmt.Return: self.return_,
+            Stmt.Var: self.var,
+            Stmt.While: self.while_,
+        }
+        self.exprs = {
+            Expr.Array: self.array,
+            Expr.Assign: self.assign,
+            Expr.Binary: self.binary,
+            Expr.Call: self.call,
+            Expr.Get: self.get,
+            Expr.Grouping: self.grouping,
+            Expr.Index: self.index,
+            Expr.Literal: self.literal,
+            Expr.Logical: self.logical,
+            Expr.Set: self.set_,
+            Expr.SetIndex: self.set_index,
+            Expr.Super: self.super_,
+            Expr.This: self.this,
+            Expr.Unary: self.unary,
+            Expr.Variable: self.variable,
+        }
+
+    def compile(self, statements):
+        """Returns the function that runs the statements at the top level"""
+        self.state = FunctionState(
+            enclosing=None, function=ObjFunction(name=None), type=SCRIPT
+        )
+        self.compile_statements(*statements)
+        return self.end_function()
+
+    def compile_statements(self, *statements):
+        for statement in statements:
+            self.stmts[statement.__class__](statement)
+
+    def compile_expr(self, expr):
+        self.exprs[expr.__class__](expr)
+
+    # # #
+    # # #   Utilities
+    # # #
+    def emit(self, *bytes_, token=None):
+        """Writes bytes to the current chunk
+
+        token is the one blamed for runtime errors caused by the instruction,
+        so it's only needed for instructions that can fail
+        """
+        chunk = self.state.function.chunk
+        for byte in bytes_:
+            chunk.write(byte, token=token)
+
+    def emit_constant(self, value):
+        self.emit(OP_CONSTANT, self.make_constant(value))
+
+    def make_constant(self, value):
+        return self.state.function.chunk.add_constant(value)
+
+    def emit_jump(self, op):
+        """Emits a jump with a placeholder target, returns where to patch"""
+        self.emit(op, -1)
+        return len(self.state.function.chunk.code) - 1
+
+    def patch_jump(self, offset):
+        chunk = self.state.function.chunk
+        chunk.code[offset] = len(chunk.code)
+
+    def emit_return(self):
+        if self.state.type == INITIALIZER:
+            self.emit(OP_GET_LOCAL, 0)
+        else:
+            self.emit(OP_NIL)
+        self.emit(OP_RETURN)
+
+    def end_function(self):
+        self.emit_return()
+        function = self.state.function
+        function.upvalue_count = len(self.state.upvalues)
+        self.state = self.state.enclosing
+        return function
+
+    def begin_scope(self):
+        self.state.scope_depth += 1
+
+    def end_scope(self):
+        state = self.state
+        state.scope_depth -= 1
+
+        while state.locals and state.locals[-1].depth > state.scope_depth:
+            if state.locals[-1].is_captured:
+                self.emit(OP_CLOSE_UPVALUE)
+            else:
+                self.emit(OP_POP)
+            state.locals.pop()
+
+    def add_local(self, name):
+        # locals start out with depth None until they're initialized
+        self.state.locals.append(Local(name=name, depth=None))
+
+    def mark_initialized(self):
+        if self.state.scope_depth == 0:
+            return
+        self.state.locals[-1].depth = self.state.scope_depth
+
+    def declare_variable(self, name):
+        """Declares a local - globals are late bound so aren't declared"""
+        if self.state.scope_depth == 0:
+            return
+        self.add_local(name=name.lexeme)
+
+    def define_variable(self, name):
+        if self.state.scope_depth > 0:
+            self.mark_initialized()
+            return
+        self.emit(OP_DEFINE_GLOBAL, self.make_constant(name.lexeme))
+
+    def resolve_local(self, state, name):
+        for i in range(len(state.locals) - 1, -1, -1):
+            if state.locals[i].name == name:
+                return i
+        return None
+
+    def resolve_upvalue(self, state, name):
+        if state.enclosing is None:
+            return None
+
+        local = self.resolve_local(state=state.enclosing, name=name)
+        if local is not None:
+            state.enclosing.locals[local].is_captured = True
+            return self.add_upvalue(state=state, index=local, is_local=True)
+
+        upvalue = self.resolve_upvalue(state=state.enclosing, name=name)
+        if upvalue is not None:
+            return self.add_upvalue(state=state, index=upvalue, is_local=False)
+
+        return None
+
+    def add_upvalue(self, state, index, is_local):
+        upvalue = (is_local, index)
+        if upvalue in state.upvalues:
+            return state.upvalues.index(upvalue)
+
+        state.upvalues.append(upvalue)
+        return len(state.upvalues) - 1
+
+    def named_variable(self, name, token, assign=None):
+        """Loads a variable, or stores the value of assign in it"""
+        arg = self.resolve_local(state=self.state, name=name)
+        if arg is not None:
+            get_op, set_op = OP_GET_LOCAL, OP_SET_LOCAL
+        else:
+            arg = self.resolve_upvalue(state=self.state, name=name)
+            if arg is not None:
+                get_op, set_op = OP_GET_UPVALUE, OP_SET_UPVALUE
+            else:
+                arg = self.make_constant(name)
+                get_op, set_op = OP_GET_GLOBAL, OP_SET_GLOBAL
+
+        if assign is not None:
+            self.compile_expr(assign)
+            self.emit(set_op, arg, token=token)
+        else:
+            self.emit(get_op, arg, token=token)
+
+    def compile_function(self, stmt, type):
+        self.state = FunctionState(
+            enclosing=self.state,
+            function=ObjFunction(
+                name=stmt.name.lexeme, arity=len(stmt.params)
+            ),
+            type=type,
+        )
+        self.begin_scope()
+
+        for param in stmt.params:
+            self.declare_variable(name=param)
+            self.define_variable(name=param)
+
+        self.compile_statements(*stmt.body)
+
+        # no need to end the scope - the frame is thrown away on return
+        upvalues = self.state.upvalues
+        function = self.end_function()
+
+        self.emit(OP_CLOSURE, self.make_constant(function))
+        for is_local, index in upvalues:
+            self.emit(1 if is_local else 0, index)
+
+    # # #
+    # # #   Statements
+    # # #
+    def block(self, stmt):
+        self.begin_scope()
+        self.compile_statements(*stmt.statements)
+        self.end_scope()
+
+    def class_(self, stmt):
+        name = stmt.name
+        self.declare_variable(name=name)
+
+        self.emit(OP_CLASS, self.make_constant(name.lexeme))
+        self.define_variable(name=name)
+
+        if stmt.superclass is not None:
+            self.variable(stmt.superclass)
+
+            # methods close over "super" the same way they close over any
+            # other local
+            self.begin_scope()
+            self.add_local(name="super")
+            self.mark_initialized()
+
+            self.named_variable(name=name.lexeme, token=name)
+            self.emit(OP_INHERIT, token=stmt.superclass.name)
+
+        # keep the class on the stack while methods are added to it
+        self.named_variable(name=name.lexeme, token=name)
+        for method in stmt.methods:
+            type = INITIALIZER if method.name.lexeme == INIT else METHOD
+            self.compile_function(stmt=method, type=type)
+            self.emit(OP_METHOD, self.make_constant(method.name.lexeme))
+        self.emit(OP_POP)
+
+        if stmt.superclass is not None:
+            self.end_scope()
+
+    def expression(self, stmt):
+        self.compile_expr(stmt.expression)
+        self.emit(OP_POP)
+
+    def function(self, stmt):
+        self.declare_variable(name=stmt.name)
+        # functions can refer to themselves, so they're initialized right away
+        self.mark_initialized()
+        self.compile_function(stmt=stmt, type=FUNCTION)
+        self.define_variable(name=stmt.name)
+
+    def if_(self, stmt):
+        self.compile_expr(stmt.condition)
+
+        then_jump = self.emit_jump(OP_JUMP_IF_FALSE)
+        self.emit(OP_POP)
+        self.compile_statements(stmt.then_branch)
+
+        else_jump = self.emit_jump(OP_JUMP)
+        self.patch_jump(then_jump)
+        self.emit(OP_POP)
+
+        if stmt.else_branch is not None:
+            self.compile_statements(stmt.else_branch)
+        self.patch_jump(else_jump)
+
+    def print_(self, stmt):
+        self.compile_expr(stmt.expression)
+        self.emit(OP_PRINT)
+
+    def return_(self, stmt):
+        if stmt.value is None:
+            self.emit_return()
+        else:
+            self.compile_expr(stmt.value)
+            self.emit(OP_RETURN)
+
+    def var(self, stmt):
+        self.declare_variable(name=stmt.name)
+
+        if stmt.initializer is not None:
+            self.compile_expr(stmt.initializer)
+        else:
+            self.emit(OP_NIL)
+
+        self.define_variable(name=stmt.name)
+
+    def while_(self, stmt):
+        loop_start = len(self.state.function.chunk.code)
+        self.compile_expr(stmt.condition)
+
+        exit_jump = self.emit_jump(OP_JUMP_IF_FALSE)
+        self.emit(OP_POP)
+        self.compile_statements(stmt.body)
+        self.emit(OP_JUMP, loop_start)
+
+        self.patch_jump(exit_jump)
+        self.emit(OP_POP)
+
+    # # #
+    # # #   Expressions
+    # # #
+    def array(self, expr):
+        for value in expr.values:
+            self.compile_expr(value)
+        self.emit(OP_ARRAY, len(expr.values))
+
+    def assign(self, expr):
+        self.named_variable(
+            name=expr.name.lexeme, token=expr.name, assign=expr.value
+        )
+
+    def binary(self, expr):
+        self.compile_expr(expr.left)
+        self.compile_expr(expr.right)
+        self.emit(BINARY_OPS[expr.operator.type], token=expr.operator)
+
+    def call(self, expr):
+        argc = len(expr.expressions)
+
+        callee = expr.callee
+
+        # method calls don't need to create a bound method first. Looking up
+        # the method blames the name, calling it blames the parenthesis
+        if isinstance(callee, Expr.Get):
+            self.compile_expr(callee.object)
+            for argument in expr.expressions:
+                self.compile_expr(argument)
+            name = self.make_constant(callee.name.lexeme)
+            self.emit(OP_INVOKE, name, token=callee.name)
+            self.emit(argc, token=expr.paren)
+            return
+
+        if isinstance(callee, Expr.Super):
+            self.named_variable(name="this", token=callee.keyword)
+            for argument in expr.expressions:
+                self.compile_expr(argument)
+            self.named_variable(name="super", token=callee.keyword)
+            name = self.make_constant(callee.method.lexeme)
+            self.emit(OP_SUPER_INVOKE, name, token=callee.method)
+            self.emit(argc, token=expr.paren)
+            return
+
+        self.compile_expr(callee)
+        for argument in expr.expressions:
+            self.compile_expr(argument)
+        self.emit(OP_CALL, argc, token=expr.paren)
+
+    def get(self, expr):
+        self.compile_expr(expr.object)
+        self.emit(
+            OP_GET_PROPERTY,
+            self.make_constant(expr.name.lexeme),
+            token=expr.name,
+        )
+
+    def grouping(self, expr):
+        self.compile_expr(expr.expression)
+
+    def index(self, expr):
+        self.compile_expr(expr.object)
+        self.compile_expr(expr.index)
+        self.emit(OP_GET_INDEX, token=expr.bracket)
+
+    def literal(self, expr):
+        if expr.value is None:
+            self.emit(OP_NIL)
+        elif expr.value is True:
+            self.emit(OP_TRUE)
+        elif expr.value is False:
+            self.emit(OP_FALSE)
+        else:
+            self.emit_constant(expr.value)
+
+    def logical(self, expr):
+        self.compile_expr(expr.left)
+
+        if expr.operator.type == OR:
+            # jump over the jump to the end if the left side is false
+            else_jump = self.emit_jump(OP_JUMP_IF_FALSE)
+            end_jump = self.emit_jump(OP_JUMP)
+            self.patch_jump(else_jump)
+        else:
+            end_jump = self.emit_jump(OP_JUMP_IF_FALSE)
+
+        self.emit(OP_POP)
+        self.compile_expr(expr.right)
+        self.patch_jump(end_jump)
+
+    def set_(self, expr):
+        self.compile_expr(expr.object)
+        self.compile_expr(expr.value)
+        self.emit(
+            OP_SET_PROPERTY,
+            self.make_constant(expr.name.lexeme),
+            token=expr.name,
+        )
+
+    def set_index(self, expr):
+        self.compile_expr(expr.object)
+        self.compile_expr(expr.index)
+        self.compile_expr(expr.value)
+        self.emit(OP_SET_INDEX, token=expr.bracket)
+
+    def super_(self, expr):
+        self.named_variable(name="this", token=expr.keyword)
+        self.named_variable(name="super", token=expr.keyword)
+        self.emit(
+            OP_GET_SUPER,
+            self.make_constant(expr.method.lexeme),
+            token=expr.method,
+        )
+
+    def this(self, expr):
+        self.named_variable(name="this", token=expr.keyword)
+
+    def unary(self, expr):
+        self.compile_expr(expr.right)
+        if expr.operator.type == MINUS:
+            self.emit(OP_NEGATE, token=expr.operator)
+        elif expr.operator.type == BANG:
+            self.emit(OP_NOT)
+
+    def variable(self, expr):
+        self.named_variable(name=expr.name.lexeme, token=expr.name)
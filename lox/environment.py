@@ -3,23 +3,47 @@ from .exceptions import RuntimeException
 
 class Environment:
     def __init__(self, enclosing=None):
-        """Stores variables and the environment's enclosing environment
+        """Stores a scope's local variables and its enclosing environment
 
-        The enclosing environment is used for traversing up scopes to find if a
-        variable is defined, or for traversing up a pre-determined number of
-        scopes (ultimately provided by Resolver class)
+        Locals are stored in a list in the order they're defined. The Resolver
+        works out which slot of which enclosing environment every local lives
+        in, so reading or writing one is a list index once the environment is
+        found by traversing up a pre-determined number of scopes.
         """
-        self.values = {}
+        self.values = []
         self.enclosing = enclosing
 
+    def define(self, name, value):
+        self.values.append(value)
+
+    def get_at(self, distance, slot):
+        return self.ancestor(distance).values[slot]
+
+    def assign_at(self, distance, slot, value):
+        self.ancestor(distance).values[slot] = value
+
+    def ancestor(self, distance):
+        environment = self
+        for _ in range(distance):
+            environment = environment.enclosing
+
+        return environment
+
+
+class GlobalEnvironment:
+    def __init__(self):
+        """Stores global variables by name
+
+        Globals aren't resolved ahead of time (they can be used in a function
+        before they're defined) so they're looked up by name.
+        """
+        self.values = {}
+        self.enclosing = None
+
     def get(self, name):
         if name.lexeme in self.values:
             return self.values[name.lexeme]
 
-        # traverse up environments to find if variable is defined
-        if self.enclosing is not None:
-            return self.enclosing.get(name=name)
-
         raise RuntimeException(
             token=name,
             message=f"Undefined variable '{name.lexeme}'.",
@@ -30,11 +54,6 @@ class Environment:
             self.values[name.lexeme] = value
             return
 
-        # traverse up environments to find variable
-        if self.enclosing is not None:
-            self.enclosing.assign(name=name, value=value)
-            return
-
         raise RuntimeException(
             token=name,
             message=f"Undefined variable '{name.lexeme}'.",
@@ -42,16 +61,3 @@ class Environment:
 
     def define(self, name, value):
         self.values[name] = value
-
-    def get_at(self, distance, name):
-        return self.ancestor(distance).values[name]
-
-    def assign_at(self, distance, name, value):
-        self.ancestor(distance).values[name.lexeme] = value
-
-    def ancestor(self, distance):
-        environment = self
-        for _ in range(distance):
-            environment = environment.enclosing
-
-        return environment
@@ -4,7 +4,17 @@ class RuntimeException(RuntimeError):
         self.message = message
 
 
-class Return(RuntimeException):
-    """return statements use exceptional control flow to return a value"""
-    def __init__(self, value):
-        self.value = value
+class NativeException(RuntimeError):
+    """Error from a native function, which doesn't know where it was called
+
+    Whatever makes the call turns it into a RuntimeException at the call's
+    closing parenthesis.
+    """
+    def __init__(self, message):
+        self.message = message
+
+
+class SnapshotException(Exception):
+    """Snapshot that can't be saved or loaded"""
+    def __init__(self, message):
+        self.message = message
@@ -1,15 +1,187 @@
-from collections import namedtuple
-
-Array = namedtuple("Array", ("values"))
-Assign = namedtuple("Assign", ("name", "value"))
-Binary = namedtuple("Binary", ("left", "operator", "right"))
-Call = namedtuple("Call", ("callee", "paren", "expressions"))
-Get = namedtuple("Get", ("object", "name"))
-Grouping = namedtuple("Grouping", ("expression"))
-Literal = namedtuple("Literal", ("value"))
-Logical = namedtuple("Logical", ("left", "operator", "right"))
-Set = namedtuple("Set", ("object", "name", "value"))
-Super = namedtuple("Super", ("keyword", "method"))
-This = namedtuple("This", ("keyword"))
-Unary = namedtuple("Unary", ("operator", "right"))
-Variable = namedtuple("Variable", ("name"))
+# Auto-generated by tool/generate_ast.py
+
+
+class Expr:
+    """Base class of every expression node
+
+    Nodes use __slots__ to keep them small, and compare and hash by identity so
+    two nodes that look the same are still different nodes. kind is unique to
+    each node class, across expressions and statements.
+    """
+    __slots__ = ()
+    fields = ()
+
+    def __repr__(self):
+        values = ", ".join(
+            f"{f}={getattr(self, f)!r}" for f in self.fields
+        )
+        return f"{self.__class__.__name__}({values})"
+
+
+class Array(Expr):
+    __slots__ = ("values",)
+    fields = ("values",)
+    kind = 0
+
+    def __init__(self, values):
+        self.values = values
+
+
+class Assign(Expr):
+    __slots__ = ("name", "value", "depth", "slot")
+    fields = ("name", "value")
+    kind = 1
+
+    def __init__(self, name, value):
+        self.name = name
+        self.value = value
+        self.depth = None
+        self.slot = None
+
+
+class Binary(Expr):
+    __slots__ = (
+        "left", "operator", "right", "unchecked", "runs", "specialization",
+    )
+    fields = ("left", "operator", "right")
+    kind = 2
+
+    def __init__(self, left, operator, right):
+        self.left = left
+        self.operator = operator
+        self.right = right
+        self.unchecked = False
+        self.runs = 0
+        self.specialization = None
+
+
+class Call(Expr):
+    __slots__ = ("callee", "paren", "expressions", "tail")
+    fields = ("callee", "paren", "expressions")
+    kind = 3
+
+    def __init__(self, callee, paren, expressions):
+        self.callee = callee
+        self.paren = paren
+        self.expressions = expressions
+        self.tail = False
+
+
+class Get(Expr):
+    __slots__ = ("object", "name", "cache")
+    fields = ("object", "name")
+    kind = 4
+
+    def __init__(self, object, name):
+        self.object = object
+        self.name = name
+        self.cache = {}
+
+
+class Grouping(Expr):
+    __slots__ = ("expression",)
+    fields = ("expression",)
+    kind = 5
+
+    def __init__(self, expression):
+        self.expression = expression
+
+
+class Index(Expr):
+    __slots__ = ("object", "bracket", "index")
+    fields = ("object", "bracket", "index")
+    kind = 6
+
+    def __init__(self, object, bracket, index):
+        self.object = object
+        self.bracket = bracket
+        self.index = index
+
+
+class Literal(Expr):
+    __slots__ = ("value",)
+    fields = ("value",)
+    kind = 7
+
+    def __init__(self, value):
+        self.value = value
+
+
+class Logical(Expr):
+    __slots__ = ("left", "operator", "right")
+    fields = ("left", "operator", "right")
+    kind = 8
+
+    def __init__(self, left, operator, right):
+        self.left = left
+        self.operator = operator
+        self.right = right
+
+
+class Set(Expr):
+    __slots__ = ("object", "name", "value", "cache")
+    fields = ("object", "name", "value")
+    kind = 9
+
+    def __init__(self, object, name, value):
+        self.object = object
+        self.name = name
+        self.value = value
+        self.cache = {}
+
+
+class SetIndex(Expr):
+    __slots__ = ("object", "bracket", "index", "value")
+    fields = ("object", "bracket", "index", "value")
+    kind = 10
+
+    def __init__(self, object, bracket, index, value):
+        self.object = object
+        self.bracket = bracket
+        self.index = index
+        self.value = value
+
+
+class Super(Expr):
+    __slots__ = ("keyword", "method", "depth", "slot")
+    fields = ("keyword", "method")
+    kind = 11
+
+    def __init__(self, keyword, method):
+        self.keyword = keyword
+        self.method = method
+        self.depth = None
+        self.slot = None
+
+
+class This(Expr):
+    __slots__ = ("keyword", "depth", "slot")
+    fields = ("keyword",)
+    kind = 12
+
+    def __init__(self, keyword):
+        self.keyword = keyword
+        self.depth = None
+        self.slot = None
+
+
+class Unary(Expr):
+    __slots__ = ("operator", "right", "unchecked")
+    fields = ("operator", "right")
+    kind = 13
+
+    def __init__(self, operator, right):
+        self.operator = operator
+        self.right = right
+        self.unchecked = False
+
+
+class Variable(Expr):
+    __slots__ = ("name", "depth", "slot")
+    fields = ("name",)
+    kind = 14
+
+    def __init__(self, name):
+        self.name = name
+        self.depth = None
+        self.slot = None
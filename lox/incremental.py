@@ -0,0 +1,217 @@
+from bisect import bisect_right
+from itertools import accumulate
+
+from . import expr as Expr
+from . import stmt as Stmt
+from .regex_scanner import TOKEN_REGEX, RegexScanner
+
+
+# tokens that end a top-level declaration when they aren't nested in
+# brackets of any kind
+DECLARATION_ENDS = {";", "}"}
+OPENING_BRACKETS = {"(", "[", "{"}
+CLOSING_BRACKETS = {")", "]", "}"}
+# tokens that can't be in a declaration, so don't affect where they end
+SKIPPED = {"newline", "comment", "block_comment", "end"}
+# expressions with an inline cache
+CACHED = (Expr.Get, Expr.Set)
+
+
+def declaration_ends(source, start):
+    """Yields the offset just after each top-level declaration in source
+    from start on, finishing with the end of the source
+
+    Only the tokens are needed to find these, not a parse: a declaration
+    ends with a ; or } that isn't nested in any brackets, unless an else
+    follows it. Comments and whitespace after a declaration go with the one
+    after it.
+    """
+    depth = 0
+    # end of the last declaration, if it hasn't been checked for an else yet
+    end = None
+    for match in TOKEN_REGEX.finditer(source, start):
+        kind = match.lastgroup
+        if kind in SKIPPED:
+            continue
+
+        text = match[kind]
+        if end is not None:
+            if kind != "identifier" or text != "else":
+                yield end
+            end = None
+
+        if kind == "operator":
+            if text in OPENING_BRACKETS:
+                depth += 1
+            elif text in CLOSING_BRACKETS:
+                # brackets closed too many times are left to the parser
+                depth = max(depth - 1, 0)
+            if depth == 0 and text in DECLARATION_ENDS:
+                end = match.end()
+
+    if end is not None and end < len(source):
+        yield end
+    yield len(source)
+
+
+def inline_caches(nodes):
+    """Inline caches of the expressions in syntax trees, and everything
+    nested in them
+    """
+    caches = []
+    nodes = list(nodes)
+    while nodes:
+        node = nodes.pop()
+        if isinstance(node, list):
+            nodes.extend(node)
+        elif isinstance(node, (Expr.Expr, Stmt.Stmt)):
+            if isinstance(node, CACHED):
+                caches.append(node.cache)
+            nodes.extend(getattr(node, field) for field in node.fields)
+    return caches
+
+
+class Span:
+    """Top-level declaration from the source of an IncrementalProgram, with
+    the comments and whitespace before it
+    """
+    __slots__ = ("length", "line", "tokens", "statements", "caches")
+
+    def __init__(self, length, line, tokens, statements):
+        # characters of the source in the span, and the line it starts on
+        self.length = length
+        self.line = line
+        self.tokens = tokens
+        # resolved and type checked statements, or None if it has errors
+        self.statements = statements
+        self.caches = inline_caches(statements or ())
+
+
+class IncrementalProgram:
+    """Source code that's edited and re-run, whose syntax tree is remade one
+    top-level declaration at a time
+
+    The source is split into spans, one for each top-level declaration,
+    which each keep their tokens and their resolved and type checked
+    statements. After an edit only the spans that it touches are scanned,
+    parsed, resolved and type checked again. If the edit changes where
+    declarations end (by deleting a } or starting a string, say), the spans
+    after it are remade until one ends in the same place as before. Spans
+    after that are kept as they were, with their tokens moved to new lines
+    if the edit added or removed any.
+
+    Nothing else needs remaking because only locals are resolved: globals
+    are looked up by name when the code runs, so no top-level declaration
+    depends on how another was parsed.
+
+    Errors are reported when the span they're in is made.
+
+    Inline caches in the statements remember shapes of the classes made by
+    the last run, which the next run makes again as new classes, so they're
+    emptied before each run instead of filling up with shapes that are never
+    seen again.
+    """
+    def __init__(self, source, lox):
+        self.source = source
+        # front end the spans are made with
+        self.lox = lox
+        self.spans = self.make_spans(start=0, line=1, ends=list(
+            declaration_ends(source=source, start=0)
+        ))
+        # offset of the end of each span
+        self.ends = self.span_ends()
+
+    @property
+    def statements(self):
+        return [
+            statement for span in self.spans
+            for statement in span.statements or ()
+        ]
+
+    @property
+    def had_error(self):
+        return any(span.statements is None for span in self.spans)
+
+    def reset_caches(self):
+        """Empties the inline caches of every span, before a run"""
+        for span in self.spans:
+            for cache in span.caches:
+                # compiled code can hold the cache, so it's kept
+                cache.clear()
+
+    def edit(self, start, end, text):
+        """Replaces the source from offset start up to end with text"""
+        if not 0 <= start <= end <= len(self.source):
+            raise ValueError(f"can't replace {start}:{end} of the source")
+
+        old_ends = self.ends
+        delta = len(text) - (end - start)
+        self.source = self.source[:start] + text + self.source[end:]
+
+        # text inserted right after a declaration could continue it (with
+        # an else), so the span before the edit is remade too
+        first = bisect_right(old_ends, start - 1) if start else 0
+        span_start = old_ends[first - 1] if first else 0
+
+        # spans are remade until one ends where an old span ends, after the
+        # edit, and everything after that is the same as before
+        ends = []
+        last = len(self.spans) - 1
+        for new_end in declaration_ends(source=self.source, start=span_start):
+            ends.append(new_end)
+            old_end = new_end - delta
+            if new_end >= start + len(text) and old_end >= end:
+                index = bisect_right(old_ends, old_end - 1)
+                if index < len(old_ends) and old_ends[index] == old_end:
+                    last = index
+                    break
+
+        line = self.spans[first].line
+        spans = self.make_spans(start=span_start, line=line, ends=ends)
+        if last + 1 < len(self.spans):
+            line += self.source.count("\n", span_start, ends[-1])
+            self.move_lines(
+                spans=self.spans[last + 1:],
+                lines=line - self.spans[last + 1].line,
+            )
+        self.spans[first:last + 1] = spans
+        self.ends = self.span_ends()
+
+    def make_spans(self, start, line, ends):
+        """Makes a span of the source from start up to each of ends"""
+        spans = []
+        error_handler = self.lox.error_handler
+        had_error = error_handler.had_error
+        for end in ends:
+            source = self.source[start:end]
+            error_handler.had_error = False
+            scanner = RegexScanner(
+                source=source, error_handler=error_handler, line=line
+            )
+            tokens = scanner.scan_tokens()
+            statements = self.lox.front_end(tokens=tokens)
+            had_error = had_error or error_handler.had_error
+
+            spans.append(Span(
+                length=end - start,
+                line=line,
+                tokens=tokens,
+                statements=statements,
+            ))
+            line += source.count("\n")
+            start = end
+
+        error_handler.had_error = had_error
+        return spans
+
+    def move_lines(self, spans, lines):
+        """Moves spans, and their tokens, down a number of lines"""
+        if lines == 0:
+            return
+        for span in spans:
+            span.line += lines
+            for token in span.tokens:
+                token.line += lines
+
+    def span_ends(self):
+        return list(accumulate(span.length for span in self.spans))
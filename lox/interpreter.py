@@ -1,14 +1,38 @@
+import operator
+
+from . import expr as Expr
+from . import stmt as Stmt
 from .callable_ import (
-    Clock, INIT, LoxCallable, LoxClass, LoxFunction, LoxInstance
+    Clock, INIT, RETURN_NIL, LoxCallable, LoxClass, LoxFunction, LoxInstance,
+    TailCall,
 )
-from .environment import Environment
-from .exceptions import Return, RuntimeException
+from .environment import Environment, GlobalEnvironment
+from .exceptions import NativeException, RuntimeException
+from .natives import NATIVES, FloatArray
+from .rope import STRINGS, concat
 from .token_type import (
     MINUS, PLUS, SLASH, STAR, BANG, BANG_EQUAL, EQUAL_EQUAL, GREATER,
     GREATER_EQUAL, LESS, LESS_EQUAL, OR,
 )
 
 
+# binary operators applied to operands the TypeChecker has proven are the
+# right types, so they don't have to be checked. PLUS is only proven for
+# numbers, since strings are concatenated into ropes
+UNCHECKED_OPERATIONS = {
+    BANG_EQUAL: operator.ne,
+    EQUAL_EQUAL: operator.eq,
+    GREATER: operator.gt,
+    GREATER_EQUAL: operator.ge,
+    LESS: operator.lt,
+    LESS_EQUAL: operator.le,
+    MINUS: operator.sub,
+    PLUS: operator.add,
+    SLASH: operator.truediv,
+    STAR: operator.mul,
+}
+
+
 def check_number_operands(operator, *operands):
     if all(isinstance(operand, float) for operand in operands):
         return
@@ -33,12 +57,37 @@ def stringify(obj):
     if isinstance(obj, bool):
         return str(obj).lower()
 
-    if isinstance(obj, list):
+    if isinstance(obj, (list, FloatArray)):
         return "[" + ", ".join([stringify(e) for e in obj]) + "]"
 
     return str(obj)
 
 
+def check_index(array, index, token):
+    """Checks that array can be subscripted with index, returning it as an
+    int
+    """
+    if not isinstance(array, (list, FloatArray)):
+        raise RuntimeException(
+            token=token, message="Only arrays can be indexed."
+        )
+    if index.__class__ is not float or not index.is_integer():
+        raise RuntimeException(
+            token=token, message="Index must be an integer."
+        )
+    if not 0 <= index < len(array):
+        raise RuntimeException(token=token, message="Index out of bounds.")
+    return int(index)
+
+
+def check_element(array, value, token):
+    """Checks that value can be stored in array"""
+    if array.__class__ is FloatArray and value.__class__ is not float:
+        raise RuntimeException(
+            token=token, message="Float arrays can only hold numbers."
+        )
+
+
 def is_truthy(obj):
     if obj is None:
         return False
@@ -60,16 +109,44 @@ def is_equal(a, b):
 class Interpreter:
     def __init__(self, error_handler):
         self.error_handler = error_handler
-        self.globals = Environment()
+        self.globals = GlobalEnvironment()
 
         # add built-in function clock to all interpreters
         self.globals.define(name="clock", value=Clock())
+        for name, native in NATIVES.items():
+            self.globals.define(name=name, value=native)
 
         self.environment = self.globals
 
-        # dict that contains an identifier and the depth at which it is defined
-        # example: {"foo": 4, "bar": 1}
-        self.locals = {}
+        # methods that process each class of node
+        self.stmts = {
+            Stmt.Block: self.block,
+            Stmt.Class: self.class_,
+            Stmt.Expression: self.expression,
+            Stmt.Function: self.function,
+            Stmt.If: self.if_,
+            Stmt.Print: self.print_,
+            Stmt.Return: self.return_,
+            Stmt.Var: self.var,
+            Stmt.While: self.while_,
+        }
+        self.exprs = {
+            Expr.Array: self.array,
+            Expr.Assign: self.assign,
+            Expr.Binary: self.binary,
+            Expr.Call: self.call,
+            Expr.Get: self.get,
+            Expr.Grouping: self.grouping,
+            Expr.Index: self.index,
+            Expr.Literal: self.literal,
+            Expr.Logical: self.logical,
+            Expr.Set: self.set_,
+            Expr.SetIndex: self.set_index,
+            Expr.Super: self.super_,
+            Expr.This: self.this,
+            Expr.Unary: self.unary,
+            Expr.Variable: self.variable,
+        }
 
     def interperet(self, statements):
         try:
@@ -78,31 +155,20 @@ class Interpreter:
         except RuntimeException as e:
             self.error_handler.runtime_error(error=e)
 
-    def resolve(self, expr, depth):
-        """Called only by Resolver on pass before actual interpretation"""
-        self.locals[expr] = depth
-
     # # #
     # # #   Statements
     # # #
     def execute(self, stmt):
-        """Routes statements to method for processing"""
-        stmts = {
-            "Block": self.block,
-            "Class": self.class_,
-            "Expression": self.expression,
-            "Function": self.function,
-            "If": self.if_,
-            "Print": self.print_,
-            "Return": self.return_,
-            "Var": self.var,
-            "While": self.while_,
-        }
-        return stmts[stmt.__class__.__name__](stmt)
+        """Routes statements to method for processing
+
+        Returns None when the statement completes normally, otherwise the
+        value (or RETURN_NIL) being returned by a return statement inside it.
+        """
+        return self.stmts[stmt.__class__](stmt)
 
     def block(self, stmt):
         """Creates new scope for block locals"""
-        self.execute_block(
+        return self.execute_block(
             statements=stmt.statements,
             environment=Environment(enclosing=self.environment)
         )
@@ -113,7 +179,10 @@ class Interpreter:
         try:
             self.environment = environment
             for statement in statements:
-                self.execute(stmt=statement)
+                completion = self.execute(stmt=statement)
+                # stop at a return statement
+                if completion is not None:
+                    return completion
         finally:
             # exit scope
             self.environment = previous
@@ -128,8 +197,6 @@ class Interpreter:
                     message="Superclass must be a class."
                 )
 
-        self.environment.define(name=stmt.name.lexeme, value=None)
-
         # create new scope inside class to define "super" - used for the
         # closure for the methods below
         if superclass is not None:
@@ -137,7 +204,7 @@ class Interpreter:
             self.environment.define(name="super", value=superclass)
 
         methods = {
-            method.name.lexeme: LoxFunction(
+            method.name.lexeme: self.new_function(
                 declaration=method,
                 closure=self.environment,
                 is_initializer=(method.name.lexeme == INIT),
@@ -152,32 +219,45 @@ class Interpreter:
         if superclass is not None:
             self.environment = self.environment.enclosing
 
-        self.environment.assign(name=stmt.name, value=class_)
+        # the class is added to the scope once it's complete - methods can only
+        # refer to it once they're called, which can only happen after this
+        self.environment.define(name=stmt.name.lexeme, value=class_)
 
     def expression(self, stmt):
         self.evaluate(expr=stmt.expression)
 
     def function(self, stmt):
-        function = LoxFunction(declaration=stmt, closure=self.environment)
+        function = self.new_function(
+            declaration=stmt, closure=self.environment
+        )
         self.environment.define(name=stmt.name.lexeme, value=function)
 
+    def new_function(self, declaration, closure, is_initializer=False):
+        """Makes the function that a function or method declaration creates"""
+        return LoxFunction(
+            declaration=declaration,
+            closure=closure,
+            is_initializer=is_initializer,
+        )
+
     def if_(self, stmt):
         if is_truthy(self.evaluate(expr=stmt.condition)):
-            self.execute(stmt=stmt.then_branch)
+            return self.execute(stmt=stmt.then_branch)
         elif stmt.else_branch is not None:
-            self.execute(stmt=stmt.else_branch)
+            return self.execute(stmt=stmt.else_branch)
 
     def print_(self, stmt):
         value = self.evaluate(expr=stmt.expression)
         print(stringify(obj=value))
 
     def return_(self, stmt):
-        value = None
-        if stmt.value is not None:
-            value = self.evaluate(expr=stmt.value)
-        # Return is an exception. It's convenient to use exceptional control
-        # flow to immediately bring the return value back
-        raise Return(value)
+        if stmt.value is None:
+            return RETURN_NIL
+
+        # the value is passed back up through every statement it's in until
+        # it gets to the function being called
+        value = self.evaluate(expr=stmt.value)
+        return RETURN_NIL if value is None else value
 
     def var(self, stmt):
         value = None
@@ -187,29 +267,16 @@ class Interpreter:
 
     def while_(self, stmt):
         while is_truthy(self.evaluate(expr=stmt.condition)):
-            self.execute(stmt=stmt.body)
+            completion = self.execute(stmt=stmt.body)
+            if completion is not None:
+                return completion
 
     # # #
     # # #   Expressions
     # # #
     def evaluate(self, expr):
         """Routes expressions to methods for processing"""
-        exprs = {
-            "Array": self.array,
-            "Assign": self.assign,
-            "Binary": self.binary,
-            "Call": self.call,
-            "Get": self.get,
-            "Grouping": self.grouping,
-            "Literal": self.literal,
-            "Logical": self.logical,
-            "Set": self.set_,
-            "Super": self.super_,
-            "This": self.this,
-            "Unary": self.unary,
-            "Variable": self.variable,
-        }
-        return exprs[expr.__class__.__name__](expr)
+        return self.exprs[expr.__class__](expr)
 
     def array(self, expr):
         """bonus expression not included in Lox spec"""
@@ -220,9 +287,9 @@ class Interpreter:
 
         # use resolver to find where a name is defined, otherwise assign to
         # globals
-        if expr in self.locals:
+        if expr.depth is not None:
             self.environment.assign_at(
-                distance=self.locals[expr], name=expr.name, value=value
+                distance=expr.depth, slot=expr.slot, value=value
             )
         else:
             self.globals.assign(name=expr.name, value=value)
@@ -232,50 +299,60 @@ class Interpreter:
     def binary(self, expr):
         left = self.evaluate(expr=expr.left)
         right = self.evaluate(expr=expr.right)
+        if expr.unchecked:
+            return UNCHECKED_OPERATIONS[expr.operator.type](left, right)
+        return self.binary_operation(
+            operator=expr.operator, left=left, right=right
+        )
 
-        if expr.operator.type == GREATER:
-            check_number_operands(expr.operator, left, right)
+    def binary_operation(self, operator, left, right):
+        """Applies a binary operator to operands that are already evaluated"""
+        if operator.type == GREATER:
+            check_number_operands(operator, left, right)
             return left > right
-        if expr.operator.type == GREATER_EQUAL:
-            check_number_operands(expr.operator, left, right)
+        if operator.type == GREATER_EQUAL:
+            check_number_operands(operator, left, right)
             return left >= right
-        if expr.operator.type == LESS:
-            check_number_operands(expr.operator, left, right)
+        if operator.type == LESS:
+            check_number_operands(operator, left, right)
             return left < right
-        if expr.operator.type == LESS_EQUAL:
-            check_number_operands(expr.operator, left, right)
+        if operator.type == LESS_EQUAL:
+            check_number_operands(operator, left, right)
             return left <= right
-        if expr.operator.type == BANG_EQUAL:
+        if operator.type == BANG_EQUAL:
             return not is_equal(a=left, b=right)
-        if expr.operator.type == EQUAL_EQUAL:
+        if operator.type == EQUAL_EQUAL:
             return is_equal(a=left, b=right)
-        if expr.operator.type == MINUS:
-            check_number_operands(expr.operator, left, right)
+        if operator.type == MINUS:
+            check_number_operands(operator, left, right)
             return float(left) - float(right)
-        if expr.operator.type == PLUS:
+        if operator.type == PLUS:
             if isinstance(left, float) and isinstance(right, float):
                 return left + right
-            elif isinstance(left, str) and isinstance(right, str):
-                return left + right
+            elif isinstance(left, STRINGS) and isinstance(right, STRINGS):
+                return concat(left, right)
             raise RuntimeException(
-                token=expr.operator,
+                token=operator,
                 message="Operands must be two numbers or two strings.",
             )
-        if expr.operator.type == SLASH:
-            check_number_operands(expr.operator, left, right)
+        if operator.type == SLASH:
+            check_number_operands(operator, left, right)
             if right == 0.0:
                 raise RuntimeException(
-                    token=expr.operator,
+                    token=operator,
                     message="Division by zero error.",
                 )
             return float(left) / float(right)
-        if expr.operator.type == STAR:
-            check_number_operands(expr.operator, left, right)
+        if operator.type == STAR:
+            check_number_operands(operator, left, right)
             return float(left) * float(right)
 
     def call(self, expr):
         """Calls a callable after checking number of params = number of args"""
-        callee = self.evaluate(expr=expr.callee)
+        if isinstance(expr.callee, Expr.Get):
+            callee = self.get_method(expr=expr.callee)
+        else:
+            callee = self.evaluate(expr=expr.callee)
 
         if not isinstance(callee, LoxCallable):
             raise RuntimeException(
@@ -291,12 +368,35 @@ class Interpreter:
                 message=f"Expected {callee.arity()} arguments but got {len(arguments)}."  # noqa: E501
             )
 
-        return callee.call(interpreter=self, arguments=arguments)
+        # a call that's being returned is made by the function returning it
+        if expr.tail and isinstance(callee, LoxFunction):
+            return TailCall(function=callee, arguments=arguments)
+
+        try:
+            return callee.call(interpreter=self, arguments=arguments)
+        except RecursionError:
+            raise RuntimeException(
+                token=expr.paren, message="Stack overflow."
+            ) from None
+        except NativeException as e:
+            raise RuntimeException(
+                token=expr.paren, message=e.message
+            ) from None
 
     def get(self, expr):
         obj = self.evaluate(expr.object)
         if isinstance(obj, LoxInstance):
-            return obj.get(name=expr.name)
+            return obj.get(name=expr.name, cache=expr.cache)
+
+        raise RuntimeException(
+            token=expr.name, message="Only instances have properties."
+        )
+
+    def get_method(self, expr):
+        """Get for a callee, which can reuse bound methods"""
+        obj = self.evaluate(expr.object)
+        if isinstance(obj, LoxInstance):
+            return obj.get_method(name=expr.name, cache=expr.cache)
 
         raise RuntimeException(
             token=expr.name, message="Only instances have properties."
@@ -305,6 +405,11 @@ class Interpreter:
     def grouping(self, expr):
         return self.evaluate(expr=expr.expression)
 
+    def index(self, expr):
+        array = self.evaluate(expr=expr.object)
+        index = self.evaluate(expr=expr.index)
+        return array[check_index(array=array, index=index, token=expr.bracket)]
+
     def literal(self, expr):
         return expr.value
 
@@ -329,14 +434,24 @@ class Interpreter:
             )
 
         value = self.evaluate(expr=expr.value)
-        obj.set(name=expr.name, value=value)
+        obj.set(name=expr.name, value=value, cache=expr.cache)
+        return value
+
+    def set_index(self, expr):
+        array = self.evaluate(expr=expr.object)
+        index = self.evaluate(expr=expr.index)
+        value = self.evaluate(expr=expr.value)
+        index = check_index(array=array, index=index, token=expr.bracket)
+        check_element(array=array, value=value, token=expr.bracket)
+        array[index] = value
         return value
 
     def super_(self, expr):
-        distance = self.locals[expr]
-        superclass = self.environment.get_at(distance=distance, name="super")
+        superclass = self.environment.get_at(
+            distance=expr.depth, slot=expr.slot
+        )
         # a bit of a hack to get the instance itself
-        obj = self.environment.get_at(distance=distance - 1, name="this")
+        obj = self.environment.get_at(distance=expr.depth - 1, slot=0)
         method = superclass.find_method(name=expr.method.lexeme)
 
         if method is None:
@@ -354,6 +469,8 @@ class Interpreter:
         right = self.evaluate(expr=expr.right)
 
         if expr.operator.type == MINUS:
+            if expr.unchecked:
+                return -right
             check_number_operands(expr.operator, right)
             return - float(right)
         if expr.operator.type == BANG:
@@ -364,8 +481,8 @@ class Interpreter:
 
     def look_up_variable(self, name, expr):
         """Used by 'variable' and 'this'"""
-        if expr in self.locals:
+        if expr.depth is not None:
             return self.environment.get_at(
-                distance=self.locals[expr], name=name.lexeme
+                distance=expr.depth, slot=expr.slot
             )
         return self.globals.get(name=name)
@@ -1,33 +1,205 @@
+import argparse
 import sys
 
+from .adaptive_interpreter import AdaptiveInterpreter
+from .cache import ProgramCache
+from .closure_interpreter import ClosureInterpreter
 from .error_handler import ErrorHandler
+from .exceptions import SnapshotException
 from .interpreter import Interpreter
+from .optimizer import MAX_LEVEL, Optimizer
 from .parser_ import Parser
+from .regex_scanner import RegexScanner
 from .resolver import Resolver
-from .scanner import Scanner
+from .snapshot import (
+    SNAPSHOT_BACKENDS, check_snapshot_path, load_snapshot, save_snapshot,
+)
+from .stack_interpreter import MAX_FRAMES, StackInterpreter
+from .tiered_interpreter import TieredInterpreter
+from .transpiler import Transpiler
+from .type_checker import TypeChecker
+from .vm import VM
 
 
-class Lox:
-    def __init__(self, test=False):
-        args = sys.argv
+# interpreters that can run resolved code, selectable with --backend
+BACKENDS = {
+    "tree": Interpreter,
+    "adaptive": AdaptiveInterpreter,
+    "stack": StackInterpreter,
+    "tiered": TieredInterpreter,
+    "closure": ClosureInterpreter,
+    "vm": VM,
+    "python": Transpiler,
+}
+
+
+def parse_args(args):
+    parser = argparse.ArgumentParser(prog="lox")
+    parser.add_argument("script", nargs="?")
+    parser.add_argument(
+        "--backend",
+        choices=BACKENDS,
+        default="tree",
+        help="how to execute code (default: tree)",
+    )
+    parser.add_argument(
+        "--dump-python",
+        metavar="PATH",
+        help="write the Python generated by the python backend to PATH",
+    )
+    parser.add_argument(
+        "-O",
+        dest="optimize",
+        metavar="LEVEL",
+        type=int,
+        choices=range(MAX_LEVEL + 1),
+        default=0,
+        help=(
+            "optimize the syntax tree before running it: 1 folds constants, "
+            f"{MAX_LEVEL} also removes dead code (default: 0)"
+        ),
+    )
+    parser.add_argument(
+        "--stats",
+        action="store_true",
+        help=(
+            "print how many expressions the adaptive backend specialized and "
+            "deoptimized"
+        ),
+    )
+    parser.add_argument(
+        "--debug-tiers",
+        action="store_true",
+        help="print when the tiered backend compiles a function or loop",
+    )
+    parser.add_argument(
+        "--max-frames",
+        metavar="N",
+        type=int,
+        help=(
+            "most calls the stack backend can be running at once before it "
+            f"reports a stack overflow (default: {MAX_FRAMES})"
+        ),
+    )
+    parser.add_argument(
+        "--load-snapshot",
+        metavar="PATH",
+        help="start with the globals saved in PATH by --save-snapshot",
+    )
+    parser.add_argument(
+        "--save-snapshot",
+        metavar="PATH",
+        help=(
+            "save the globals, and everything they refer to, to PATH once the "
+            "script has run"
+        ),
+    )
+    parser.add_argument(
+        "--no-cache",
+        dest="cache",
+        action="store_false",
+        help=(
+            "don't load the script's syntax tree from __loxcache__ or save it "
+            "there"
+        ),
+    )
 
+    args = parser.parse_args(args)
+    if args.stats and args.backend != "adaptive":
+        parser.error("--stats only works with --backend adaptive")
+    if args.debug_tiers and args.backend != "tiered":
+        parser.error("--debug-tiers only works with --backend tiered")
+    if args.max_frames is not None:
+        if args.backend != "stack":
+            parser.error("--max-frames only works with --backend stack")
+        if args.max_frames < 1:
+            parser.error("--max-frames has to be at least 1")
+    snapshot_backends = [
+        name for name, backend in BACKENDS.items()
+        if backend in SNAPSHOT_BACKENDS
+    ]
+    if (
+        (args.load_snapshot is not None or args.save_snapshot is not None)
+        and args.backend not in snapshot_backends
+    ):
+        parser.error(
+            "snapshots only work with --backend "
+            + ", ".join(snapshot_backends)
+        )
+    return args
+
+
+class Lox:
+    def __init__(self, test=False, backend="tree", optimize=0):
         self.error_handler = ErrorHandler()
-        self.interpreter = Interpreter(error_handler=self.error_handler)
+        self.optimize = optimize
+        self.stats = False
+        self.cache = False
 
         # don't want to start a prompt when running tests
         if test:
+            self.interpreter = BACKENDS[backend](
+                error_handler=self.error_handler
+            )
             return
-        elif (len(args) > 2):
-            print("Usage: python lox [script]")
-            sys.exit(64)
-        elif (len(args) == 2):
-            self.run_file(args[1])
+
+        args = parse_args(sys.argv[1:])
+        self.optimize = args.optimize
+        self.stats = args.stats
+        self.cache = args.cache
+        if args.backend == "python":
+            self.interpreter = Transpiler(
+                error_handler=self.error_handler, dump=args.dump_python
+            )
+        elif args.backend == "tiered":
+            self.interpreter = TieredInterpreter(
+                error_handler=self.error_handler, debug=args.debug_tiers
+            )
+        elif args.backend == "stack":
+            self.interpreter = StackInterpreter(
+                error_handler=self.error_handler,
+                max_frames=args.max_frames or MAX_FRAMES,
+            )
+        else:
+            self.interpreter = BACKENDS[args.backend](
+                error_handler=self.error_handler
+            )
+
+        if args.load_snapshot is not None:
+            self.snapshot(load_snapshot, args.load_snapshot)
+        # found out now instead of after the script has run
+        if args.save_snapshot is not None:
+            self.snapshot(check_snapshot_path, args.save_snapshot)
+
+        if args.script is not None:
+            self.run_file(args.script)
         else:
             self.run_prompt()
 
+        if args.save_snapshot is not None:
+            self.snapshot(save_snapshot, args.save_snapshot)
+
+    def snapshot(self, function, path):
+        """Loads, saves or checks the path of a snapshot of the
+        interpreter's globals
+        """
+        try:
+            function(interpreter=self.interpreter, path=path)
+        except SnapshotException as e:
+            print(f"{path}: {e.message}", file=sys.stderr)
+            sys.exit(65)
+
     def run_file(self, path):
         with open(path, "r", encoding="utf-8") as f:
-            self.run(f.read())
+            source = f.read()
+
+        cache = None
+        if self.cache:
+            cache = ProgramCache(script=path, optimize=self.optimize)
+        self.run(source, cache=cache)
+
+        if self.stats:
+            self.interpreter.print_stats()
 
         if self.error_handler.had_error:
             sys.exit(65)
@@ -44,22 +216,55 @@ class Lox:
             # execute code even if previous statement had an error
             self.error_handler.had_error = False
 
-    def run(self, source):
-        scanner = Scanner(source=source, error_handler=self.error_handler)
-        tokens = scanner.scan_tokens()
+    def run(self, source, cache=None):
+        statements = None
+        if cache is not None:
+            statements = cache.load(source)
+
+        if statements is None:
+            scanner = RegexScanner(
+                source=source, error_handler=self.error_handler
+            )
+            statements = self.front_end(tokens=scanner.stream_tokens())
+            # don't execute code that had errors
+            if statements is None:
+                return
+            if cache is not None:
+                cache.store(source, statements)
+
+        self.interpreter.interperet(statements=statements)
 
+    def front_end(self, tokens):
+        """Parses, resolves, optimizes and type checks tokens, giving the
+        statements to run, or None if they had errors
+        """
         parser = Parser(tokens=tokens, error_handler=self.error_handler)
         statements = parser.parse()
 
-        # don't execute code that had parse errors
+        # don't resolve code that had parse errors
         if self.error_handler.had_error:
-            return
+            return None
 
         resolver = Resolver(interpreter=self.interpreter)
         resolver.resolve(*statements)
 
-        # don't execute code that had resolution errors
         if self.error_handler.had_error:
-            return
+            return None
 
-        self.interpreter.interperet(statements=statements)
+        if self.optimize:
+            optimizer = Optimizer(level=self.optimize)
+            statements = optimizer.optimize(statements=statements)
+            # optimizing can remove scopes, which changes variables' depths
+            resolver = Resolver(interpreter=self.interpreter)
+            resolver.resolve(*statements)
+
+        TypeChecker().check(statements=statements)
+        return statements
+
+    def run_program(self, program):
+        """Runs the statements of an IncrementalProgram, unless it has
+        errors
+        """
+        if not program.had_error:
+            program.reset_caches()
+            self.interpreter.interperet(statements=program.statements)
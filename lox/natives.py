@@ -0,0 +1,197 @@
+import operator
+from array import array
+
+from .callable_ import LoxCallable
+from .exceptions import NativeException
+
+
+class FloatArray(array):
+    """Array that can only hold numbers, stored unboxed like a C double[]
+
+    Made by the floats native, printed like any other array, and worked on
+    in bulk by the other natives here, which loop in C instead of in Lox.
+    """
+    __slots__ = ()
+
+    def __new__(cls, values=()):
+        return super().__new__(cls, "d", values)
+
+
+class NativeFunction(LoxCallable):
+    """Built-in function written in Python"""
+    def __init__(self, name, function):
+        self.name = name
+        self.function = function
+        self.argc = function.__code__.co_argcount
+
+    def arity(self):
+        return self.argc
+
+    def call(self, interpreter, arguments):
+        return self.function(*arguments)
+
+    def __str__(self):
+        return "<native fn>"
+
+
+def check_array(value):
+    if not isinstance(value, (list, FloatArray)):
+        raise NativeException(message="Argument must be an array.")
+
+
+def check_integer(value, low, high):
+    """Checks value is an integer from low to high, returning it as an int"""
+    if value.__class__ is not float or not value.is_integer():
+        raise NativeException(message="Index must be an integer.")
+    if not low <= value <= high:
+        raise NativeException(message="Index out of bounds.")
+    return int(value)
+
+
+def check_element(array, value):
+    if array.__class__ is FloatArray and value.__class__ is not float:
+        raise NativeException(message="Float arrays can only hold numbers.")
+
+
+def check_float_array(*values):
+    for value in values:
+        if not isinstance(value, FloatArray):
+            raise NativeException(message="Arguments must be float arrays.")
+
+
+def check_lengths(a, b):
+    if len(a) != len(b):
+        raise NativeException(
+            message=f"Arrays must be the same length, got {len(a)} and "
+            f"{len(b)}."
+        )
+
+
+def check_not_empty(a):
+    if not a:
+        raise NativeException(message="Array must not be empty.")
+
+
+def len_(a):
+    check_array(a)
+    return float(len(a))
+
+
+def push(a, value):
+    check_array(a)
+    check_element(a, value)
+    a.append(value)
+
+
+def pop(a):
+    check_array(a)
+    if not a:
+        raise NativeException(message="Can't pop from an empty array.")
+    return a.pop()
+
+
+def insert(a, index, value):
+    """Inserts value before the element at index, or at the end if index is
+    the length of a
+    """
+    check_array(a)
+    index = check_integer(index, 0, len(a))
+    check_element(a, value)
+    a.insert(index, value)
+
+
+def slice_(a, start, end):
+    """New array of the elements of a from start up to (not including) end"""
+    check_array(a)
+    end = check_integer(end, 0, len(a))
+    start = check_integer(start, 0, end)
+    if a.__class__ is FloatArray:
+        # slicing an array makes a plain array("d")
+        return FloatArray(a[start:end])
+    return a[start:end]
+
+
+def floats(values):
+    """A float array of values' numbers, or of that many zeros"""
+    if isinstance(values, float):
+        if values < 0 or not values.is_integer():
+            raise NativeException(
+                message="Size must be a non-negative integer."
+            )
+        # 8 zero bytes are a double 0.0
+        return FloatArray(bytes(8 * int(values)))
+    if isinstance(values, list):
+        if not all(value.__class__ is float for value in values):
+            raise NativeException(message="Elements must be numbers.")
+        return FloatArray(values)
+    check_float_array(values)
+    return FloatArray(values)
+
+
+def add(a, b):
+    check_float_array(a, b)
+    check_lengths(a, b)
+    return FloatArray(map(operator.add, a, b))
+
+
+def mul(a, b):
+    check_float_array(a, b)
+    check_lengths(a, b)
+    return FloatArray(map(operator.mul, a, b))
+
+
+def dot(a, b):
+    check_float_array(a, b)
+    check_lengths(a, b)
+    return float(sum(map(operator.mul, a, b)))
+
+
+def sum_(a):
+    check_float_array(a)
+    return float(sum(a))
+
+
+def min_(a):
+    check_float_array(a)
+    check_not_empty(a)
+    return min(a)
+
+
+def max_(a):
+    check_float_array(a)
+    check_not_empty(a)
+    return max(a)
+
+
+def fill(a, value):
+    check_float_array(a)
+    if value.__class__ is not float:
+        raise NativeException(message="Value must be a number.")
+    a[:] = FloatArray([value]) * len(a)
+
+
+def sort(a):
+    check_float_array(a)
+    a[:] = FloatArray(sorted(a))
+
+
+# built-in functions every backend defines as globals, by name
+NATIVES = {
+    name: NativeFunction(name=name, function=function)
+    for name, function in {
+        "len": len_,
+        "push": push,
+        "pop": pop,
+        "insert": insert,
+        "slice": slice_,
+        "floats": floats,
+        "add": add,
+        "mul": mul,
+        "dot": dot,
+        "sum": sum_,
+        "min": min_,
+        "max": max_,
+        "fill": fill,
+        "sort": sort,
+    }.items()
+}
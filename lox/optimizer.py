@@ -0,0 +1,263 @@
+import math
+
+from . import expr as Expr
+from . import stmt as Stmt
+from .error_handler import ErrorHandler
+from .exceptions import RuntimeException
+from .interpreter import Interpreter, is_truthy
+from .rope import Rope
+from .token_type import OR
+
+
+# what each -O level turns on, higher levels include everything below them
+FOLD_CONSTANTS = 1
+REMOVE_DEAD_CODE = 2
+MAX_LEVEL = REMOVE_DEAD_CODE
+
+# statements that add a local to the scope they're in
+DECLARATIONS = (Stmt.Class, Stmt.Function, Stmt.Var)
+
+
+class Optimizer:
+    def __init__(self, level):
+        """Rewrites a resolved syntax tree into one that does less at runtime
+
+        FOLD_CONSTANTS evaluates operators whose operands are all literals and
+        removes groupings. REMOVE_DEAD_CODE also removes branches whose
+        condition is a literal and merges blocks that declare nothing into
+        the code around them.
+
+        Merging blocks changes how many scopes there are between a variable
+        and where it's used, so resolve the tree again afterwards.
+        """
+        self.level = level
+        # works out folded values so they're exactly what running them gives
+        self.evaluator = Interpreter(error_handler=ErrorHandler())
+
+        # methods that optimize each class of node
+        self.stmts = {
+            Stmt.Block: self.block,
+            Stmt.Class: self.class_,
+            Stmt.Expression: self.expression,
+            Stmt.Function: self.function,
+            Stmt.If: self.if_,
+            Stmt.Print: self.print_,
+            Stmt.Return: self.return_,
+            Stmt.Var: self.var,
+            Stmt.While: self.while_,
+        }
+        self.exprs = {
+            Expr.Array: self.array,
+            Expr.Assign: self.assign,
+            Expr.Binary: self.binary,
+            Expr.Call: self.call,
+            Expr.Get: self.get,
+            Expr.Grouping: self.grouping,
+            Expr.Index: self.index,
+            Expr.Literal: self.literal,
+            Expr.Logical: self.logical,
+            Expr.Set: self.set_,
+            Expr.SetIndex: self.set_index,
+            Expr.Super: self.super_,
+            Expr.This: self.this,
+            Expr.Unary: self.unary,
+            Expr.Variable: self.variable,
+        }
+
+    def optimize(self, statements):
+        if not self.level:
+            return statements
+        return self.optimize_statements(statements)
+
+    # # #
+    # # #   Utilities
+    # # #
+    def optimize_statements(self, statements):
+        """Optimizes a list of statements, returning the new list"""
+        optimized = []
+        for statement in statements:
+            optimized.extend(self.stmts[statement.__class__](statement))
+        return optimized
+
+    def optimize_branch(self, stmt):
+        """Optimizes the body of an if or while, which is a single statement"""
+        statements = self.stmts[stmt.__class__](stmt)
+        if len(statements) == 1:
+            return statements[0]
+        return Stmt.Block(statements=statements)
+
+    def optimize_expr(self, expr):
+        return self.exprs[expr.__class__](expr)
+
+    def fold(self, expr):
+        """Replaces an operator whose operands are literals with its value
+
+        Anything that fails at runtime is left alone, so the error is still
+        reported when (and if) it runs, and at the operator's line.
+        """
+        try:
+            value = self.evaluator.exprs[expr.__class__](expr)
+        except RuntimeException:
+            return expr
+
+        # nan and -0 don't survive being written out by every backend
+        if isinstance(value, float) and (
+            math.isnan(value)
+            or (value == 0.0 and math.copysign(1.0, value) < 0.0)
+        ):
+            return expr
+        # literals are always plain strings
+        if isinstance(value, Rope):
+            value = str(value)
+        return Expr.Literal(value=value)
+
+    # # #
+    # # #   Statements
+    # # #
+    def block(self, stmt):
+        stmt.statements = self.optimize_statements(stmt.statements)
+        if self.level >= REMOVE_DEAD_CODE and not any(
+            isinstance(statement, DECLARATIONS)
+            for statement in stmt.statements
+        ):
+            return stmt.statements
+        return [stmt]
+
+    def class_(self, stmt):
+        for method in stmt.methods:
+            self.function(method)
+        return [stmt]
+
+    def expression(self, stmt):
+        stmt.expression = self.optimize_expr(stmt.expression)
+        return [stmt]
+
+    def function(self, stmt):
+        stmt.body = self.optimize_statements(stmt.body)
+        return [stmt]
+
+    def if_(self, stmt):
+        stmt.condition = self.optimize_expr(stmt.condition)
+        if (
+            self.level >= REMOVE_DEAD_CODE
+            and isinstance(stmt.condition, Expr.Literal)
+        ):
+            branch = (
+                stmt.then_branch if is_truthy(obj=stmt.condition.value)
+                else stmt.else_branch
+            )
+            if branch is None:
+                return []
+            return self.stmts[branch.__class__](branch)
+
+        stmt.then_branch = self.optimize_branch(stmt.then_branch)
+        if stmt.else_branch is not None:
+            stmt.else_branch = self.optimize_branch(stmt.else_branch)
+        return [stmt]
+
+    def print_(self, stmt):
+        stmt.expression = self.optimize_expr(stmt.expression)
+        return [stmt]
+
+    def return_(self, stmt):
+        if stmt.value is not None:
+            stmt.value = self.optimize_expr(stmt.value)
+        return [stmt]
+
+    def var(self, stmt):
+        if stmt.initializer is not None:
+            stmt.initializer = self.optimize_expr(stmt.initializer)
+        return [stmt]
+
+    def while_(self, stmt):
+        stmt.condition = self.optimize_expr(stmt.condition)
+        if (
+            self.level >= REMOVE_DEAD_CODE
+            and isinstance(stmt.condition, Expr.Literal)
+            and not is_truthy(obj=stmt.condition.value)
+        ):
+            return []
+
+        stmt.body = self.optimize_branch(stmt.body)
+        return [stmt]
+
+    # # #
+    # # #   Expressions
+    # # #
+    def array(self, expr):
+        expr.values = [self.optimize_expr(value) for value in expr.values]
+        return expr
+
+    def assign(self, expr):
+        expr.value = self.optimize_expr(expr.value)
+        return expr
+
+    def binary(self, expr):
+        expr.left = self.optimize_expr(expr.left)
+        expr.right = self.optimize_expr(expr.right)
+        if (
+            isinstance(expr.left, Expr.Literal)
+            and isinstance(expr.right, Expr.Literal)
+        ):
+            return self.fold(expr)
+        return expr
+
+    def call(self, expr):
+        expr.callee = self.optimize_expr(expr.callee)
+        expr.expressions = [
+            self.optimize_expr(arg) for arg in expr.expressions
+        ]
+        return expr
+
+    def get(self, expr):
+        expr.object = self.optimize_expr(expr.object)
+        return expr
+
+    def grouping(self, expr):
+        # the parser has already used the parentheses to group things
+        return self.optimize_expr(expr.expression)
+
+    def index(self, expr):
+        expr.object = self.optimize_expr(expr.object)
+        expr.index = self.optimize_expr(expr.index)
+        return expr
+
+    def literal(self, expr):
+        return expr
+
+    def logical(self, expr):
+        expr.left = self.optimize_expr(expr.left)
+        expr.right = self.optimize_expr(expr.right)
+        if not isinstance(expr.left, Expr.Literal):
+            return expr
+
+        # the left operand decides whether the right one is evaluated
+        if is_truthy(obj=expr.left.value) == (expr.operator.type == OR):
+            return expr.left
+        return expr.right
+
+    def set_(self, expr):
+        expr.object = self.optimize_expr(expr.object)
+        expr.value = self.optimize_expr(expr.value)
+        return expr
+
+    def set_index(self, expr):
+        expr.object = self.optimize_expr(expr.object)
+        expr.index = self.optimize_expr(expr.index)
+        expr.value = self.optimize_expr(expr.value)
+        return expr
+
+    def super_(self, expr):
+        return expr
+
+    def this(self, expr):
+        return expr
+
+    def unary(self, expr):
+        expr.right = self.optimize_expr(expr.right)
+        if isinstance(expr.right, Expr.Literal):
+            return self.fold(expr)
+        return expr
+
+    def variable(self, expr):
+        return expr
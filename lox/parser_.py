@@ -10,15 +10,84 @@ from .token_type import (
 )
 
 
+# how tightly each level of operators binds, from loosest to tightest
+ASSIGNMENT_PRECEDENCE = 1
+OR_PRECEDENCE = 2
+AND_PRECEDENCE = 3
+EQUALITY_PRECEDENCE = 4
+COMPARISON_PRECEDENCE = 5
+TERM_PRECEDENCE = 6
+FACTOR_PRECEDENCE = 7
+UNARY_PRECEDENCE = 8
+CALL_PRECEDENCE = 9
+
+
 class ParseError(Exception):
     pass
 
 
 class Parser:
+    """Parses tokens into statements
+
+    tokens can be a list or any other iterable, like a scanner's
+    stream_tokens(). They're taken one at a time, and the parser only keeps
+    the token it's looking at and the one before it, so tokens that don't end
+    up in the syntax tree can be freed as soon as they're parsed.
+    """
     def __init__(self, tokens, error_handler):
-        self.tokens = tokens
+        self.tokens = iter(tokens)
         self.error_handler = error_handler
-        self.current = 0
+        # the token being looked at, and the one consumed before it
+        self.current = next(self.tokens)
+        self.previous_token = None
+
+        # methods that parse statements starting with each keyword
+        self.statements = {
+            FOR: self.for_statement,
+            IF: self.if_statement,
+            PRINT: self.print_statement,
+            RETURN: self.return_statement,
+            WHILE: self.while_statement,
+            LEFT_BRACE: lambda: Stmt.Block(self.block()),
+        }
+
+        # methods that parse expressions starting with each token, which get
+        # passed that token
+        self.prefixes = {
+            LEFT_BRACKET: self.array,
+            FALSE: lambda token: Expr.Literal(value=False),
+            TRUE: lambda token: Expr.Literal(value=True),
+            NIL: lambda token: Expr.Literal(value=None),
+            NUMBER: lambda token: Expr.Literal(token.literal),
+            STRING: lambda token: Expr.Literal(token.literal),
+            SUPER: self.super_,
+            THIS: lambda token: Expr.This(token),
+            IDENTIFIER: lambda token: Expr.Variable(token),
+            LEFT_PAREN: self.grouping,
+            BANG: self.unary,
+            MINUS: self.unary,
+        }
+        # precedence of each token that goes after an operand, and the method
+        # that parses the rest of the expression, which gets passed the
+        # operand before and the token
+        self.infixes = {
+            EQUAL: (ASSIGNMENT_PRECEDENCE, self.assignment),
+            OR: (OR_PRECEDENCE, self.or_),
+            AND: (AND_PRECEDENCE, self.and_),
+            BANG_EQUAL: (EQUALITY_PRECEDENCE, self.binary),
+            EQUAL_EQUAL: (EQUALITY_PRECEDENCE, self.binary),
+            GREATER: (COMPARISON_PRECEDENCE, self.binary),
+            GREATER_EQUAL: (COMPARISON_PRECEDENCE, self.binary),
+            LESS: (COMPARISON_PRECEDENCE, self.binary),
+            LESS_EQUAL: (COMPARISON_PRECEDENCE, self.binary),
+            MINUS: (TERM_PRECEDENCE, self.binary),
+            PLUS: (TERM_PRECEDENCE, self.binary),
+            SLASH: (FACTOR_PRECEDENCE, self.binary),
+            STAR: (FACTOR_PRECEDENCE, self.binary),
+            LEFT_PAREN: (CALL_PRECEDENCE, self.finish_call),
+            DOT: (CALL_PRECEDENCE, self.get),
+            LEFT_BRACKET: (CALL_PRECEDENCE, self.index),
+        }
 
     def parse(self):
         statements = []
@@ -103,18 +172,10 @@ class Parser:
     # # #   Statements
     # # #
     def statement(self):
-        if self.match(FOR):
-            return self.for_statement()
-        if self.match(IF):
-            return self.if_statement()
-        if self.match(PRINT):
-            return self.print_statement()
-        if self.match(RETURN):
-            return self.return_statement()
-        if self.match(WHILE):
-            return self.while_statement()
-        if self.match(LEFT_BRACE):
-            return Stmt.Block(self.block())
+        statement = self.statements.get(self.peek().type)
+        if statement is not None:
+            self.advance()
+            return statement()
 
         return self.expression_statement()
 
@@ -214,112 +275,116 @@ class Parser:
     # # #   Expressions
     # # #
     def expression(self):
-        return self.assignment()
-
-    def assignment(self):
-        expr = self.or_()
-
-        if self.match(EQUAL):
-            equals = self.previous()
-            value = self.assignment()
-
-            if isinstance(expr, Expr.Variable):
-                return Expr.Assign(name=expr.name, value=value)
-            elif isinstance(expr, Expr.Get):
-                return Expr.Set(
-                    object=expr.object, name=expr.name, value=value
-                )
-
-            self.error(token=equals, message="Invalid assignment target.")
-
-        return expr
-
-    def or_(self):
-        expr = self.and_()
-
-        while self.match(OR):
-            operator = self.previous()
-            right = self.and_()
-            expr = Expr.Logical(left=expr, operator=operator, right=right)
-
-        return expr
-
-    def and_(self):
-        expr = self.equality()
-
-        while self.match(AND):
-            operator = self.previous()
-            right = self.and_()
-            expr = Expr.Logical(left=expr, operator=operator, right=right)
-
-        return expr
-
-    def equality(self):
-        expr = self.comparison()
-
-        while self.match(BANG_EQUAL, EQUAL_EQUAL):
-            operator = self.previous()
-            right = self.comparison()
-            expr = Expr.Binary(left=expr, operator=operator, right=right)
-
-        return expr
-
-    def comparison(self):
-        expr = self.term()
-
-        while self.match(GREATER, GREATER_EQUAL, LESS, LESS_EQUAL):
-            operator = self.previous()
-            right = self.term()
-            expr = Expr.Binary(left=expr, operator=operator, right=right)
+        return self.parse_precedence(precedence=ASSIGNMENT_PRECEDENCE)
+
+    def parse_precedence(self, precedence):
+        """Parses an expression made of operators that bind at least as
+        tightly as precedence
+
+        The token an expression starts with picks the prefix rule that parses
+        it. After that, any operator in the infix table that binds tightly
+        enough takes the expression so far as its left operand, until one
+        that binds more loosely (or a token that isn't an operator) is found.
+        """
+        token = self.current
+        prefix = self.prefixes.get(token.type)
+        if prefix is None:
+            raise self.error(token=token, message="Expect expression.")
+        self.advance()
+        expr = prefix(token)
 
-        return expr
+        infixes = self.infixes
+        while True:
+            infix = infixes.get(self.current.type)
+            if infix is None or infix[0] < precedence:
+                return expr
+            operator = self.advance()
+            expr = infix[1](expr, operator)
 
-    def term(self):
-        expr = self.factor()
+    # # #
+    # # #   Prefix rules
+    # # #
+    def array(self, bracket):
+        elements = []
+        if not self.check(type=RIGHT_BRACKET):
+            elements.append(self.expression())
+            while self.match(COMMA):
+                elements.append(self.expression())
+        self.consume(
+            type=RIGHT_BRACKET, message="Expect ']' after array creation"
+        )
+        return Expr.Array(values=elements)
 
-        while self.match(MINUS, PLUS):
-            operator = self.previous()
-            right = self.factor()
-            expr = Expr.Binary(left=expr, operator=operator, right=right)
+    def super_(self, keyword):
+        self.consume(type=DOT, message="Expect '.' after 'super'.")
+        method = self.consume(
+            type=IDENTIFIER, message="Expect superclass method name."
+        )
+        return Expr.Super(keyword=keyword, method=method)
 
-        return expr
+    def grouping(self, paren):
+        expr = self.expression()
+        self.consume(type=RIGHT_PAREN, message="Expect ')' after expression.")
+        return Expr.Grouping(expression=expr)
 
-    def factor(self):
-        expr = self.unary()
+    def unary(self, operator):
+        right = self.parse_precedence(precedence=UNARY_PRECEDENCE)
+        return Expr.Unary(operator, right)
 
-        while self.match(SLASH, STAR):
-            operator = self.previous()
-            right = self.unary()
-            expr = Expr.Binary(left=expr, operator=operator, right=right)
+    # # #
+    # # #   Infix rules
+    # # #
+    def assignment(self, target, equals):
+        # right-associative, so a = b = c assigns c to b first
+        value = self.parse_precedence(precedence=ASSIGNMENT_PRECEDENCE)
+
+        if isinstance(target, Expr.Variable):
+            return Expr.Assign(name=target.name, value=value)
+        elif isinstance(target, Expr.Get):
+            return Expr.Set(
+                object=target.object, name=target.name, value=value
+            )
+        elif isinstance(target, Expr.Index):
+            return Expr.SetIndex(
+                object=target.object,
+                bracket=target.bracket,
+                index=target.index,
+                value=value,
+            )
 
-        return expr
+        self.error(token=equals, message="Invalid assignment target.")
+        return target
 
-    def unary(self):
-        if self.match(BANG, MINUS):
-            operator = self.previous()
-            right = self.unary()
-            return Expr.Unary(operator, right)
+    def or_(self, left, operator):
+        right = self.parse_precedence(precedence=AND_PRECEDENCE)
+        return Expr.Logical(left=left, operator=operator, right=right)
 
-        return self.call()
+    def and_(self, left, operator):
+        # right-associative, so a and b and c is a and (b and c)
+        right = self.parse_precedence(precedence=AND_PRECEDENCE)
+        return Expr.Logical(left=left, operator=operator, right=right)
 
-    def call(self):
-        expr = self.primary()
+    def binary(self, left, operator):
+        # left-associative, so the right operand only has operators that bind
+        # more tightly than this one
+        precedence = self.infixes[operator.type][0]
+        right = self.parse_precedence(precedence=precedence + 1)
+        return Expr.Binary(left=left, operator=operator, right=right)
 
-        while (True):
-            if self.match(LEFT_PAREN):
-                expr = self.finish_call(expr)
-            elif self.match(DOT):
-                name = self.consume(
-                    type=IDENTIFIER,
-                    message="Expect property name after '.'."
-                )
-                expr = Expr.Get(object=expr, name=name)
-            else:
-                break
+    def get(self, object, dot):
+        name = self.consume(
+            type=IDENTIFIER, message="Expect property name after '.'."
+        )
+        return Expr.Get(object=object, name=name)
 
-        return expr
+    def index(self, object, left_bracket):
+        index = self.expression()
+        bracket = self.consume(
+            type=RIGHT_BRACKET, message="Expect ']' after index."
+        )
+        return Expr.Index(object=object, bracket=bracket, index=index)
 
-    def finish_call(self, callee):
+    def finish_call(self, callee, left_paren):
         arguments = []
         if not self.check(type=RIGHT_PAREN):
             arguments.append(self.expression())
@@ -340,52 +405,6 @@ class Parser:
             callee=callee, paren=paren, expressions=tuple(arguments)
         )
 
-    def primary(self):
-        # array creation
-        if self.match(LEFT_BRACKET):
-            elements = []
-            if not self.check(type=RIGHT_BRACKET):
-                elements.append(self.expression())
-                while self.match(COMMA):
-                    elements.append(self.expression())
-            self.consume(
-                type=RIGHT_BRACKET, message="Expect ']' after array creation"
-            )
-            return Expr.Array(values=elements)
-
-        if self.match(FALSE):
-            return Expr.Literal(value=False)
-        if self.match(TRUE):
-            return Expr.Literal(value=True)
-        if self.match(NIL):
-            return Expr.Literal(value=None)
-
-        if self.match(NUMBER, STRING):
-            return Expr.Literal(self.previous().literal)
-
-        if self.match(SUPER):
-            keyword = self.previous()
-            self.consume(type=DOT, message="Expect '.' after 'super'.")
-            method = self.consume(
-                type=IDENTIFIER, message="Expect superclass method name."
-            )
-            return Expr.Super(keyword=keyword, method=method)
-
-        if self.match(THIS):
-            return Expr.This(self.previous())
-
-        if self.match(IDENTIFIER):
-            return Expr.Variable(self.previous())
-
-        if self.match(LEFT_PAREN):
-            expr = self.expression()
-            self.consume(
-                type=RIGHT_PAREN, message="Expect ')' after expression."
-            )
-            return Expr.Grouping(expression=expr)
-
-        raise self.error(token=self.peek(), message="Expect expression.")
-
     # # #
     # # #   Utilities
     # # #
@@ -437,7 +456,8 @@ class Parser:
 
     def advance(self):
         if not self.is_at_end():
-            self.current += 1
+            self.previous_token = self.current
+            self.current = next(self.tokens)
 
         return self.previous()
 
@@ -445,7 +465,7 @@ class Parser:
         return self.peek().type == EOF
 
     def peek(self):
-        return self.tokens[self.current]
+        return self.current
 
     def previous(self):
-        return self.tokens[self.current - 1]
+        return self.previous_token
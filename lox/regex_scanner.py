@@ -0,0 +1,125 @@
+import re
+import sys
+
+from .scanner import KEYWORDS
+from .token_ import Token
+from .token_type import (
+    LEFT_PAREN, RIGHT_PAREN, LEFT_BRACE, RIGHT_BRACE, LEFT_BRACKET,
+    RIGHT_BRACKET, COMMA, DOT, MINUS, PLUS, SEMICOLON, SLASH, STAR, BANG,
+    BANG_EQUAL, EQUAL, EQUAL_EQUAL, GREATER, GREATER_EQUAL, LESS, LESS_EQUAL,
+    IDENTIFIER, STRING, NUMBER, EOF,
+)
+
+
+OPERATORS = {
+    "(": LEFT_PAREN,
+    ")": RIGHT_PAREN,
+    "{": LEFT_BRACE,
+    "}": RIGHT_BRACE,
+    "[": LEFT_BRACKET,
+    "]": RIGHT_BRACKET,
+    ",": COMMA,
+    ".": DOT,
+    "-": MINUS,
+    "+": PLUS,
+    ";": SEMICOLON,
+    "/": SLASH,
+    "*": STAR,
+    "!": BANG,
+    "!=": BANG_EQUAL,
+    "=": EQUAL,
+    "==": EQUAL_EQUAL,
+    ">": GREATER,
+    ">=": GREATER_EQUAL,
+    "<": LESS,
+    "<=": LESS_EQUAL,
+}
+
+# spaces, then one alternative for everything that can come after them,
+# tried in order. Everything matches something, so matches follow on from
+# each other all the way through the source. Digits and letters are only
+# ASCII ones, like in the Scanner
+TOKEN_REGEX = re.compile(r"""
+    [ \r\t]*
+    (?:
+        (?P<identifier>[A-Za-z_][A-Za-z0-9_]*)
+      | (?P<comment>//[^\n]*)
+      | (?P<block_comment>/\*[\s\S]*?(?:\*/|\Z))
+      | (?P<operator>[!=<>]=?|[(){}\[\],.\-+;/*])
+      | (?P<newline>\n)
+      | (?P<number>[0-9]+(?:\.[0-9]+)?)
+      | (?P<string>"[^"]*")
+      | (?P<unterminated>"[^"]*)
+      | (?P<unexpected>[\s\S])
+      | (?P<end>\Z)
+    )
+""", re.VERBOSE)
+
+
+class RegexScanner:
+    """Scanner that matches whole tokens with one regular expression
+
+    Gives exactly the same tokens and errors as the Scanner, but the regular
+    expression engine goes through the characters instead of Python code.
+    """
+    def __init__(self, source, error_handler, line=1):
+        self.source = source
+        self.error_handler = error_handler
+        self.tokens = []
+        # line the source starts on, when it's part of a bigger one
+        self.line = line
+
+    def scan_tokens(self):
+        self.tokens.extend(self.stream_tokens())
+        return self.tokens
+
+    def stream_tokens(self):
+        """Yields tokens as they're scanned, so they don't all have to be kept
+        in memory at once
+        """
+        line = self.line
+
+        for match in TOKEN_REGEX.finditer(self.source):
+            kind = match.lastgroup
+            # the token, without the spaces before it
+            text = match[kind]
+
+            if kind == "identifier":
+                yield Token(
+                    type=KEYWORDS.get(text, IDENTIFIER),
+                    lexeme=sys.intern(text),
+                    literal=None,
+                    line=line,
+                )
+            elif kind == "operator":
+                yield Token(
+                    type=OPERATORS[text], lexeme=text, literal=None, line=line
+                )
+            elif kind == "newline":
+                line += 1
+            elif kind == "number":
+                yield Token(
+                    type=NUMBER, lexeme=text, literal=float(text), line=line
+                )
+            elif kind == "string":
+                # a string's token is on the line it ends on
+                line += text.count("\n")
+                yield Token(
+                    type=STRING, lexeme=text, literal=text[1:-1], line=line
+                )
+            elif kind == "comment" or kind == "end":
+                continue
+            elif kind == "block_comment":
+                line += text.count("\n")
+            elif kind == "unterminated":
+                line += text.count("\n")
+                self.error(line=line, message="Unterminated string.")
+            else:
+                self.error(
+                    line=line, message=f"Unexpected character: {text}"
+                )
+
+        yield Token(type=EOF, lexeme="", literal=None, line=line)
+
+    def error(self, line, message):
+        self.error_handler.scanner_error(line=line, message=message)
@@ -1,3 +1,7 @@
+from collections import namedtuple
+
+from . import expr as Expr
+from . import stmt as Stmt
 from .callable_ import INIT
 
 
@@ -8,6 +12,9 @@ METHOD = "method"
 CLASS = "class"
 SUBCLASS = "subclass"
 
+# where a local lives in its environment, and whether it can be read yet
+Slot = namedtuple("Slot", ("index", "defined"))
+
 
 class Resolver:
     def __init__(self, interpreter):
@@ -17,37 +24,40 @@ class Resolver:
         self.current_class = None
         self.scopes = []
 
-    def resolve(self, *statements):
-        resolvers = {
+        # methods that resolve each class of node
+        self.resolvers = {
             # statements
-            "Block": self.block,
-            "Class": self.class_,
-            "Expression": self.expression,
-            "Function": self.function,
-            "If": self.if_,
-            "Print": self.print_,
-            "Return": self.return_,
-            "Var": self.var,
-            "While": self.while_,
+            Stmt.Block: self.block,
+            Stmt.Class: self.class_,
+            Stmt.Expression: self.expression,
+            Stmt.Function: self.function,
+            Stmt.If: self.if_,
+            Stmt.Print: self.print_,
+            Stmt.Return: self.return_,
+            Stmt.Var: self.var,
+            Stmt.While: self.while_,
 
             # expressions
-            "Array": self.array,
-            "Assign": self.assign,
-            "Binary": self.binary,
-            "Call": self.call,
-            "Get": self.get,
-            "Grouping": self.grouping,
-            "Literal": self.literal,
-            "Logical": self.logical,
-            "Set": self.set_,
-            "Super": self.super_,
-            "This": self.this,
-            "Unary": self.unary,
-            "Variable": self.variable,
+            Expr.Array: self.array,
+            Expr.Assign: self.assign,
+            Expr.Binary: self.binary,
+            Expr.Call: self.call,
+            Expr.Get: self.get,
+            Expr.Grouping: self.grouping,
+            Expr.Index: self.index,
+            Expr.Literal: self.literal,
+            Expr.Logical: self.logical,
+            Expr.Set: self.set_,
+            Expr.SetIndex: self.set_index,
+            Expr.Super: self.super_,
+            Expr.This: self.this,
+            Expr.Unary: self.unary,
+            Expr.Variable: self.variable,
         }
 
+    def resolve(self, *statements):
         for statement in statements:
-            resolvers[statement.__class__.__name__](statement)
+            self.resolvers[statement.__class__](statement)
 
     # # #
     # # #   Utilities
@@ -81,18 +91,23 @@ class Resolver:
                 token=name,
                 message="Already variable with this name in this scope.",
             )
-        self.scopes[-1][name.lexeme] = False
+            return
+        # locals are added to their environment in the order they're declared
+        scope[name.lexeme] = Slot(index=len(scope), defined=False)
 
     def define(self, name):
         if not self.scopes:
             return
 
-        self.scopes[-1][name.lexeme] = True
+        scope = self.scopes[-1]
+        scope[name.lexeme] = scope[name.lexeme]._replace(defined=True)
 
     def resolve_local(self, expr, name):
         for i, scope in reversed(list(enumerate(self.scopes))):
             if name.lexeme in scope:
-                self.interpreter.resolve(expr, (len(self.scopes) - 1 - i))
+                # stored on the node so it goes away with the syntax tree
+                expr.depth = len(self.scopes) - 1 - i
+                expr.slot = scope[name.lexeme].index
                 return
 
     # # #
@@ -125,11 +140,11 @@ class Resolver:
             self.current_class = SUBCLASS
             self.resolve(stmt.superclass)
             self.begin_scope()
-            self.scopes[-1]["super"] = True
+            self.scopes[-1]["super"] = Slot(index=0, defined=True)
 
         # create scope where this is defined
         self.begin_scope()
-        self.scopes[-1]["this"] = True
+        self.scopes[-1]["this"] = Slot(index=0, defined=True)
         for method in stmt.methods:
             declaration = INITIALIZER if method.name.lexeme == INIT else METHOD
             self.resolve_function(function=method, type=declaration)
@@ -179,6 +194,10 @@ class Resolver:
 
             self.resolve(stmt.value)
 
+            # the function can return before the call is made
+            if isinstance(stmt.value, Expr.Call):
+                stmt.value.tail = True
+
     def var(self, stmt):
         self.declare(name=stmt.name)
         if stmt.initializer is not None:
@@ -215,6 +234,10 @@ class Resolver:
     def grouping(self, expr):
         self.resolve(expr.expression)
 
+    def index(self, expr):
+        self.resolve(expr.object)
+        self.resolve(expr.index)
+
     def literal(self, expr):
         return
 
@@ -226,6 +249,11 @@ class Resolver:
         self.resolve(expr.value)
         self.resolve(expr.object)
 
+    def set_index(self, expr):
+        self.resolve(expr.object)
+        self.resolve(expr.index)
+        self.resolve(expr.value)
+
     def super_(self, expr):
         if self.current_class is None:
             self.error_handler.token_error(
@@ -254,7 +282,7 @@ class Resolver:
     def variable(self, expr):
         if (
             self.scopes and expr.name.lexeme in self.scopes[-1]
-            and self.scopes[-1][expr.name.lexeme] is False
+            and not self.scopes[-1][expr.name.lexeme].defined
         ):
             self.error_handler.token_error(
                 token=expr.name,
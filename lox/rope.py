@@ -0,0 +1,75 @@
+# concatenations shorter than this are copied into a str, which is smaller
+# and quicker than a Rope for short strings
+MIN_ROPE_LENGTH = 256
+
+
+class Rope:
+    """Lox string made by concatenating two others without copying them
+
+    Building a string in a loop (s = s + piece) with str copies everything
+    built so far on every iteration. A Rope keeps both halves (each a str or
+    a Rope) instead, so each concatenation takes constant time, and only
+    joins them into one str - flattening the rope - when the text is needed
+    to print it, compare it or hash it. The flattened text is kept in left,
+    with right set to None, so later uses (and ropes built on this one)
+    don't flatten it again.
+
+    Ropes are never shorter than MIN_ROPE_LENGTH.
+    """
+    __slots__ = ("left", "right", "length")
+
+    def __init__(self, left, right):
+        self.left = left
+        self.right = right
+        self.length = len(left) + len(right)
+
+    def __len__(self):
+        return self.length
+
+    def __str__(self):
+        if self.right is None:
+            return self.left
+
+        # ropes built in a loop can be as deep as the loop is long, so go
+        # through them with a stack instead of recursing
+        pieces = []
+        stack = [self]
+        while stack:
+            node = stack.pop()
+            if node.__class__ is Rope:
+                if node.right is None:
+                    pieces.append(node.left)
+                else:
+                    stack.append(node.right)
+                    stack.append(node.left)
+            else:
+                pieces.append(node)
+
+        text = "".join(pieces)
+        self.left = text
+        self.right = None
+        return text
+
+    def __eq__(self, other):
+        if isinstance(other, (str, Rope)):
+            return len(self) == len(other) and str(self) == str(other)
+        return NotImplemented
+
+    def __hash__(self):
+        return hash(str(self))
+
+    def __reduce__(self):
+        # pickled as the text, since a rope can be too deep to pickle
+        return (str, (str(self),))
+
+
+# Python types of Lox strings
+STRINGS = (str, Rope)
+
+
+def concat(left, right):
+    """Concatenates two Lox strings"""
+    if len(left) + len(right) < MIN_ROPE_LENGTH:
+        # ropes are never this short, so both are str
+        return left + right
+    return Rope(left, right)
@@ -1,3 +1,5 @@
+import sys
+
 from .token_ import Token
 # I will freely admit this is dumb, but I'd rather not from x import *
 from .token_type import (
@@ -90,6 +92,19 @@ class Scanner:
 
         return self.tokens
 
+    def stream_tokens(self):
+        """Yields tokens as they're scanned, so they don't all have to be kept
+        in memory at once
+        """
+        while not self.is_at_end():
+            self.start = self.current
+            self.scan_token()
+            # scanning a token adds one at most
+            yield from self.tokens
+            self.tokens.clear()
+
+        yield Token(type=EOF, lexeme="", literal=None, line=self.line)
+
     def scan_token(self):
         char = self.advance()
 
@@ -186,6 +201,9 @@ class Scanner:
             return
 
         text = self.source[self.start:self.current]
+        if type == IDENTIFIER:
+            # every use of a name shares one string
+            text = sys.intern(text)
         self.tokens.append(
             Token(type=type, lexeme=text, literal=literal, line=self.line)
         )
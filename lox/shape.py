@@ -0,0 +1,47 @@
+"""Hidden classes for instances
+
+Instances don't have their own dict of fields. Instead every instance has a
+shape, which maps field names to indexes in the instance's list of values.
+Instances of a class that get the same fields in the same order share their
+shapes, so the names are stored once per shape rather than once per instance.
+
+Since a shape (and the class it belongs to) says where every property of an
+instance is, Get and Set expressions remember what they found for the last few
+shapes they saw - their inline caches.
+"""
+
+# how many shapes an inline cache remembers before it stops adding more
+POLYMORPHIC_LIMIT = 4
+
+
+class Shape:
+    __slots__ = ("class_", "indexes", "transitions")
+
+    def __init__(self, class_, indexes):
+        self.class_ = class_
+        # field name -> index in the values of instances with this shape
+        self.indexes = indexes
+        # field name -> shape after adding that field, made once and shared
+        self.transitions = {}
+
+    def add(self, name):
+        """Shape an instance of this shape moves to when it gets a new field"""
+        shape = self.transitions.get(name)
+        if shape is None:
+            indexes = dict(self.indexes)
+            indexes[name] = len(indexes)
+            shape = self.transitions[name] = Shape(
+                class_=self.class_, indexes=indexes
+            )
+        return shape
+
+    def lookup(self, name):
+        """Where a property of instances with this shape is
+
+        Returns the index of a field with that name, otherwise the class's
+        method (None if it doesn't have one either). Fields shadow methods.
+        """
+        index = self.indexes.get(name)
+        if index is not None:
+            return index
+        return self.class_.find_method(name=name)
@@ -0,0 +1,206 @@
+import os
+import pathlib
+import pickle
+
+from .adaptive_interpreter import SPECIALIZATIONS, AdaptiveInterpreter
+from .cache import interpreter_version, without_gc
+from .callable_ import Clock, LoxInstance
+from .environment import Environment
+from .exceptions import SnapshotException
+from .interpreter import Interpreter
+from .natives import NATIVES
+from .stack_interpreter import StackInterpreter
+
+
+# backends whose state is all Lox values and syntax trees. The others hold
+# compiled Python code (or bytecode and objects of their own)
+SNAPSHOT_BACKENDS = (Interpreter, AdaptiveInterpreter, StackInterpreter)
+
+# objects with references that can chain without limit (like a linked list
+# of instances, or closures made by closures), which are saved one after
+# another instead of inside each other so pickle doesn't recurse as deep
+HEAP_CLASSES = {Environment, LoxInstance}
+
+# persistent ids, for objects that a snapshot refers to instead of copying
+GLOBALS = "globals"
+INTERPRETER = "interpreter"
+CLOCK = "clock"
+NATIVE = "native"
+SPECIALIZATION = "specialization"
+HEAP = "heap"
+
+
+def get_state(obj):
+    if isinstance(obj, LoxInstance):
+        return {slot: getattr(obj, slot) for slot in LoxInstance.__slots__}
+    return obj.__dict__
+
+
+def set_state(obj, state):
+    for name, value in state.items():
+        setattr(obj, name, value)
+
+
+class SnapshotPickler(pickle.Pickler):
+    def __init__(self, file, interpreter):
+        super().__init__(file, protocol=pickle.HIGHEST_PROTOCOL)
+        self.interpreter = interpreter
+        self.natives = {id(native): name for name, native in NATIVES.items()}
+        # classes made by the adaptive interpreter, which aren't in a module
+        self.specializations = {
+            specialized: key for key, specialized in SPECIALIZATIONS.items()
+        }
+        # heap objects in the order they're first seen, and their indexes
+        self.heap = []
+        self.indexes = {}
+
+    def persistent_id(self, obj):
+        if obj.__class__ in HEAP_CLASSES:
+            index = self.indexes.get(id(obj))
+            if index is None:
+                index = self.indexes[id(obj)] = len(self.heap)
+                self.heap.append(obj)
+            return (HEAP, index, obj.__class__)
+        if obj is self.interpreter.globals:
+            return (GLOBALS,)
+        if obj is self.interpreter:
+            return (INTERPRETER,)
+        if obj.__class__ is Clock:
+            return (CLOCK,)
+        if id(obj) in self.natives:
+            return (NATIVE, self.natives[id(obj)])
+        if obj.__class__ is type and obj in self.specializations:
+            return (SPECIALIZATION, self.specializations[obj])
+        return None
+
+
+class SnapshotUnpickler(pickle.Unpickler):
+    def __init__(self, file, interpreter):
+        super().__init__(file)
+        self.interpreter = interpreter
+        self.clock = Clock()
+        # heap objects in the order they're first seen, empty until their
+        # states are loaded
+        self.heap = []
+
+    def persistent_load(self, pid):
+        kind = pid[0]
+        if kind == HEAP:
+            _, index, class_ = pid
+            if index == len(self.heap):
+                self.heap.append(class_.__new__(class_))
+            return self.heap[index]
+        if kind == GLOBALS:
+            return self.interpreter.globals
+        if kind == INTERPRETER:
+            return self.interpreter
+        if kind == CLOCK:
+            return self.clock
+        if kind == NATIVE:
+            return NATIVES[pid[1]]
+        if kind == SPECIALIZATION:
+            return SPECIALIZATIONS[pid[1]]
+        raise pickle.UnpicklingError(f"unknown persistent id {pid!r}")
+
+
+def check_backend(interpreter):
+    if interpreter.__class__ not in SNAPSHOT_BACKENDS:
+        raise SnapshotException(
+            message=f"{interpreter.__class__.__name__} can't be snapshotted."
+        )
+
+
+def header(interpreter):
+    """What a snapshot has to have been saved with to be loaded"""
+    return (interpreter_version(), interpreter.__class__.__name__)
+
+
+def check_snapshot_path(interpreter, path):
+    """Checks a snapshot of an interpreter could be saved at path, so that's
+    known before running the program it'd be a snapshot of
+    """
+    check_backend(interpreter)
+    path = pathlib.Path(path)
+    if path.is_dir():
+        raise SnapshotException(message="Is a directory.")
+    if not path.parent.is_dir():
+        raise SnapshotException(message="No such directory.")
+    if not os.access(path.parent, os.W_OK):
+        raise SnapshotException(message="Permission denied.")
+
+
+def save_snapshot(interpreter, path):
+    """Saves the globals of an interpreter, and everything they refer to, to
+    a file at path
+
+    That's every class, function (with its closure and syntax tree) and
+    instance a program can still reach, so loading the snapshot puts a new
+    interpreter in the same state as one that has run the program. Natives
+    like clock are saved by name, and are the new interpreter's own.
+    """
+    check_backend(interpreter)
+    path = pathlib.Path(path)
+    # written to a temporary file first, so a snapshot that fails part way
+    # through never replaces one that's already there
+    temporary = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+    try:
+        with open(temporary, "wb") as f:
+            pickle.dump(header(interpreter), f)
+            pickler = SnapshotPickler(file=f, interpreter=interpreter)
+
+            def dump():
+                pickler.dump(interpreter.globals.values)
+                # the state of each heap object, which can refer to more
+                index = 0
+                while index < len(pickler.heap):
+                    pickler.dump(get_state(pickler.heap[index]))
+                    index += 1
+
+            without_gc(dump)
+        os.replace(temporary, path)
+    except RecursionError:
+        temporary.unlink(missing_ok=True)
+        raise SnapshotException(
+            message="Values are nested too deeply to snapshot."
+        ) from None
+    except OSError as e:
+        temporary.unlink(missing_ok=True)
+        raise SnapshotException(message=e.strerror + ".") from None
+    except BaseException:
+        temporary.unlink(missing_ok=True)
+        raise
+
+
+def load_snapshot(interpreter, path):
+    """Loads globals saved by save_snapshot into an interpreter"""
+    check_backend(interpreter)
+    try:
+        f = open(path, "rb")
+    except OSError as e:
+        raise SnapshotException(message=e.strerror + ".") from None
+    with f:
+        try:
+            saved_with = pickle.load(f)
+        except Exception:
+            raise SnapshotException(message="Not a snapshot.") from None
+        if saved_with != header(interpreter):
+            raise SnapshotException(
+                message="Snapshot was saved by a different version or backend."
+            )
+        unpickler = SnapshotUnpickler(file=f, interpreter=interpreter)
+
+        def load():
+            values = unpickler.load()
+            index = 0
+            while index < len(unpickler.heap):
+                set_state(unpickler.heap[index], unpickler.load())
+                index += 1
+            return values
+
+        try:
+            values = without_gc(load)
+        except Exception:
+            # cut short, or changed since it was saved
+            raise SnapshotException(message="Snapshot is corrupt.") from None
+
+    interpreter.globals.values.update(values)
@@ -0,0 +1,325 @@
+from types import GeneratorType
+
+from . import expr as Expr
+from .callable_ import (
+    RETURN_NIL, LoxCallable, LoxClass, LoxFunction, LoxInstance, TailCall
+)
+from .environment import Environment
+from .exceptions import NativeException, RuntimeException
+from .interpreter import (
+    UNCHECKED_OPERATIONS, Interpreter, check_element, check_index,
+    check_number_operands, is_truthy, stringify,
+)
+from .token_type import MINUS, BANG, OR
+
+
+# most Lox calls that can be running at once, unless another limit is given -
+# deeper recursion than this is reported as a stack overflow instead of using
+# up all the memory
+MAX_FRAMES = 100000
+
+
+class StackInterpreter(Interpreter):
+    """Tree-walk interpreter that doesn't recurse in Python
+
+    Nodes that contain other nodes are evaluated by generators, which yield
+    each node they need the value of and are sent the value back. run keeps
+    the generators that are waiting for a value on a list, so evaluating
+    deeply nested code (and Lox calls, which run their function's body the
+    same way) only makes that list longer instead of using Python's stack.
+
+    Generators can also yield generators, which run is sent the result of.
+    Nodes that don't contain others are evaluated the same way as in the
+    Interpreter.
+
+    Recursion is still limited, to max_frames Lox calls at once.
+    """
+
+    def __init__(self, error_handler, max_frames=MAX_FRAMES):
+        super().__init__(error_handler=error_handler)
+        # number of Lox calls being run, and how many there can be
+        self.frames = 0
+        self.max_frames = max_frames
+
+        # Interpreter's tables route to the generators here, which override
+        # the methods that evaluate nodes straight away
+        self.nodes = {**self.stmts, **self.exprs}
+
+    def interperet(self, statements):
+        super().interperet(statements=statements)
+        # a runtime error stops the program without leaving any scopes
+        self.environment = self.globals
+        self.frames = 0
+
+    def run(self, node):
+        """Evaluates a node, or runs a generator, and returns its value"""
+        nodes = self.nodes
+        if node.__class__ is not GeneratorType:
+            node = nodes[node.__class__](node)
+            if node.__class__ is not GeneratorType:
+                return node
+
+        stack = [node]
+        value = None
+        while True:
+            try:
+                node = stack[-1].send(value)
+            except StopIteration as stop:
+                stack.pop()
+                if not stack:
+                    return stop.value
+                value = stop.value
+                continue
+
+            if node.__class__ is not GeneratorType:
+                node = nodes[node.__class__](node)
+                if node.__class__ is not GeneratorType:
+                    value = node
+                    continue
+            stack.append(node)
+            value = None
+
+    def run_function(self, function, arguments, paren):
+        """Generator that runs a Lox function's body, as a call at paren"""
+        if self.frames == self.max_frames:
+            raise RuntimeException(token=paren, message="Stack overflow.")
+        self.frames += 1
+
+        previous = self.environment
+        while True:
+            environment = Environment(enclosing=function.closure)
+            environment.values = arguments
+            self.environment = environment
+
+            completion = None
+            for statement in function.declaration.body:
+                completion = yield statement
+                if completion is not None:
+                    break
+
+            if completion.__class__ is not TailCall:
+                break
+            function = completion.function
+            arguments = completion.arguments
+
+        self.environment = previous
+        self.frames -= 1
+
+        if function.is_initializer:
+            return function.closure.values[0]
+        if completion is RETURN_NIL:
+            return None
+        return completion
+
+    def scope(self, statements, environment):
+        """Generator that runs statements in an environment"""
+        previous = self.environment
+        self.environment = environment
+
+        completion = None
+        for statement in statements:
+            completion = yield statement
+            # stop at a return statement
+            if completion is not None:
+                break
+
+        self.environment = previous
+        return completion
+
+    # # #
+    # # #   Statements
+    # # #
+    def execute(self, stmt):
+        return self.run(node=stmt)
+
+    def block(self, stmt):
+        return self.scope(
+            statements=stmt.statements,
+            environment=Environment(enclosing=self.environment),
+        )
+
+    def execute_block(self, statements, environment):
+        return self.run(
+            node=self.scope(statements=statements, environment=environment)
+        )
+
+    def expression(self, stmt):
+        yield stmt.expression
+
+    def if_(self, stmt):
+        if is_truthy((yield stmt.condition)):
+            return (yield stmt.then_branch)
+        elif stmt.else_branch is not None:
+            return (yield stmt.else_branch)
+
+    def print_(self, stmt):
+        value = yield stmt.expression
+        print(stringify(obj=value))
+
+    def return_(self, stmt):
+        if stmt.value is None:
+            return RETURN_NIL
+
+        value = yield stmt.value
+        return RETURN_NIL if value is None else value
+
+    def var(self, stmt):
+        value = None
+        if stmt.initializer is not None:
+            value = yield stmt.initializer
+        self.environment.define(name=stmt.name.lexeme, value=value)
+
+    def while_(self, stmt):
+        while is_truthy((yield stmt.condition)):
+            completion = yield stmt.body
+            if completion is not None:
+                return completion
+
+    # # #
+    # # #   Expressions
+    # # #
+    def evaluate(self, expr):
+        return self.run(node=expr)
+
+    def array(self, expr):
+        values = []
+        for element in expr.values:
+            values.append((yield element))
+        return values
+
+    def assign(self, expr):
+        value = yield expr.value
+
+        if expr.depth is not None:
+            self.environment.assign_at(
+                distance=expr.depth, slot=expr.slot, value=value
+            )
+        else:
+            self.globals.assign(name=expr.name, value=value)
+
+        return value
+
+    def binary(self, expr):
+        left = yield expr.left
+        right = yield expr.right
+        if expr.unchecked:
+            return UNCHECKED_OPERATIONS[expr.operator.type](left, right)
+        return self.binary_operation(
+            operator=expr.operator, left=left, right=right
+        )
+
+    def call(self, expr):
+        if isinstance(expr.callee, Expr.Get):
+            # get for a callee, which can reuse bound methods
+            obj = yield expr.callee.object
+            if not isinstance(obj, LoxInstance):
+                raise RuntimeException(
+                    token=expr.callee.name,
+                    message="Only instances have properties.",
+                )
+            callee = obj.get_method(
+                name=expr.callee.name, cache=expr.callee.cache
+            )
+        else:
+            callee = yield expr.callee
+
+        if not isinstance(callee, LoxCallable):
+            raise RuntimeException(
+                token=expr.paren,
+                message="Can only call functions and classes."
+            )
+
+        arguments = []
+        for argument in expr.expressions:
+            arguments.append((yield argument))
+
+        if len(arguments) != callee.arity():
+            raise RuntimeException(
+                token=expr.paren,
+                message=f"Expected {callee.arity()} arguments but got {len(arguments)}."  # noqa: E501
+            )
+
+        # Lox functions and initializers are run by run, like everything else
+        if isinstance(callee, LoxFunction):
+            if expr.tail:
+                return TailCall(function=callee, arguments=arguments)
+            return (yield self.run_function(
+                function=callee, arguments=arguments, paren=expr.paren
+            ))
+        if isinstance(callee, LoxClass):
+            instance = LoxInstance(class_=callee)
+            if callee.initializer is not None:
+                yield self.run_function(
+                    function=callee.initializer.bind(instance=instance),
+                    arguments=arguments,
+                    paren=expr.paren,
+                )
+            return instance
+
+        try:
+            return callee.call(interpreter=self, arguments=arguments)
+        except NativeException as e:
+            raise RuntimeException(
+                token=expr.paren, message=e.message
+            ) from None
+
+    def get(self, expr):
+        obj = yield expr.object
+        if isinstance(obj, LoxInstance):
+            return obj.get(name=expr.name, cache=expr.cache)
+
+        raise RuntimeException(
+            token=expr.name, message="Only instances have properties."
+        )
+
+    def grouping(self, expr):
+        return (yield expr.expression)
+
+    def index(self, expr):
+        array = yield expr.object
+        index = yield expr.index
+        return array[check_index(array=array, index=index, token=expr.bracket)]
+
+    def logical(self, expr):
+        left = yield expr.left
+
+        if expr.operator.type == OR:
+            if is_truthy(obj=left):
+                return left
+        else:
+            if not is_truthy(obj=left):
+                return left
+
+        return (yield expr.right)
+
+    def set_(self, expr):
+        obj = yield expr.object
+
+        if not isinstance(obj, LoxInstance):
+            raise RuntimeException(
+                token=expr.name, message="Only instances have fields."
+            )
+
+        value = yield expr.value
+        obj.set(name=expr.name, value=value, cache=expr.cache)
+        return value
+
+    def set_index(self, expr):
+        array = yield expr.object
+        index = yield expr.index
+        value = yield expr.value
+        index = check_index(array=array, index=index, token=expr.bracket)
+        check_element(array=array, value=value, token=expr.bracket)
+        array[index] = value
+        return value
+
+    def unary(self, expr):
+        right = yield expr.right
+
+        if expr.operator.type == MINUS:
+            if expr.unchecked:
+                return -right
+            check_number_operands(expr.operator, right)
+            return - float(right)
+        if expr.operator.type == BANG:
+            return not is_truthy(obj=right)
@@ -1,11 +1,114 @@
-from collections import namedtuple
-
-Block = namedtuple("Block", ("statements"))
-Class = namedtuple("Class", ("name", "superclass", "methods"))
-Expression = namedtuple("Expression", ("expression"))
-Function = namedtuple("Function", ("name", "params", "body"))
-If = namedtuple("If", ("condition", "then_branch", "else_branch"))
-Print = namedtuple("Print", ("expression"))
-Return = namedtuple("Return", ("keyword", "value"))
-Var = namedtuple("Var", ("name", "initializer"))
-While = namedtuple("While", ("condition", "body"))
+# Auto-generated by tool/generate_ast.py
+
+
+class Stmt:
+    """Base class of every statement node
+
+    Nodes use __slots__ to keep them small, and compare and hash by identity so
+    two nodes that look the same are still different nodes. kind is unique to
+    each node class, across expressions and statements.
+    """
+    __slots__ = ()
+    fields = ()
+
+    def __repr__(self):
+        values = ", ".join(
+            f"{f}={getattr(self, f)!r}" for f in self.fields
+        )
+        return f"{self.__class__.__name__}({values})"
+
+
+class Block(Stmt):
+    __slots__ = ("statements",)
+    fields = ("statements",)
+    kind = 15
+
+    def __init__(self, statements):
+        self.statements = statements
+
+
+class Class(Stmt):
+    __slots__ = ("name", "superclass", "methods")
+    fields = ("name", "superclass", "methods")
+    kind = 16
+
+    def __init__(self, name, superclass, methods):
+        self.name = name
+        self.superclass = superclass
+        self.methods = methods
+
+
+class Expression(Stmt):
+    __slots__ = ("expression",)
+    fields = ("expression",)
+    kind = 17
+
+    def __init__(self, expression):
+        self.expression = expression
+
+
+class Function(Stmt):
+    __slots__ = ("name", "params", "body", "runs", "compiler", "compiled")
+    fields = ("name", "params", "body")
+    kind = 18
+
+    def __init__(self, name, params, body):
+        self.name = name
+        self.params = params
+        self.body = body
+        self.runs = 0
+        self.compiler = None
+        self.compiled = None
+
+
+class If(Stmt):
+    __slots__ = ("condition", "then_branch", "else_branch")
+    fields = ("condition", "then_branch", "else_branch")
+    kind = 19
+
+    def __init__(self, condition, then_branch, else_branch):
+        self.condition = condition
+        self.then_branch = then_branch
+        self.else_branch = else_branch
+
+
+class Print(Stmt):
+    __slots__ = ("expression",)
+    fields = ("expression",)
+    kind = 20
+
+    def __init__(self, expression):
+        self.expression = expression
+
+
+class Return(Stmt):
+    __slots__ = ("keyword", "value")
+    fields = ("keyword", "value")
+    kind = 21
+
+    def __init__(self, keyword, value):
+        self.keyword = keyword
+        self.value = value
+
+
+class Var(Stmt):
+    __slots__ = ("name", "initializer")
+    fields = ("name", "initializer")
+    kind = 22
+
+    def __init__(self, name, initializer):
+        self.name = name
+        self.initializer = initializer
+
+
+class While(Stmt):
+    __slots__ = ("condition", "body", "runs", "compiler", "compiled")
+    fields = ("condition", "body")
+    kind = 23
+
+    def __init__(self, condition, body):
+        self.condition = condition
+        self.body = body
+        self.runs = 0
+        self.compiler = None
+        self.compiled = None
@@ -0,0 +1,180 @@
+import sys
+
+from . import expr as Expr
+from . import stmt as Stmt
+from .callable_ import LoxFunction
+from .closure_interpreter import ClosureInterpreter, CompiledFunction
+from .environment import Environment
+from .interpreter import Interpreter, is_truthy
+from .token_ import Token
+
+
+# calls (plus iterations of loops in its body) a function is walked for
+# before it's compiled
+FUNCTION_THRESHOLD = 100
+# iterations a loop is walked for before the rest of it is compiled
+LOOP_THRESHOLD = 100
+
+
+def first_line(expr):
+    """Line of the first token in an expression, or ? if it has none"""
+    for field in expr.fields:
+        value = getattr(expr, field)
+        if isinstance(value, Token):
+            return value.line
+        if isinstance(value, Expr.Expr):
+            line = first_line(value)
+            if line != "?":
+                return line
+    return "?"
+
+
+class TieredFunction(CompiledFunction):
+    """CompiledFunction whose body is walked by the TieredInterpreter until
+    it's hot, and compiled from then on
+    """
+    def __init__(self, declaration, closure, interpreter,
+                 is_initializer=False):
+        LoxFunction.__init__(
+            self,
+            declaration=declaration,
+            closure=closure,
+            is_initializer=is_initializer,
+        )
+        self.interpreter = interpreter
+        # compiled body, once the declaration is hot
+        self.compiled = None
+
+    def bind(self, instance):
+        environment = Environment(enclosing=self.closure)
+        environment.define(name="this", value=instance)
+        function = TieredFunction(
+            declaration=self.declaration,
+            closure=environment,
+            interpreter=self.interpreter,
+            is_initializer=self.is_initializer,
+        )
+        if self.compiled is not None:
+            function.compiled = function.body = self.compiled
+        return function
+
+    def body(self, environment):
+        """Runs the body in an environment, returning its completion"""
+        self.compiled = self.interpreter.profile_function(
+            declaration=self.declaration
+        )
+        if self.compiled is None:
+            return self.interpreter.walk_function(
+                declaration=self.declaration, environment=environment
+            )
+
+        # hides this method, so calls go straight to the compiled body
+        self.body = self.compiled
+        return self.compiled(environment)
+
+
+class TieredInterpreter(Interpreter):
+    """Tree-walk interpreter that compiles the code that runs the most
+
+    Functions count their calls and loops count their iterations. Code is
+    walked until its count crosses a threshold, so code that only runs a few
+    times never pays for compiling, and is then compiled into closures by a
+    ClosureInterpreter. That uses the same environments as walking does, so
+    the two can call each other freely, and a hot loop carries on from the
+    iteration it got to with its compiled code.
+
+    Loop iterations also count towards the function the loop is in, so a
+    function with a hot loop is compiled the next time it's called.
+
+    Counts and compiled code are kept on the function declarations and loops
+    themselves, so they go when the syntax tree does.
+    """
+
+    def __init__(self, error_handler, debug=False):
+        super().__init__(error_handler=error_handler)
+        # print the tiering decisions as they're made
+        self.debug = debug
+        # compiles hot code to run with the environments of this interpreter
+        self.compiler = ClosureInterpreter(error_handler=error_handler)
+        self.compiler.globals = self.globals
+        self.compiler.environment = self.globals
+
+        # declaration of the function being walked
+        self.function = None
+
+    def new_function(self, declaration, closure, is_initializer=False):
+        return TieredFunction(
+            declaration=declaration,
+            closure=closure,
+            interpreter=self,
+            is_initializer=is_initializer,
+        )
+
+    def profile_function(self, declaration):
+        """Counts a call to a function, returning its compiled body if it's
+        hot enough to have one
+        """
+        if declaration.compiler is self.compiler:
+            return declaration.compiled
+
+        declaration.runs += 1
+        if declaration.runs < FUNCTION_THRESHOLD:
+            return None
+        return self.compile(
+            node=declaration,
+            description=f"function {declaration.name.lexeme}",
+            compile=lambda: self.compiler.compile_scope(declaration.body),
+        )
+
+    def walk_function(self, declaration, environment):
+        """Walks a function's body in an environment"""
+        enclosing = self.function
+        self.function = declaration
+        try:
+            return self.execute_block(
+                statements=declaration.body, environment=environment
+            )
+        finally:
+            self.function = enclosing
+
+    def compile(self, node, description, compile):
+        """Compiles a hot function or loop, keeping the compiled code on it"""
+        compiled = node.compiled = compile()
+        node.compiler = self.compiler
+        if self.debug:
+            line = (
+                node.name.line if isinstance(node, Stmt.Function)
+                else first_line(node.condition)
+            )
+            print(
+                f"[line {line}] compiled {description} after {node.runs} runs",
+                file=sys.stderr,
+            )
+        return compiled
+
+    # # #
+    # # #   Statements
+    # # #
+    def while_(self, stmt):
+        if stmt.compiler is self.compiler:
+            return stmt.compiled(self.environment)
+
+        while is_truthy(self.evaluate(expr=stmt.condition)):
+            completion = self.execute(stmt=stmt.body)
+            if completion is not None:
+                return completion
+
+            if self.function is not None:
+                self.function.runs += 1
+            stmt.runs += 1
+            # runs can start past the threshold if another interpreter ran
+            # the loop before
+            if stmt.runs >= LOOP_THRESHOLD:
+                compiled = self.compile(
+                    node=stmt,
+                    description="loop",
+                    compile=lambda: self.compiler.compile_stmt(stmt),
+                )
+                # the condition hasn't been checked for the next iteration
+                # yet, which the compiled loop starts with
+                return compiled(self.environment)
@@ -1,4 +1,13 @@
 class Token:
+    """A lexeme from the source, with its type, literal value and line
+
+    There are a lot of tokens, so they use __slots__ instead of a __dict__,
+    and scanners intern the lexemes of identifiers. Every use of a name then
+    shares one string, so environments and instances looking it up find the
+    key by identity instead of comparing characters.
+    """
+    __slots__ = ("type", "lexeme", "literal", "line")
+
     def __init__(self, type, lexeme, literal, line):
         self.type = type
         self.lexeme = lexeme
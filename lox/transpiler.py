@@ -0,0 +1,1155 @@
+import math
+from functools import partial
+from types import FunctionType
+
+from . import expr as Expr
+from . import stmt as Stmt
+from .callable_ import INIT, Clock, LoxCallable
+from .exceptions import NativeException, RuntimeException
+from .interpreter import check_element, check_index, stringify
+from .natives import NATIVES, FloatArray
+from .rope import STRINGS, concat
+from .token_ import Token
+from .token_type import (
+    MINUS, PLUS, SLASH, STAR, BANG, BANG_EQUAL, EQUAL_EQUAL, GREATER,
+    GREATER_EQUAL, LESS, LESS_EQUAL, OR, IDENTIFIER, LEFT_PAREN,
+)
+
+
+COMPARISONS = {
+    GREATER: ">",
+    GREATER_EQUAL: ">=",
+    LESS: "<",
+    LESS_EQUAL: "<=",
+}
+
+ARITHMETIC = {
+    MINUS: "-",
+    STAR: "*",
+}
+
+# nodes that can't change any state when they're evaluated, so evaluating
+# something else before or after them doesn't matter
+PURE = (
+    Expr.Grouping, Expr.Literal, Expr.Variable, Expr.This, Expr.Binary,
+    Expr.Unary,
+)
+
+
+# # #
+# # #   Runtime used by the generated code
+# # #
+class LoxPyClass:
+    """A class made by generated code - methods are plain Python functions"""
+    __slots__ = ("name", "methods", "initializer", "construct")
+
+    def __init__(self, name, superclass, methods):
+        self.name = name
+        # copy superclass methods down so lookups never walk the superclasses
+        self.methods = {}
+        if superclass is not None:
+            self.methods.update(superclass.methods)
+        self.methods.update(methods)
+
+        initializer = self.initializer = self.methods.get(INIT)
+
+        def construct(*arguments):
+            instance = LoxPyInstance(class_=self)
+            if initializer is not None:
+                initializer(instance, *arguments)
+            return instance
+
+        self.construct = construct
+
+    def arity(self):
+        if self.initializer is None:
+            return 0
+        return self.initializer.__code__.co_argcount - 1
+
+    def __str__(self):
+        return self.name
+
+
+class LoxPyInstance:
+    __slots__ = ("class_", "fields")
+
+    def __init__(self, class_):
+        self.class_ = class_
+        self.fields = {}
+
+    def __str__(self):
+        return self.class_.name + " instance"
+
+
+def lox_name(function):
+    """Name of a Lox function, given the Python function it was turned into"""
+    if type(function) is partial:
+        function = function.func
+    # generated names are a prefix, an underscore, then the Lox name
+    return function.__code__.co_name.split("_", 1)[1]
+
+
+def stringify_py(obj):
+    if type(obj) is FunctionType or type(obj) is partial:
+        return f"<fn {lox_name(obj)}>"
+    if isinstance(obj, (list, FloatArray)):
+        return "[" + ", ".join([stringify_py(e) for e in obj]) + "]"
+    return stringify(obj)
+
+
+def arity_of(callee):
+    """Arity of anything that can be called, None if it can't be"""
+    if type(callee) is FunctionType:
+        return callee.__code__.co_argcount
+    if type(callee) is partial:
+        return callee.func.__code__.co_argcount - len(callee.args)
+    if isinstance(callee, (LoxPyClass, LoxCallable)):
+        return callee.arity()
+    return None
+
+
+def arity_error(expected, got, token):
+    def raise_arity_error(*arguments):
+        raise RuntimeException(
+            token=token,
+            message=f"Expected {expected} arguments but got {got}.",
+        )
+
+    return raise_arity_error
+
+
+def check_call(callee, argc, token):
+    """Returns the Python callable that does the Lox call
+
+    Arguments are evaluated after this returns, so an arity error comes
+    back as a callable that raises it once the arguments are evaluated - the
+    same order the interpreter reports errors in.
+    """
+    arity = arity_of(callee)
+    if arity is None:
+        raise RuntimeException(
+            token=token, message="Can only call functions and classes."
+        )
+    if arity != argc:
+        return arity_error(expected=arity, got=argc, token=token)
+
+    if isinstance(callee, LoxPyClass):
+        return callee.construct
+    if isinstance(callee, LoxCallable):
+        def call(*arguments):
+            try:
+                return callee.call(
+                    interpreter=None, arguments=list(arguments)
+                )
+            except NativeException as e:
+                raise RuntimeException(
+                    token=token, message=e.message
+                ) from None
+
+        return call
+    return callee
+
+
+def check_invoke(instance, name, argc, name_token, paren):
+    """Returns a Python callable that takes the instance then the arguments"""
+    if type(instance) is not LoxPyInstance:
+        raise RuntimeException(
+            token=name_token, message="Only instances have properties."
+        )
+
+    if name in instance.fields:
+        function = check_call(instance.fields[name], argc, paren)
+        return lambda this, *arguments: function(*arguments)
+
+    method = instance.class_.methods.get(name)
+    if method is None:
+        raise RuntimeException(
+            token=name_token, message=f"Undefined property '{name}'."
+        )
+    if method.__code__.co_argcount - 1 != argc:
+        return arity_error(
+            expected=method.__code__.co_argcount - 1, got=argc, token=paren
+        )
+    return method
+
+
+def get_property(instance, name, token):
+    if type(instance) is not LoxPyInstance:
+        raise RuntimeException(
+            token=token, message="Only instances have properties."
+        )
+    if name in instance.fields:
+        return instance.fields[name]
+
+    method = instance.class_.methods.get(name)
+    if method is None:
+        raise RuntimeException(
+            token=token, message=f"Undefined property '{name}'."
+        )
+    return partial(method, instance)
+
+
+def check_instance(instance, token):
+    if type(instance) is not LoxPyInstance:
+        raise RuntimeException(
+            token=token, message="Only instances have fields."
+        )
+    return instance
+
+
+def set_field(instance, name, value):
+    instance.fields[name] = value
+    return value
+
+
+def get_index(array, index, token):
+    return array[check_index(array=array, index=index, token=token)]
+
+
+def set_index(array, index, value, token):
+    index = check_index(array=array, index=index, token=token)
+    check_element(array=array, value=value, token=token)
+    array[index] = value
+    return value
+
+
+def super_method(superclass, name, token):
+    method = superclass.methods.get(name)
+    if method is None:
+        raise RuntimeException(
+            token=token, message=f"Undefined property '{name}'."
+        )
+    return method
+
+
+def super_invoke(superclass, name, argc, name_token, paren):
+    method = super_method(superclass, name, name_token)
+    if method.__code__.co_argcount - 1 != argc:
+        return arity_error(
+            expected=method.__code__.co_argcount - 1, got=argc, token=paren
+        )
+    return method
+
+
+def check_superclass(superclass, token):
+    if not isinstance(superclass, LoxPyClass):
+        raise RuntimeException(
+            token=token, message="Superclass must be a class."
+        )
+    return superclass
+
+
+def divide_error(a, b, token):
+    if type(a) is type(b) is float:
+        raise RuntimeException(token=token, message="Division by zero error.")
+    raise RuntimeException(token=token, message="Operands must be numbers.")
+
+
+def add_strings(a, b, token):
+    if isinstance(a, STRINGS) and isinstance(b, STRINGS):
+        return concat(a, b)
+    raise RuntimeException(
+        token=token, message="Operands must be two numbers or two strings."
+    )
+
+
+def raise_error(token, message):
+    raise RuntimeException(token=token, message=message)
+
+
+def set_box(box, value):
+    box[0] = value
+    return value
+
+
+RUNTIME = {
+    "_function": FunctionType,
+    "_float": float,
+    "_bool": bool,
+    "_instance": LoxPyInstance,
+    "_class": LoxPyClass,
+    "_stringify": stringify_py,
+    "_call": check_call,
+    "_invoke": check_invoke,
+    "_get": get_property,
+    "_check_instance": check_instance,
+    "_set": set_field,
+    "_get_index": get_index,
+    "_set_index": set_index,
+    "_super": super_method,
+    "_super_invoke": super_invoke,
+    "_partial": partial,
+    "_superclass": check_superclass,
+    "_concat": concat,
+    "_add_strings": add_strings,
+    "_divide_error": divide_error,
+    "_error": raise_error,
+    "_set_box": set_box,
+}
+
+
+# # #
+# # #   Scope analysis
+# # #
+class Binding:
+    """A Lox variable and the Python name it's stored in"""
+    def __init__(self, pyname, function, in_loop):
+        self.pyname = pyname
+        self.function = function
+        self.in_loop = in_loop
+        self.captured = False
+
+    @property
+    def boxed(self):
+        """Closures made in a loop need their own copy of loop variables
+
+        Python closures share one cell per variable for every closure made by
+        a call, but Lox makes a fresh variable every time a declaration runs.
+        Variables like that live in a one-element list instead, and closures
+        get the list as a default argument when they're made.
+        """
+        return self.captured and self.in_loop
+
+
+class FunctionInfo:
+    def __init__(self, parent):
+        self.parent = parent
+        self.loop_depth = 0
+        # bindings of the parent function this function (or a function
+        # inside it) uses - boxed ones are passed as default arguments
+        self.free = []
+        # bindings of enclosing functions this function assigns to
+        self.assigned = []
+
+
+class ScopeAnalyzer:
+    """Works out which Python name holds each Lox variable
+
+    Follows the same scope rules as the Resolver, so a name resolves to the
+    same declaration in both.
+    """
+    def __init__(self):
+        self.counter = 0
+        self.scopes = []
+        self.function = FunctionInfo(parent=None)
+        # results, by id of the node
+        self.bindings = {}
+        self.references = {}
+        self.functions = {}
+
+        self.analyzers = {
+            Stmt.Block: self.block,
+            Stmt.Class: self.class_,
+            Stmt.Expression: lambda stmt: self.analyze(stmt.expression),
+            Stmt.Function: self.function_stmt,
+            Stmt.If: self.if_,
+            Stmt.Print: lambda stmt: self.analyze(stmt.expression),
+            Stmt.Return: self.return_,
+            Stmt.Var: self.var,
+            Stmt.While: self.while_,
+
+            Expr.Array: lambda expr: self.analyze(*expr.values),
+            Expr.Assign: self.assign,
+            Expr.Binary: lambda expr: self.analyze(expr.left, expr.right),
+            Expr.Call: lambda expr: self.analyze(
+                expr.callee, *expr.expressions
+            ),
+            Expr.Get: lambda expr: self.analyze(expr.object),
+            Expr.Grouping: lambda expr: self.analyze(expr.expression),
+            Expr.Index: lambda expr: self.analyze(expr.object, expr.index),
+            Expr.Literal: lambda expr: None,
+            Expr.Logical: lambda expr: self.analyze(expr.left, expr.right),
+            Expr.Set: lambda expr: self.analyze(expr.value, expr.object),
+            Expr.SetIndex: lambda expr: self.analyze(
+                expr.object, expr.index, expr.value
+            ),
+            Expr.Super: self.super_,
+            Expr.This: lambda expr: self.reference(id(expr), "this"),
+            Expr.Unary: lambda expr: self.analyze(expr.right),
+            Expr.Variable: lambda expr: self.reference(
+                id(expr), expr.name.lexeme
+            ),
+        }
+
+    def analyze(self, *statements):
+        for node in statements:
+            self.analyzers[node.__class__](node)
+
+    def declare(self, key, name):
+        if not self.scopes:
+            binding = Binding(
+                pyname=f"G_{name}", function=None, in_loop=False
+            )
+        else:
+            self.counter += 1
+            binding = Binding(
+                pyname=f"L{self.counter}_{name}",
+                function=self.function,
+                in_loop=self.function.loop_depth > 0,
+            )
+            self.scopes[-1][name] = binding
+
+        self.bindings[key] = binding
+        return binding
+
+    def reference(self, key, name, assign=False):
+        for scope in reversed(self.scopes):
+            if name in scope:
+                binding = scope[name]
+                break
+        else:
+            # globals are late bound
+            self.references[key] = None
+            return
+
+        self.references[key] = binding
+
+        if binding.function is not self.function:
+            binding.captured = True
+            if assign:
+                self.function.assigned.append(binding)
+
+            # the function right inside the one that declared the variable
+            # is the one that has to capture it
+            function = self.function
+            while function.parent is not binding.function:
+                function = function.parent
+            if binding not in function.free:
+                function.free.append(binding)
+
+    def resolve_function(self, stmt, this_key=None):
+        enclosing = self.function
+        self.function = self.functions[id(stmt)] = FunctionInfo(
+            parent=enclosing
+        )
+
+        if this_key is not None:
+            self.scopes.append({})
+            self.declare(this_key, "this")
+
+        self.scopes.append({})
+        for param in stmt.params:
+            self.declare(id(param), param.lexeme)
+        self.analyze(*stmt.body)
+        self.scopes.pop()
+
+        if this_key is not None:
+            self.scopes.pop()
+        self.function = enclosing
+
+    def block(self, stmt):
+        self.scopes.append({})
+        self.analyze(*stmt.statements)
+        self.scopes.pop()
+
+    def class_(self, stmt):
+        self.declare(id(stmt), stmt.name.lexeme)
+
+        if stmt.superclass is not None:
+            self.analyze(stmt.superclass)
+            self.scopes.append({})
+            self.declare((id(stmt), "super"), "super")
+
+        for method in stmt.methods:
+            self.resolve_function(method, this_key=(id(method), "this"))
+
+        if stmt.superclass is not None:
+            self.scopes.pop()
+
+    def function_stmt(self, stmt):
+        self.declare(id(stmt), stmt.name.lexeme)
+        self.resolve_function(stmt)
+
+    def if_(self, stmt):
+        self.analyze(stmt.condition, stmt.then_branch)
+        if stmt.else_branch is not None:
+            self.analyze(stmt.else_branch)
+
+    def return_(self, stmt):
+        if stmt.value is not None:
+            self.analyze(stmt.value)
+
+    def var(self, stmt):
+        if stmt.initializer is not None:
+            self.analyze(stmt.initializer)
+        self.declare(id(stmt), stmt.name.lexeme)
+
+    def while_(self, stmt):
+        self.analyze(stmt.condition)
+        self.function.loop_depth += 1
+        self.analyze(stmt.body)
+        self.function.loop_depth -= 1
+
+    def assign(self, expr):
+        self.analyze(expr.value)
+        self.reference(id(expr), expr.name.lexeme, assign=True)
+
+    def super_(self, expr):
+        self.reference(id(expr), "super")
+        self.reference((id(expr), "this"), "this")
+
+
+# # #
+# # #   Code generation
+# # #
+class Transpiler:
+    """Turns a whole resolved program into Python source and runs it
+
+    Lox functions become Python functions and Lox variables become Python
+    variables, so CPython's own bytecode does the work. The checks the
+    interpreter does at runtime (number operands, truthiness, equality) are
+    written out in the generated code. The generated source is written to the
+    path dump, if there is one, for inspection.
+    """
+    def __init__(self, error_handler, dump=None):
+        self.error_handler = error_handler
+        self.dump = dump
+        self.namespace = dict(RUNTIME)
+        self.namespace["G_clock"] = Clock()
+        for name, native in NATIVES.items():
+            self.namespace["G_" + name] = native
+        self.namespace["_set_global"] = self.set_global
+        self.runs = 0
+        # Lox tokens for the Python line numbers of each run, so undefined
+        # globals (which Python finds) can be reported at the right line
+        self.global_reads = {}
+        # and the paren of the first call on each line, for stack overflows
+        self.global_calls = {}
+
+        # methods that generate code for each class of node
+        self.stmts = {
+            Stmt.Block: self.block,
+            Stmt.Class: self.class_,
+            Stmt.Expression: self.expression,
+            Stmt.Function: self.function,
+            Stmt.If: self.if_,
+            Stmt.Print: self.print_,
+            Stmt.Return: self.return_,
+            Stmt.Var: self.var,
+            Stmt.While: self.while_,
+        }
+        self.exprs = {
+            Expr.Array: self.array,
+            Expr.Assign: self.assign,
+            Expr.Binary: self.binary,
+            Expr.Call: self.call,
+            Expr.Get: self.get,
+            Expr.Grouping: self.grouping,
+            Expr.Index: self.index,
+            Expr.Literal: self.literal,
+            Expr.Logical: self.logical,
+            Expr.Set: self.set_,
+            Expr.SetIndex: self.set_index,
+            Expr.Super: self.super_,
+            Expr.This: self.this_,
+            Expr.Unary: self.unary,
+            Expr.Variable: self.variable,
+        }
+
+    def interperet(self, statements):
+        self.runs += 1
+        filename = f"<lox {self.runs}>"
+        source = self.transpile(statements, filename=filename)
+
+        if self.dump is not None:
+            # the prompt adds to the file with each line
+            with open(self.dump, "w" if self.runs == 1 else "a") as f:
+                f.write(source)
+
+        exec(compile(source, filename, "exec"), self.namespace)
+
+        try:
+            self.namespace["_main"]()
+        except RuntimeException as e:
+            self.error_handler.runtime_error(error=e)
+        except NameError as e:
+            self.error_handler.runtime_error(error=self.undefined(e))
+        except RecursionError as e:
+            self.error_handler.runtime_error(error=self.stack_overflow(e))
+
+    def set_global(self, name, value, token):
+        if "G_" + name not in self.namespace:
+            raise RuntimeException(
+                token=token, message=f"Undefined variable '{name}'."
+            )
+        self.namespace["G_" + name] = value
+        return value
+
+    def undefined(self, error):
+        """Turns Python's error for an undefined global into Lox's"""
+        name = error.name.split("_", 1)[1]
+        token = Token(type=IDENTIFIER, lexeme=name, literal=None, line=None)
+
+        traceback = error.__traceback__
+        while traceback is not None:
+            filename = traceback.tb_frame.f_code.co_filename
+            reads = self.global_reads.get(filename)
+            if reads is not None:
+                token = reads[traceback.tb_lineno].get(name, token)
+            traceback = traceback.tb_next
+
+        return RuntimeException(
+            token=token, message=f"Undefined variable '{name}'."
+        )
+
+    def stack_overflow(self, error):
+        """Turns Python's error for recursing too deep into Lox's, at the
+        innermost call
+        """
+        token = Token(type=LEFT_PAREN, lexeme="(", literal=None, line=None)
+
+        traceback = error.__traceback__
+        while traceback is not None:
+            filename = traceback.tb_frame.f_code.co_filename
+            calls = self.global_calls.get(filename)
+            if calls is not None:
+                token = calls[traceback.tb_lineno] or token
+            traceback = traceback.tb_next
+
+        return RuntimeException(token=token, message="Stack overflow.")
+
+    def transpile(self, statements, filename="<lox>"):
+        analyzer = ScopeAnalyzer()
+        analyzer.analyze(*statements)
+        self.bindings = analyzer.bindings
+        self.references = analyzer.references
+        self.functions = analyzer.functions
+
+        self.lines = []
+        # reads for the line after the last one emitted are pending
+        self.reads = [{}, {}]
+        self.calls = [None, None]
+        self.level = 0
+        self.temps = 0
+        self.initializer = None
+
+        self.emit("def _main():")
+        globals_ = sorted({
+            binding.pyname for binding in self.bindings.values()
+            if binding.function is None
+        })
+        if globals_:
+            self.emit("    global " + ", ".join(globals_))
+        self.body(statements)
+
+        self.global_reads[filename] = self.reads
+        self.global_calls[filename] = self.calls
+        return "\n".join(self.lines) + "\n"
+
+    # # #
+    # # #   Utilities
+    # # #
+    def emit(self, line):
+        self.lines.append("    " * self.level + line)
+        self.reads.append({})
+        self.calls.append(None)
+
+    def temp(self):
+        self.temps += 1
+        return f"_t{self.temps}"
+
+    def token(self, token):
+        """Name of a global holding a token, for error messages"""
+        name = f"_k{id(token)}"
+        self.namespace[name] = token
+        return name
+
+    def binding(self, key):
+        return self.bindings[key]
+
+    def load(self, expr, name):
+        binding = self.references[id(expr)]
+        if binding is None:
+            # the first read of a name on a line is the one that fails
+            self.reads[-1].setdefault(name.lexeme, name)
+            return f"G_{name.lexeme}"
+        if binding.boxed:
+            return f"{binding.pyname}[0]"
+        return binding.pyname
+
+    def operand(self, expr, other=None):
+        """Code for an operand that's used twice, plus how to use it again
+
+        The first string evaluates the operand, the second one refers to the
+        result. Operands that can't change in between are just repeated.
+        """
+        code, kind = self.expr(expr)
+        if isinstance(expr, Expr.Literal) or (
+            isinstance(expr, (Expr.Variable, Expr.This))
+            and (other is None or self.is_pure(other))
+        ):
+            return code, code, kind
+
+        temp = self.temp()
+        return f"({temp} := {code})", temp, kind
+
+    def is_pure(self, expr):
+        if not isinstance(expr, PURE):
+            return False
+        return all(
+            self.is_pure(getattr(expr, field)) for field in expr.fields
+            if isinstance(getattr(expr, field), Expr.Expr)
+        )
+
+    def truthy(self, expr):
+        """Python condition that's true when expr is truthy"""
+        code, kind = self.expr(expr)
+        if kind == "bool":
+            return code
+        if kind in ("num", "str"):
+            return f"({code}, True)[1]"
+        if kind == "nil":
+            return f"({code}, False)[1]"
+
+        first, again, _ = self.operand(expr)
+        return f"({first} is not None and {again} is not False)"
+
+    # # #
+    # # #   Statements
+    # # #
+    def statements(self, statements):
+        for statement in statements:
+            self.stmts[statement.__class__](statement)
+
+    def body(self, statements):
+        """Indented block of statements that always has something in it"""
+        self.level += 1
+        start = len(self.lines)
+        self.statements(statements)
+        if len(self.lines) == start:
+            self.emit("pass")
+        self.level -= 1
+
+    def block(self, stmt):
+        # scopes were already worked out, so this is just a list of
+        # statements in Python
+        self.statements(stmt.statements)
+
+    def define(self, binding, value):
+        if binding.boxed:
+            self.emit(f"{binding.pyname} = [{value}]")
+        else:
+            self.emit(f"{binding.pyname} = {value}")
+
+    def function_def(self, stmt, pyname, this=None):
+        """Emits a Python function for a Lox function or method"""
+        info = self.functions[id(stmt)]
+
+        params = [self.binding(id(param)).pyname for param in stmt.params]
+        if this is not None:
+            params.insert(0, this.pyname)
+        defaults = [
+            f"{binding.pyname}={binding.pyname}" for binding in info.free
+            if binding.boxed
+        ]
+        if defaults:
+            params += ["*"] + defaults
+
+        self.emit(f"def {pyname}({', '.join(params)}):")
+
+        # "this" to return from an initializer
+        enclosing = self.initializer
+        self.initializer = None
+        if this is not None and stmt.name.lexeme == INIT:
+            self.initializer = this
+        self.level += 1
+
+        nonlocals = sorted({
+            binding.pyname for binding in info.assigned
+            if not binding.boxed
+        })
+        if nonlocals:
+            self.emit("nonlocal " + ", ".join(nonlocals))
+
+        start = len(self.lines)
+        self.statements(stmt.body)
+        if self.initializer is not None:
+            self.emit(f"return {this.pyname}")
+        if len(self.lines) == start:
+            self.emit("pass")
+
+        self.level -= 1
+        self.initializer = enclosing
+
+    def class_(self, stmt):
+        binding = self.binding(id(stmt))
+        name = stmt.name.lexeme
+
+        superclass = "None"
+        if stmt.superclass is not None:
+            value, _ = self.expr(stmt.superclass)
+            token = self.token(stmt.superclass.name)
+            superclass = f"_superclass({value}, {token})"
+
+            super_binding = self.binding((id(stmt), "super"))
+            self.define(super_binding, superclass)
+            superclass = self.load_binding(super_binding)
+
+        if binding.boxed:
+            self.define(binding, "None")
+
+        methods = []
+        for method in stmt.methods:
+            self.temps += 1
+            pyname = f"M{self.temps}_{method.name.lexeme}"
+            this = self.binding((id(method), "this"))
+            self.function_def(method, pyname=pyname, this=this)
+            methods.append(f"{method.name.lexeme!r}: {pyname}")
+
+        value = f"_class({name!r}, {superclass}, {{{', '.join(methods)}}})"
+        if binding.boxed:
+            self.emit(f"{binding.pyname}[0] = {value}")
+        else:
+            self.define(binding, value)
+
+    def load_binding(self, binding):
+        if binding.boxed:
+            return f"{binding.pyname}[0]"
+        return binding.pyname
+
+    def expression(self, stmt):
+        expr = stmt.expression
+
+        # assignments are statements in Python, which don't need temporaries
+        if isinstance(expr, Expr.Assign):
+            binding = self.references[id(expr)]
+            value, _ = self.expr(expr.value)
+            if binding is None:
+                token = self.token(expr.name)
+                self.emit(f"_set_global({expr.name.lexeme!r}, {value}, {token})")  # noqa: E501
+            elif binding.boxed:
+                self.emit(f"{binding.pyname}[0] = {value}")
+            else:
+                self.emit(f"{binding.pyname} = {value}")
+            return
+
+        if isinstance(expr, Expr.Set):
+            obj, _ = self.expr(expr.object)
+            temp = self.temp()
+            token = self.token(expr.name)
+            self.emit(f"{temp} = _check_instance({obj}, {token})")
+            value, _ = self.expr(expr.value)
+            self.emit(f"{temp}.fields[{expr.name.lexeme!r}] = {value}")
+            return
+
+        code, _ = self.expr(expr)
+        self.emit(code)
+
+    def function(self, stmt):
+        binding = self.binding(id(stmt))
+        if not binding.boxed:
+            self.function_def(stmt, pyname=binding.pyname)
+            return
+
+        # the box has to exist before the function so it can refer to itself
+        self.define(binding, "None")
+        self.temps += 1
+        pyname = f"D{self.temps}_{stmt.name.lexeme}"
+        self.function_def(stmt, pyname=pyname)
+        self.emit(f"{binding.pyname}[0] = {pyname}")
+
+    def if_(self, stmt):
+        self.emit(f"if {self.truthy(stmt.condition)}:")
+        self.body([stmt.then_branch])
+        if stmt.else_branch is not None:
+            self.emit("else:")
+            self.body([stmt.else_branch])
+
+    def print_(self, stmt):
+        code, kind = self.expr(stmt.expression)
+        if kind == "str":
+            self.emit(f"print({code})")
+        else:
+            self.emit(f"print(_stringify({code}))")
+
+    def return_(self, stmt):
+        if self.initializer is not None:
+            self.emit(f"return {self.initializer.pyname}")
+        elif stmt.value is None:
+            self.emit("return None")
+        else:
+            code, _ = self.expr(stmt.value)
+            self.emit(f"return {code}")
+
+    def var(self, stmt):
+        value = "None"
+        if stmt.initializer is not None:
+            value, _ = self.expr(stmt.initializer)
+        self.define(self.binding(id(stmt)), value)
+
+    def while_(self, stmt):
+        self.emit(f"while {self.truthy(stmt.condition)}:")
+        self.body([stmt.body])
+
+    # # #
+    # # #   Expressions
+    # # #
+    def expr(self, expr):
+        """Returns Python code for an expression and the kind of its value
+
+        The kind is "num", "str", "bool" or "nil" when it's always the same,
+        otherwise None.
+        """
+        return self.exprs[expr.__class__](expr)
+
+    def array(self, expr):
+        values = [self.expr(value)[0] for value in expr.values]
+        return f"[{', '.join(values)}]", None
+
+    def assign(self, expr):
+        binding = self.references[id(expr)]
+        value, kind = self.expr(expr.value)
+
+        if binding is None:
+            token = self.token(expr.name)
+            return (
+                f"_set_global({expr.name.lexeme!r}, {value}, {token})", kind
+            )
+        if binding.boxed:
+            return f"_set_box({binding.pyname}, {value})", kind
+        return f"({binding.pyname} := {value})", kind
+
+    def binary(self, expr):
+        type_ = expr.operator.type
+        token = self.token(expr.operator)
+
+        if type_ in (EQUAL_EQUAL, BANG_EQUAL):
+            code = self.equal(expr.left, expr.right)
+            if type_ == BANG_EQUAL:
+                code = f"(not {code})"
+            return code, "bool"
+
+        left, left_again, left_kind = self.operand(expr.left, expr.right)
+        right, right_again, right_kind = self.operand(expr.right)
+        numbers = left_kind == right_kind == "num"
+
+        if type_ == PLUS:
+            if numbers:
+                return f"({left} + {right})", "num"
+            if left_kind == right_kind == "str":
+                return f"_concat({left}, {right})", "str"
+
+            # with a literal on one side the other has to be the same type
+            if isinstance(expr.left, Expr.Literal) and left_kind == "num":
+                check = f"type({right}) is _float"
+            elif isinstance(expr.right, Expr.Literal) and right_kind == "num":
+                check = f"type({left}) is _float"
+            elif isinstance(expr.left, Expr.Literal) and left_kind == "str":
+                return f"_add_strings({left}, {right}, {token})", "str"
+            elif isinstance(expr.right, Expr.Literal) and right_kind == "str":
+                return f"_add_strings({left}, {right}, {token})", "str"
+            else:
+                # anything but two numbers is left to _add_strings. Both
+                # operands are evaluated before anything is compared
+                return (
+                    f"({left_again} + {right_again}"
+                    f" if type({left}) is type({right}) is _float"
+                    f" else _add_strings({left_again}, {right_again},"
+                    f" {token}))"
+                ), None
+
+            return (
+                f"({left_again} + {right_again} if {check}"
+                f" else _error({token}, "
+                f"'Operands must be two numbers or two strings.'))"
+            ), "num"
+
+        if type_ == SLASH:
+            if (
+                numbers and isinstance(expr.right, Expr.Literal)
+                and expr.right.value != 0.0
+            ):
+                return f"({left} / {right})", "num"
+            return (
+                f"({left_again} / {right_again}"
+                f" if {self.numbers(expr, left, right)}"
+                f" and {right_again} != 0.0"
+                f" else _divide_error({left_again}, {right_again}, {token}))"
+            ), "num"
+
+        operator = COMPARISONS.get(type_) or ARITHMETIC[type_]
+        kind = "bool" if type_ in COMPARISONS else "num"
+        if numbers:
+            return f"({left} {operator} {right})", kind
+
+        return (
+            f"({left_again} {operator} {right_again}"
+            f" if {self.numbers(expr, left, right)}"
+            f" else _error({token}, 'Operands must be numbers.'))"
+        ), kind
+
+    def numbers(self, expr, left, right):
+        """Condition for both operands of expr being numbers"""
+        if self.is_number(expr.left):
+            return f"type({right}) is _float"
+        if self.is_number(expr.right):
+            return f"type({left}) is _float"
+        return f"type({left}) is type({right}) is _float"
+
+    def is_number(self, expr):
+        return (
+            isinstance(expr, Expr.Literal)
+            and isinstance(expr.value, float)
+        )
+
+    def equal(self, left_expr, right_expr):
+        """Same rules as is_equal: bools are only equal to themselves"""
+        left, left_again, left_kind = self.operand(left_expr, right_expr)
+        right, right_again, right_kind = self.operand(right_expr)
+
+        # only a nil literal can be left out
+        if left == "None":
+            return f"({right} is None)"
+        if right == "None":
+            return f"({left} is None)"
+        # a string is never equal to a bool, and numbers compared with
+        # numbers and strings with strings have no bools to worry about
+        if (
+            "str" in (left_kind, right_kind)
+            or left_kind == right_kind == "num"
+        ):
+            return f"({left} == {right})"
+        # and a number is only equal to another number
+        if left_kind == "num":
+            return f"({left} == {right} and type({right_again}) is _float)"
+        if right_kind == "num":
+            return f"({left} == {right} and type({left_again}) is _float)"
+
+        return (
+            f"({left_again} is {right_again}"
+            f" if (type({left}) is _bool) | (type({right}) is _bool)"
+            f" else {left_again} == {right_again})"
+        )
+
+    def call(self, expr):
+        callee = expr.callee
+        argc = len(expr.expressions)
+        paren = self.token(expr.paren)
+        arguments = [self.expr(arg)[0] for arg in expr.expressions]
+        if self.calls[-1] is None:
+            self.calls[-1] = expr.paren
+
+        # methods are called with the instance as the first argument,
+        # without making a bound method
+        if isinstance(callee, Expr.Get):
+            first, again, _ = self.operand(callee.object)
+            name = self.token(callee.name)
+            arguments.insert(0, again)
+            return (
+                f"_invoke({first}, {callee.name.lexeme!r}, {argc},"
+                f" {name}, {paren})({', '.join(arguments)})"
+            ), None
+
+        if isinstance(callee, Expr.Super):
+            superclass = self.load_binding(self.references[id(callee)])
+            this = self.load_binding(self.references[(id(callee), "this")])
+            name = self.token(callee.method)
+            arguments.insert(0, this)
+            return (
+                f"_super_invoke({superclass}, {callee.method.lexeme!r},"
+                f" {argc}, {name}, {paren})({', '.join(arguments)})"
+            ), None
+
+        function, again, _ = self.operand(callee)
+        # plain Lox functions with the right arity are called directly
+        return (
+            f"({again} if type({function}) is _function"
+            f" and {again}.__code__.co_argcount == {argc}"
+            f" else _call({again}, {argc}, {paren}))"
+            f"({', '.join(arguments)})"
+        ), None
+
+    def get(self, expr):
+        obj, again, _ = self.operand(expr.object)
+        name = expr.name.lexeme
+        token = self.token(expr.name)
+        return (
+            f"({again}.fields[{name!r}] if type({obj}) is _instance"
+            f" and {name!r} in {again}.fields"
+            f" else _get({again}, {name!r}, {token}))"
+        ), None
+
+    def grouping(self, expr):
+        return self.expr(expr.expression)
+
+    def index(self, expr):
+        array, _ = self.expr(expr.object)
+        index, _ = self.expr(expr.index)
+        token = self.token(expr.bracket)
+        return f"_get_index({array}, {index}, {token})", None
+
+    def literal(self, expr):
+        value = expr.value
+        if value is None:
+            return "None", "nil"
+        if isinstance(value, bool):
+            return repr(value), "bool"
+        if isinstance(value, float):
+            if math.isinf(value):
+                return "_float('inf')", "num"
+            return repr(value), "num"
+        return repr(value), "str"
+
+    def logical(self, expr):
+        left, left_again, left_kind = self.operand(expr.left, expr.right)
+        right, right_kind = self.expr(expr.right)
+        kind = left_kind if left_kind == right_kind else None
+
+        if left_kind == "bool":
+            operator = "or" if expr.operator.type == OR else "and"
+            return f"({left} {operator} {right})", kind
+        # numbers and strings are always truthy
+        if left_kind in ("num", "str"):
+            if expr.operator.type == OR:
+                return left, left_kind
+            return f"({left}, {right})[1]", right_kind
+
+        truthy = f"{left} is not None and {left_again} is not False"
+        if expr.operator.type == OR:
+            return f"({left_again} if {truthy} else {right})", kind
+        return f"({right} if {truthy} else {left_again})", kind
+
+    def set_(self, expr):
+        obj, _ = self.expr(expr.object)
+        value, kind = self.expr(expr.value)
+        token = self.token(expr.name)
+        return (
+            f"_set(_check_instance({obj}, {token}),"
+            f" {expr.name.lexeme!r}, {value})"
+        ), kind
+
+    def set_index(self, expr):
+        array, _ = self.expr(expr.object)
+        index, _ = self.expr(expr.index)
+        value, kind = self.expr(expr.value)
+        token = self.token(expr.bracket)
+        return f"_set_index({array}, {index}, {value}, {token})", kind
+
+    def super_(self, expr):
+        superclass = self.load_binding(self.references[id(expr)])
+        token = self.token(expr.method)
+        this = self.load_binding(self.references[(id(expr), "this")])
+        return (
+            f"_partial(_super({superclass}, {expr.method.lexeme!r},"
+            f" {token}), {this})"
+        ), None
+
+    def this_(self, expr):
+        return self.load(expr, expr.keyword), None
+
+    def unary(self, expr):
+        if expr.operator.type == BANG:
+            return f"(not {self.truthy(expr.right)})", "bool"
+
+        value, again, kind = self.operand(expr.right)
+        if kind == "num":
+            return f"(-{value})", "num"
+
+        token = self.token(expr.operator)
+        return (
+            f"(-{again} if type({value}) is _float"
+            f" else _error({token}, 'Operand must be a number.'))"
+        ), "num"
+
+    def variable(self, expr):
+        return self.load(expr, expr.name), None
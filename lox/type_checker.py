@@ -0,0 +1,366 @@
+from itertools import count
+
+from . import expr as Expr
+from . import stmt as Stmt
+from .token_type import (
+    MINUS, PLUS, SLASH, BANG_EQUAL, EQUAL_EQUAL, GREATER, GREATER_EQUAL, LESS,
+    LESS_EQUAL,
+)
+
+
+# operators that always give a boolean when they don't fail
+COMPARISONS = {
+    BANG_EQUAL, EQUAL_EQUAL, GREATER, GREATER_EQUAL, LESS, LESS_EQUAL
+}
+
+
+def join(a, b):
+    """Types of locals where two paths through the code meet
+
+    A local keeps its type if it has the same one on both paths. None is
+    code that can't be reached, so the other path's types are used.
+    """
+    if a is None:
+        return b
+    if b is None:
+        return a
+    return {key: type_ for key, type_ in a.items() if b.get(key) is type_}
+
+
+class TypeChecker:
+    def __init__(self):
+        """Proves which operators always get operands of the right types
+
+        Types are the Python types of Lox values - float, str (which stands
+        for Ropes too), bool and NoneType - and None when the type isn't
+        known. The checker follows
+        the flow of the code keeping track of the type of every local of the
+        current function, so it knows a loop counter initialized to 0 and
+        only ever incremented is a number, or that n is a number after n < 2.
+
+        Globals, parameters, properties and call results could be anything.
+        So could locals of enclosing functions, and any local that's
+        assigned by a function nested in the one that declares it, since it
+        can change whenever that function is called.
+
+        Binary and Unary nodes whose operands are proven to be the right
+        types get unchecked set, and skip checking them at runtime.
+        """
+        # types of the current function's locals at the current point in
+        # the code, by key - None if the code can't be reached
+        self.types = {}
+        # key of the local in each slot of each scope, mirroring the scopes
+        # of the Resolver so a local's depth and slot find its key
+        self.scopes = []
+        # index in scopes of the current function's outermost scope
+        self.function_scope = 0
+        self.keys = count()
+        # locals assigned by a function nested in the one that declares them
+        self.captured = set()
+        # node -> whether its operands were proven every time it was checked
+        self.proven = {}
+
+        # methods that check each class of node
+        self.stmts = {
+            Stmt.Block: self.block,
+            Stmt.Class: self.class_,
+            Stmt.Expression: self.expression,
+            Stmt.Function: self.function,
+            Stmt.If: self.if_,
+            Stmt.Print: self.print_,
+            Stmt.Return: self.return_,
+            Stmt.Var: self.var,
+            Stmt.While: self.while_,
+        }
+        self.exprs = {
+            Expr.Array: self.array,
+            Expr.Assign: self.assign,
+            Expr.Binary: self.binary,
+            Expr.Call: self.call,
+            Expr.Get: self.get,
+            Expr.Grouping: self.grouping,
+            Expr.Index: self.index,
+            Expr.Literal: self.literal,
+            Expr.Logical: self.logical,
+            Expr.Set: self.set_,
+            Expr.SetIndex: self.set_index,
+            Expr.Super: self.super_,
+            Expr.This: self.this,
+            Expr.Unary: self.unary,
+            Expr.Variable: self.variable,
+        }
+
+    def check(self, statements):
+        self.check_statements(statements)
+        for expr, proven in self.proven.items():
+            expr.unchecked = proven
+
+    # # #
+    # # #   Utilities
+    # # #
+    def check_statements(self, statements):
+        for statement in statements:
+            # nothing after a return runs
+            if self.types is None:
+                return
+            self.stmts[statement.__class__](statement)
+
+    def check_expr(self, expr):
+        """Checks an expression and returns its type"""
+        return self.exprs[expr.__class__](expr)
+
+    def check_function(self, function):
+        enclosing_types = self.types
+        enclosing_function_scope = self.function_scope
+
+        self.types = {}
+        self.function_scope = len(self.scopes)
+        self.begin_scope()
+        for param in function.params:
+            self.declare()
+        self.check_statements(function.body)
+        self.end_scope()
+
+        # the function may have assigned some of the enclosing locals
+        self.types = {
+            key: type_ for key, type_ in enclosing_types.items()
+            if key not in self.captured
+        }
+        self.function_scope = enclosing_function_scope
+
+    def begin_scope(self, *keys):
+        self.scopes.append(list(keys))
+
+    def end_scope(self):
+        keys = self.scopes.pop()
+        # so the types that get copied at every branch don't keep growing
+        if self.types is not None:
+            for key in keys:
+                self.types.pop(key, None)
+
+    def declare(self):
+        """Adds a local to the current scope, returning its key"""
+        if not self.scopes:
+            return None
+
+        key = next(self.keys)
+        self.scopes[-1].append(key)
+        return key
+
+    def set_type(self, key, type_):
+        if key is None:
+            return
+        if type_ is None or key in self.captured:
+            self.types.pop(key, None)
+        else:
+            self.types[key] = type_
+
+    def local(self, expr):
+        """Key of a local of the current function that expr refers to"""
+        if expr.depth is None:
+            return None
+
+        index = len(self.scopes) - 1 - expr.depth
+        if index < self.function_scope:
+            return None
+        return self.scopes[index][expr.slot]
+
+    def refine(self, expr, type_):
+        """Sets the type of a local that's an operand of an operator that
+        only works if its operands have that type
+        """
+        if isinstance(expr, Expr.Variable):
+            self.set_type(key=self.local(expr), type_=type_)
+
+    def prove(self, expr, proven):
+        self.proven[expr] = self.proven.get(expr, True) and proven
+
+    # # #
+    # # #   Statements
+    # # #
+    def block(self, stmt):
+        self.begin_scope()
+        self.check_statements(stmt.statements)
+        self.end_scope()
+
+    def class_(self, stmt):
+        self.declare()
+
+        if stmt.superclass is not None:
+            self.check_expr(stmt.superclass)
+            self.begin_scope(next(self.keys))
+
+        self.begin_scope(next(self.keys))
+        for method in stmt.methods:
+            self.check_function(method)
+        self.end_scope()
+
+        if stmt.superclass is not None:
+            self.end_scope()
+
+    def expression(self, stmt):
+        self.check_expr(stmt.expression)
+
+    def function(self, stmt):
+        self.declare()
+        self.check_function(stmt)
+
+    def if_(self, stmt):
+        self.check_expr(stmt.condition)
+
+        types = self.types
+        self.types = dict(types)
+        self.stmts[stmt.then_branch.__class__](stmt.then_branch)
+        then_types = self.types
+
+        self.types = types
+        if stmt.else_branch is not None:
+            self.stmts[stmt.else_branch.__class__](stmt.else_branch)
+        self.types = join(then_types, self.types)
+
+    def print_(self, stmt):
+        self.check_expr(stmt.expression)
+
+    def return_(self, stmt):
+        if stmt.value is not None:
+            self.check_expr(stmt.value)
+        self.types = None
+
+    def var(self, stmt):
+        type_ = type(None)
+        if stmt.initializer is not None:
+            type_ = self.check_expr(stmt.initializer)
+        self.set_type(key=self.declare(), type_=type_)
+
+    def while_(self, stmt):
+        # go round the loop until the types at the start of it stop changing
+        while True:
+            types = self.types
+            self.types = dict(types)
+            self.check_expr(stmt.condition)
+            exit_types = self.types
+
+            self.types = dict(exit_types)
+            self.stmts[stmt.body.__class__](stmt.body)
+            self.types = join(types, self.types)
+            if self.types == types:
+                break
+
+        self.types = exit_types
+
+    # # #
+    # # #   Expressions
+    # # #
+    def array(self, expr):
+        for value in expr.values:
+            self.check_expr(value)
+        return None
+
+    def assign(self, expr):
+        type_ = self.check_expr(expr.value)
+        if expr.depth is None:
+            return type_
+
+        key = self.local(expr)
+        if key is None:
+            # assigned by a nested function, so it can change at any call
+            index = len(self.scopes) - 1 - expr.depth
+            self.captured.add(self.scopes[index][expr.slot])
+        self.set_type(key=key, type_=type_)
+        return type_
+
+    def binary(self, expr):
+        left = self.check_expr(expr.left)
+        right = self.check_expr(expr.right)
+        type_ = expr.operator.type
+
+        if type_ in (BANG_EQUAL, EQUAL_EQUAL):
+            # values of the same type don't need is_equal's special cases
+            self.prove(expr, left is right and left in (float, str, bool))
+            return bool
+
+        if type_ == PLUS:
+            # string operands could be ropes, which only concat can join
+            self.prove(expr, left is float and right is float)
+            if left is not None and right is not None and left is not right:
+                return None
+            # if it works both operands are numbers, or both are strings
+            operand = left or right
+            if operand not in (float, str):
+                return None
+            self.refine(expr.left, operand)
+            self.refine(expr.right, operand)
+            return operand
+
+        # everything else only works on numbers
+        proven = left is float and right is float
+        if type_ == SLASH:
+            # dividing by zero is still checked, unless it's by a literal
+            proven = proven and isinstance(expr.right, Expr.Literal) and (
+                expr.right.value != 0.0
+            )
+        self.prove(expr, proven)
+        self.refine(expr.left, float)
+        self.refine(expr.right, float)
+        return bool if type_ in COMPARISONS else float
+
+    def call(self, expr):
+        self.check_expr(expr.callee)
+        for arg in expr.expressions:
+            self.check_expr(arg)
+        return None
+
+    def get(self, expr):
+        self.check_expr(expr.object)
+        return None
+
+    def grouping(self, expr):
+        return self.check_expr(expr.expression)
+
+    def index(self, expr):
+        self.check_expr(expr.object)
+        self.check_expr(expr.index)
+        return None
+
+    def literal(self, expr):
+        return type(expr.value)
+
+    def logical(self, expr):
+        left = self.check_expr(expr.left)
+
+        # the right operand might not be evaluated
+        types = self.types
+        self.types = dict(types)
+        right = self.check_expr(expr.right)
+        self.types = join(types, self.types)
+
+        return left if left is right else None
+
+    def set_(self, expr):
+        self.check_expr(expr.object)
+        return self.check_expr(expr.value)
+
+    def set_index(self, expr):
+        self.check_expr(expr.object)
+        self.check_expr(expr.index)
+        return self.check_expr(expr.value)
+
+    def super_(self, expr):
+        return None
+
+    def this(self, expr):
+        return None
+
+    def unary(self, expr):
+        type_ = self.check_expr(expr.right)
+        if expr.operator.type == MINUS:
+            self.prove(expr, type_ is float)
+            self.refine(expr.right, float)
+            return float
+        return bool
+
+    def variable(self, expr):
+        key = self.local(expr)
+        if key is None:
+            return None
+        return self.types.get(key)
@@ -0,0 +1,580 @@
+from .callable_ import Clock, LoxCallable
+from .chunk import (
+    OP_CONSTANT, OP_NIL, OP_TRUE, OP_FALSE, OP_POP, OP_GET_LOCAL,
+    OP_SET_LOCAL, OP_GET_GLOBAL, OP_DEFINE_GLOBAL, OP_SET_GLOBAL,
+    OP_GET_UPVALUE, OP_SET_UPVALUE, OP_GET_PROPERTY, OP_SET_PROPERTY,
+    OP_GET_SUPER, OP_EQUAL, OP_NOT_EQUAL, OP_GREATER, OP_GREATER_EQUAL,
+    OP_LESS, OP_LESS_EQUAL, OP_ADD, OP_SUBTRACT, OP_MULTIPLY, OP_DIVIDE,
+    OP_NOT, OP_NEGATE, OP_PRINT, OP_JUMP, OP_JUMP_IF_FALSE, OP_CALL,
+    OP_INVOKE, OP_SUPER_INVOKE, OP_CLOSURE, OP_CLOSE_UPVALUE, OP_RETURN,
+    OP_CLASS, OP_INHERIT, OP_METHOD, OP_ARRAY, OP_GET_INDEX, OP_SET_INDEX,
+)
+from .compiler import Compiler
+from .exceptions import NativeException, RuntimeException
+from .interpreter import (
+    check_element, check_index, is_equal, is_truthy, stringify
+)
+from .natives import NATIVES
+from .rope import STRINGS, concat
+
+
+# maximum number of nested calls before reporting a stack overflow
+FRAMES_MAX = 10000
+
+
+class ObjClosure:
+    __slots__ = ("function", "upvalues")
+
+    def __init__(self, function, upvalues):
+        self.function = function
+        self.upvalues = upvalues
+
+    def __str__(self):
+        return str(self.function)
+
+
+class ObjUpvalue:
+    """A variable captured by a closure
+
+    While the variable is still on the stack, index is its slot. Once the
+    variable goes out of scope, it moves into value and index becomes None.
+    """
+    __slots__ = ("index", "value")
+
+    def __init__(self, index):
+        self.index = index
+        self.value = None
+
+
+class ObjClass:
+    def __init__(self, name):
+        self.name = name
+        self.methods = {}
+
+    def __str__(self):
+        return self.name
+
+
+class ObjInstance:
+    __slots__ = ("class_", "fields")
+
+    def __init__(self, class_):
+        self.class_ = class_
+        self.fields = {}
+
+    def __str__(self):
+        return self.class_.name + " instance"
+
+
+class ObjBoundMethod:
+    __slots__ = ("receiver", "method")
+
+    def __init__(self, receiver, method):
+        self.receiver = receiver
+        self.method = method
+
+    def __str__(self):
+        return str(self.method)
+
+
+class VM:
+    """Runs bytecode from the compiler on a single stack of values
+
+    Each call frame's locals live in a window of the stack that starts at the
+    frame's base. Calls between Lox functions don't recurse in Python.
+    """
+    def __init__(self, error_handler):
+        self.error_handler = error_handler
+        self.globals = {"clock": Clock(), **NATIVES}
+        self.stack = []
+        self.frames = []
+        # upvalues that still point into the stack, by slot
+        self.open_upvalues = {}
+
+    def interperet(self, statements):
+        function = Compiler().compile(statements)
+        self.stack.append(ObjClosure(function=function, upvalues=[]))
+
+        try:
+            self.run()
+        except RuntimeException as e:
+            self.error_handler.runtime_error(error=e)
+            self.stack.clear()
+            self.frames.clear()
+            self.open_upvalues.clear()
+
+    # # #
+    # # #   Utilities
+    # # #
+    def capture_upvalue(self, index):
+        upvalue = self.open_upvalues.get(index)
+        if upvalue is None:
+            upvalue = self.open_upvalues[index] = ObjUpvalue(index=index)
+        return upvalue
+
+    def close_upvalues(self, last):
+        """Closes every open upvalue at or above slot last"""
+        for index in [i for i in self.open_upvalues if i >= last]:
+            upvalue = self.open_upvalues.pop(index)
+            upvalue.value = self.stack[index]
+            upvalue.index = None
+
+    def call_value(self, callee, argc, token):
+        """Calls anything but a closure
+
+        Returns the closure to run next for classes with initializers and
+        bound methods. Returns None when the call is already done and its
+        result is on the stack.
+        """
+        stack = self.stack
+
+        if isinstance(callee, ObjClass):
+            stack[-1 - argc] = ObjInstance(class_=callee)
+            initializer = callee.methods.get("init")
+            if initializer is not None:
+                return self.check_call(initializer, argc, token)
+            if argc != 0:
+                raise RuntimeException(
+                    token=token,
+                    message=f"Expected 0 arguments but got {argc}.",
+                )
+            return None
+
+        if isinstance(callee, ObjBoundMethod):
+            stack[-1 - argc] = callee.receiver
+            return self.check_call(callee.method, argc, token)
+
+        if isinstance(callee, ObjClosure):
+            return self.check_call(callee, argc, token)
+
+        if isinstance(callee, LoxCallable):
+            if argc != callee.arity():
+                raise RuntimeException(
+                    token=token,
+                    message=f"Expected {callee.arity()} arguments but got {argc}.",  # noqa: E501
+                )
+            arguments = stack[len(stack) - argc:]
+            del stack[len(stack) - argc - 1:]
+            try:
+                stack.append(
+                    callee.call(interpreter=self, arguments=arguments)
+                )
+            except NativeException as e:
+                raise RuntimeException(
+                    token=token, message=e.message
+                ) from None
+            return None
+
+        raise RuntimeException(
+            token=token, message="Can only call functions and classes."
+        )
+
+    def check_call(self, closure, argc, token):
+        if argc != closure.function.arity:
+            raise RuntimeException(
+                token=token,
+                message=f"Expected {closure.function.arity} arguments but got {argc}.",  # noqa: E501
+            )
+        if len(self.frames) >= FRAMES_MAX:
+            raise RuntimeException(token=token, message="Stack overflow.")
+        return closure
+
+    # # #
+    # # #   The actual virtual machine
+    # # #
+    def run(self):
+        stack = self.stack
+        frames = self.frames
+        globals_ = self.globals
+
+        # state of the frame that's running, saved in frames during calls
+        closure = stack[-1]
+        base = len(stack) - 1
+        ip = 0
+        code = closure.function.chunk.code
+        constants = closure.function.chunk.constants
+        tokens = closure.function.chunk.tokens
+
+        while True:
+            op = code[ip]
+            ip += 1
+
+            # instructions are roughly ordered by how often they run
+            if op == OP_GET_LOCAL:
+                stack.append(stack[base + code[ip]])
+                ip += 1
+
+            elif op == OP_CONSTANT:
+                stack.append(constants[code[ip]])
+                ip += 1
+
+            elif op == OP_SET_LOCAL:
+                stack[base + code[ip]] = stack[-1]
+                ip += 1
+
+            elif op == OP_POP:
+                stack.pop()
+
+            elif op == OP_GET_GLOBAL:
+                name = constants[code[ip]]
+                if name not in globals_:
+                    raise RuntimeException(
+                        token=tokens[ip],
+                        message=f"Undefined variable '{name}'.",
+                    )
+                stack.append(globals_[name])
+                ip += 1
+
+            elif op == OP_JUMP_IF_FALSE:
+                value = stack[-1]
+                if value is None or value is False:
+                    ip = code[ip]
+                else:
+                    ip += 1
+
+            elif op == OP_JUMP:
+                ip = code[ip]
+
+            elif op == OP_LESS:
+                b = stack.pop()
+                a = stack[-1]
+                if not (isinstance(a, float) and isinstance(b, float)):
+                    raise RuntimeException(
+                        token=tokens[ip - 1],
+                        message="Operands must be numbers.",
+                    )
+                stack[-1] = a < b
+
+            elif op == OP_ADD:
+                b = stack.pop()
+                a = stack[-1]
+                if isinstance(a, float) and isinstance(b, float):
+                    stack[-1] = a + b
+                elif isinstance(a, STRINGS) and isinstance(b, STRINGS):
+                    stack[-1] = concat(a, b)
+                else:
+                    raise RuntimeException(
+                        token=tokens[ip - 1],
+                        message="Operands must be two numbers or two strings.",
+                    )
+
+            elif op == OP_SUBTRACT:
+                b = stack.pop()
+                a = stack[-1]
+                if not (isinstance(a, float) and isinstance(b, float)):
+                    raise RuntimeException(
+                        token=tokens[ip - 1],
+                        message="Operands must be numbers.",
+                    )
+                stack[-1] = a - b
+
+            elif op == OP_GET_UPVALUE:
+                upvalue = closure.upvalues[code[ip]]
+                if upvalue.index is None:
+                    stack.append(upvalue.value)
+                else:
+                    stack.append(stack[upvalue.index])
+                ip += 1
+
+            elif op == OP_SET_UPVALUE:
+                upvalue = closure.upvalues[code[ip]]
+                if upvalue.index is None:
+                    upvalue.value = stack[-1]
+                else:
+                    stack[upvalue.index] = stack[-1]
+                ip += 1
+
+            elif op == OP_GET_PROPERTY:
+                instance = stack[-1]
+                if not isinstance(instance, ObjInstance):
+                    raise RuntimeException(
+                        token=tokens[ip],
+                        message="Only instances have properties.",
+                    )
+                name = constants[code[ip]]
+                if name in instance.fields:
+                    stack[-1] = instance.fields[name]
+                else:
+                    method = instance.class_.methods.get(name)
+                    if method is None:
+                        raise RuntimeException(
+                            token=tokens[ip],
+                            message=f"Undefined property '{name}'.",
+                        )
+                    stack[-1] = ObjBoundMethod(
+                        receiver=instance, method=method
+                    )
+                ip += 1
+
+            elif op == OP_SET_PROPERTY:
+                instance = stack[-2]
+                if not isinstance(instance, ObjInstance):
+                    raise RuntimeException(
+                        token=tokens[ip],
+                        message="Only instances have fields.",
+                    )
+                value = stack.pop()
+                instance.fields[constants[code[ip]]] = value
+                stack[-1] = value
+                ip += 1
+
+            elif op == OP_CALL:
+                argc = code[ip]
+                callee = stack[-1 - argc]
+                if callee.__class__ is not ObjClosure:
+                    callee = self.call_value(callee, argc, tokens[ip])
+                else:
+                    self.check_call(callee, argc, tokens[ip])
+                ip += 1
+
+                if callee is not None:
+                    frames.append((closure, ip, base))
+                    closure = callee
+                    base = len(stack) - argc - 1
+                    ip = 0
+                    code = closure.function.chunk.code
+                    constants = closure.function.chunk.constants
+                    tokens = closure.function.chunk.tokens
+
+            elif op == OP_INVOKE:
+                name = constants[code[ip]]
+                argc = code[ip + 1]
+                instance = stack[-1 - argc]
+                if not isinstance(instance, ObjInstance):
+                    raise RuntimeException(
+                        token=tokens[ip],
+                        message="Only instances have properties.",
+                    )
+
+                if name in instance.fields:
+                    callee = instance.fields[name]
+                    stack[-1 - argc] = callee
+                    callee = self.call_value(callee, argc, tokens[ip + 1])
+                else:
+                    callee = instance.class_.methods.get(name)
+                    if callee is None:
+                        raise RuntimeException(
+                            token=tokens[ip],
+                            message=f"Undefined property '{name}'.",
+                        )
+                    self.check_call(callee, argc, tokens[ip + 1])
+                ip += 2
+
+                if callee is not None:
+                    frames.append((closure, ip, base))
+                    closure = callee
+                    base = len(stack) - argc - 1
+                    ip = 0
+                    code = closure.function.chunk.code
+                    constants = closure.function.chunk.constants
+                    tokens = closure.function.chunk.tokens
+
+            elif op == OP_RETURN:
+                result = stack.pop()
+                if self.open_upvalues:
+                    self.close_upvalues(last=base)
+                del stack[base:]
+
+                if not frames:
+                    # returning from the top level script
+                    return
+
+                stack.append(result)
+                closure, ip, base = frames.pop()
+                code = closure.function.chunk.code
+                constants = closure.function.chunk.constants
+                tokens = closure.function.chunk.tokens
+
+            elif op == OP_EQUAL:
+                b = stack.pop()
+                stack[-1] = is_equal(a=stack[-1], b=b)
+
+            elif op == OP_NOT_EQUAL:
+                b = stack.pop()
+                stack[-1] = not is_equal(a=stack[-1], b=b)
+
+            elif op == OP_GREATER:
+                b = stack.pop()
+                a = stack[-1]
+                if not (isinstance(a, float) and isinstance(b, float)):
+                    raise RuntimeException(
+                        token=tokens[ip - 1],
+                        message="Operands must be numbers.",
+                    )
+                stack[-1] = a > b
+
+            elif op == OP_GREATER_EQUAL:
+                b = stack.pop()
+                a = stack[-1]
+                if not (isinstance(a, float) and isinstance(b, float)):
+                    raise RuntimeException(
+                        token=tokens[ip - 1],
+                        message="Operands must be numbers.",
+                    )
+                stack[-1] = a >= b
+
+            elif op == OP_LESS_EQUAL:
+                b = stack.pop()
+                a = stack[-1]
+                if not (isinstance(a, float) and isinstance(b, float)):
+                    raise RuntimeException(
+                        token=tokens[ip - 1],
+                        message="Operands must be numbers.",
+                    )
+                stack[-1] = a <= b
+
+            elif op == OP_MULTIPLY:
+                b = stack.pop()
+                a = stack[-1]
+                if not (isinstance(a, float) and isinstance(b, float)):
+                    raise RuntimeException(
+                        token=tokens[ip - 1],
+                        message="Operands must be numbers.",
+                    )
+                stack[-1] = a * b
+
+            elif op == OP_DIVIDE:
+                b = stack.pop()
+                a = stack[-1]
+                if not (isinstance(a, float) and isinstance(b, float)):
+                    raise RuntimeException(
+                        token=tokens[ip - 1],
+                        message="Operands must be numbers.",
+                    )
+                if b == 0.0:
+                    raise RuntimeException(
+                        token=tokens[ip - 1],
+                        message="Division by zero error.",
+                    )
+                stack[-1] = a / b
+
+            elif op == OP_NOT:
+                stack[-1] = not is_truthy(obj=stack[-1])
+
+            elif op == OP_NEGATE:
+                if not isinstance(stack[-1], float):
+                    raise RuntimeException(
+                        token=tokens[ip - 1],
+                        message="Operand must be a number.",
+                    )
+                stack[-1] = -stack[-1]
+
+            elif op == OP_NIL:
+                stack.append(None)
+
+            elif op == OP_TRUE:
+                stack.append(True)
+
+            elif op == OP_FALSE:
+                stack.append(False)
+
+            elif op == OP_PRINT:
+                print(stringify(obj=stack.pop()))
+
+            elif op == OP_DEFINE_GLOBAL:
+                globals_[constants[code[ip]]] = stack.pop()
+                ip += 1
+
+            elif op == OP_SET_GLOBAL:
+                name = constants[code[ip]]
+                if name not in globals_:
+                    raise RuntimeException(
+                        token=tokens[ip],
+                        message=f"Undefined variable '{name}'.",
+                    )
+                globals_[name] = stack[-1]
+                ip += 1
+
+            elif op == OP_CLOSURE:
+                function = constants[code[ip]]
+                ip += 1
+                upvalues = []
+                for _ in range(function.upvalue_count):
+                    is_local, index = code[ip], code[ip + 1]
+                    ip += 2
+                    if is_local:
+                        upvalues.append(self.capture_upvalue(base + index))
+                    else:
+                        upvalues.append(closure.upvalues[index])
+                stack.append(ObjClosure(function=function, upvalues=upvalues))
+
+            elif op == OP_CLOSE_UPVALUE:
+                self.close_upvalues(last=len(stack) - 1)
+                stack.pop()
+
+            elif op == OP_GET_SUPER:
+                superclass = stack.pop()
+                name = constants[code[ip]]
+                method = superclass.methods.get(name)
+                if method is None:
+                    raise RuntimeException(
+                        token=tokens[ip],
+                        message=f"Undefined property '{name}'.",
+                    )
+                stack[-1] = ObjBoundMethod(receiver=stack[-1], method=method)
+                ip += 1
+
+            elif op == OP_SUPER_INVOKE:
+                superclass = stack.pop()
+                name = constants[code[ip]]
+                argc = code[ip + 1]
+                callee = superclass.methods.get(name)
+                if callee is None:
+                    raise RuntimeException(
+                        token=tokens[ip],
+                        message=f"Undefined property '{name}'.",
+                    )
+                self.check_call(callee, argc, tokens[ip + 1])
+                ip += 2
+
+                frames.append((closure, ip, base))
+                closure = callee
+                base = len(stack) - argc - 1
+                ip = 0
+                code = closure.function.chunk.code
+                constants = closure.function.chunk.constants
+                tokens = closure.function.chunk.tokens
+
+            elif op == OP_CLASS:
+                stack.append(ObjClass(name=constants[code[ip]]))
+                ip += 1
+
+            elif op == OP_INHERIT:
+                superclass = stack[-2]
+                if not isinstance(superclass, ObjClass):
+                    raise RuntimeException(
+                        token=tokens[ip - 1],
+                        message="Superclass must be a class.",
+                    )
+                # copy methods down so lookups never walk the superclasses
+                stack.pop().methods.update(superclass.methods)
+
+            elif op == OP_METHOD:
+                method = stack.pop()
+                stack[-1].methods[constants[code[ip]]] = method
+                ip += 1
+
+            elif op == OP_ARRAY:
+                count = code[ip]
+                values = stack[len(stack) - count:]
+                del stack[len(stack) - count:]
+                stack.append(values)
+                ip += 1
+
+            elif op == OP_GET_INDEX:
+                index = stack.pop()
+                array = stack[-1]
+                stack[-1] = array[check_index(
+                    array=array, index=index, token=tokens[ip - 1]
+                )]
+
+            elif op == OP_SET_INDEX:
+                value = stack.pop()
+                index = stack.pop()
+                array = stack[-1]
+                index = check_index(
+                    array=array, index=index, token=tokens[ip - 1]
+                )
+                check_element(array=array, value=value, token=tokens[ip - 1])
+                array[index] = value
+                stack[-1] = value
@@ -0,0 +1,48 @@
+import io
+import pathlib
+import sys
+import time
+from contextlib import redirect_stdout
+
+from lox import Lox
+from lox.lox_ import BACKENDS
+
+
+def run_benchmark(benchmark, backend):
+    """Returns the number of seconds it takes to run a benchmark"""
+    with open(benchmark, "r", encoding="utf-8") as f:
+        source = f.read()
+
+    captured_stdout = io.StringIO()
+    with redirect_stdout(captured_stdout):
+        start = time.perf_counter()
+        Lox(test=True, backend=backend).run(source=source)
+        elapsed = time.perf_counter() - start
+
+    # first line of every benchmark is its result, which should be the same
+    # no matter which backend ran it
+    result = captured_stdout.getvalue().split("\n")[0]
+    return elapsed, result
+
+
+def run_benchmarks(dir_, backends):
+    benchmarks = sorted(pathlib.Path(dir_).glob("*.lox"))
+
+    print(f"{'benchmark':<20}" + "".join(f"{b:>12}" for b in backends))
+    for benchmark in benchmarks:
+        times = []
+        results = set()
+        for backend in backends:
+            elapsed, result = run_benchmark(benchmark, backend)
+            times.append(elapsed)
+            results.add(result)
+
+        line = f"{benchmark.stem:<20}" + "".join(f"{t:>11.3f}s" for t in times)
+        if len(results) > 1:
+            line += f"  (results differ: {sorted(results)})"
+        print(line)
+
+
+if __name__ == "__main__":
+    # usage: python run_benchmarks.py [backend ...]
+    run_benchmarks("bench", backends=sys.argv[1:] or list(BACKENDS))
@@ -2,9 +2,12 @@ import io
 import logging
 import pathlib
 import re
+import sys
 from contextlib import redirect_stdout
 
 from lox import Lox
+from lox.incremental import IncrementalProgram, inline_caches
+from lox.shape import POLYMORPHIC_LIMIT
 
 
 TOKEN_REGEX = re.compile(r"Error.*")
@@ -14,8 +17,12 @@ OUTPUT = "output"
 TOKEN_ERROR = "token"
 RUNTIME_ERROR = "runtime"
 
+# times a rerun test runs its program, enough to fill an inline cache if
+# shapes from earlier runs were kept
+RERUNS = POLYMORPHIC_LIMIT + 1
 
-def run_test(test, verbose=True):
+
+def run_test(test, verbose=True, backend="tree", optimize=0):
     with open(test, "r", encoding="utf-8") as f:
         source = f.read()
 
@@ -47,7 +54,7 @@ def run_test(test, verbose=True):
     # actually run the thing
     captured_stdout = io.StringIO()
     with redirect_stdout(captured_stdout):
-        Lox(test=True).run(source=source)
+        Lox(test=True, backend=backend, optimize=optimize).run(source=source)
 
     # process + compare output to expected
     actual = captured_stdout.getvalue()[:-1]
@@ -71,17 +78,71 @@ def run_test(test, verbose=True):
         return 0
 
 
-def run_tests(dir_):
+def run_rerun_test(test, verbose=True, backend="tree", optimize=0):
+    """Runs a test's program again and again from one IncrementalProgram,
+    in a new interpreter each time, like a tool that runs a file whenever
+    it's edited
+
+    Every run should print the same thing, and leave the inline caches no
+    fuller than the first run did.
+    """
+    with open(test, "r", encoding="utf-8") as f:
+        source = f.read()
+
+    outputs = []
+    cached = []
+    with redirect_stdout(io.StringIO()):
+        lox = Lox(test=True, backend=backend, optimize=optimize)
+        program = IncrementalProgram(source=source, lox=lox)
+    for _ in range(RERUNS):
+        captured_stdout = io.StringIO()
+        with redirect_stdout(captured_stdout):
+            lox = Lox(test=True, backend=backend, optimize=optimize)
+            lox.run_program(program)
+        outputs.append(captured_stdout.getvalue())
+        cached.append(sum(
+            len(cache) for cache in inline_caches(program.statements)
+        ))
+
+    if outputs.count(outputs[0]) == RERUNS and max(cached) == cached[0]:
+        return 1
+    else:
+        print(f"{test} failed")
+        if verbose:
+            print(f"First run:\n{outputs[0]}\n")
+            print(f"Last run:\n{outputs[-1]}\n")
+            print(f"Shapes cached after each run: {cached}\n\n")
+        return 0
+
+
+def run_tests(dir_, backend="tree", optimize=0, rerun=False):
     passes = 0
     tests = list(pathlib.Path(dir_).glob("*/*.lox"))
     for test in tests:
         try:
-            passes += run_test(test, verbose=True)
+            passes += (run_rerun_test if rerun else run_test)(
+                test, verbose=True, backend=backend, optimize=optimize
+            )
         except Exception:
             print(logging.exception(f"\nException on {test}"))
 
-    print(f"{passes} / {len(tests)} tests passed")
+    label = f"{backend}, -O{optimize}" if optimize else backend
+    label += ", rerun" if rerun else ""
+    print(f"{passes} / {len(tests)} tests passed ({label})")
 
 
 if __name__ == "__main__":
-    run_tests("test")
+    # usage: python run_tests.py [-OLEVEL] [--rerun] [backend ...]
+    optimize = 0
+    rerun = False
+    backends = []
+    for arg in sys.argv[1:]:
+        if arg.startswith("-O"):
+            optimize = int(arg[2:])
+        elif arg == "--rerun":
+            rerun = True
+        else:
+            backends.append(arg)
+
+    for backend in backends or ["tree"]:
+        run_tests("test", backend=backend, optimize=optimize, rerun=rerun)
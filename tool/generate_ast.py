@@ -0,0 +1,142 @@
+EXPRESSIONS = [
+    ("Array", ["values"]),
+    ("Assign", ["name", "value"]),
+    ("Binary", ["left", "operator", "right"]),
+    ("Call", ["callee", "paren", "expressions"]),
+    ("Get", ["object", "name"]),
+    ("Grouping", ["expression"]),
+    ("Index", ["object", "bracket", "index"]),
+    ("Literal", ["value"]),
+    ("Logical", ["left", "operator", "right"]),
+    ("Set", ["object", "name", "value"]),
+    ("SetIndex", ["object", "bracket", "index", "value"]),
+    ("Super", ["keyword", "method"]),
+    ("This", ["keyword"]),
+    ("Unary", ["operator", "right"]),
+    ("Variable", ["name"]),
+]
+
+STATEMENTS = [
+    ("Block", ["statements"]),
+    ("Class", ["name", "superclass", "methods"]),
+    ("Expression", ["expression"]),
+    ("Function", ["name", "params", "body"]),
+    ("If", ["condition", "then_branch", "else_branch"]),
+    ("Print", ["expression"]),
+    ("Return", ["keyword", "value"]),
+    ("Var", ["name", "initializer"]),
+    ("While", ["condition", "body"]),
+]
+
+# expressions that refer to a variable - the Resolver stores the depth of the
+# environment a local is defined in and its slot there on the node. Both stay
+# None for globals
+RESOLVED = {"Assign", "Super", "This", "Variable"}
+
+# expressions that access a property - they keep an inline cache of where the
+# property is for the shapes of instances they've seen, see lox/shape.py
+CACHED = {"Get", "Set"}
+
+# operators the TypeChecker can prove get operands of the right types, in
+# which case it sets unchecked so the operation skips checking them
+CHECKED = {"Binary", "Unary"}
+
+# expressions the Resolver can find in tail position - a call that's the
+# value of a return sets tail, so it's run after the function returns
+TAILS = {"Call"}
+
+# expressions the AdaptiveInterpreter specializes - while they warm up they
+# count how many times they've run, and keep the specialization the types of
+# operands they've seen so far would get
+WARMED = {"Binary"}
+
+# statements the TieredInterpreter profiles - they count how many times
+# they've run, and keep the code they're compiled into once they're hot
+# along with the compiler it was compiled by, since it uses that compiler's
+# globals
+PROFILED = {"Function", "While"}
+
+BASE = '''class {base}:
+    """Base class of every {what} node
+
+    Nodes use __slots__ to keep them small, and compare and hash by identity so
+    two nodes that look the same are still different nodes. kind is unique to
+    each node class, across expressions and statements.
+    """
+    __slots__ = ()
+    fields = ()
+
+    def __repr__(self):
+        values = ", ".join(
+            f"{{f}}={{getattr(self, f)!r}}" for f in self.fields
+        )
+        return f"{{self.__class__.__name__}}({{values}})"
+'''
+
+
+def tuple_of_strings(strings):
+    """Source code for a tuple of strings, with double quotes"""
+    if len(strings) == 1:
+        return f'("{strings[0]}",)'
+    return "(" + ", ".join(f'"{s}"' for s in strings) + ")"
+
+
+def class_attribute(name, strings):
+    """Line of source code setting a class attribute to a tuple of strings,
+    wrapped if it would be too long
+    """
+    line = f"    {name} = {tuple_of_strings(strings)}\n"
+    if len(line) <= 80:
+        return line
+    items = ", ".join(f'"{s}"' for s in strings)
+    return f"    {name} = (\n        {items},\n    )\n"
+
+
+def define_node(f, base, name, fields, kind):
+    slots = fields + (["depth", "slot"] if name in RESOLVED else [])
+    slots += ["cache"] if name in CACHED else []
+    slots += ["unchecked"] if name in CHECKED else []
+    slots += ["tail"] if name in TAILS else []
+    slots += ["runs", "specialization"] if name in WARMED else []
+    slots += ["runs", "compiler", "compiled"] if name in PROFILED else []
+
+    f.write(f"\n\nclass {name}({base}):\n")
+    f.write(class_attribute("__slots__", slots))
+    f.write(class_attribute("fields", fields))
+    f.write(f"    kind = {kind}\n\n")
+
+    f.write(f"    def __init__(self, {', '.join(fields)}):\n")
+    for field in fields:
+        f.write(f"        self.{field} = {field}\n")
+    if name in RESOLVED:
+        f.write("        self.depth = None\n")
+        f.write("        self.slot = None\n")
+    if name in CACHED:
+        f.write("        self.cache = {}\n")
+    if name in CHECKED:
+        f.write("        self.unchecked = False\n")
+    if name in TAILS:
+        f.write("        self.tail = False\n")
+    if name in WARMED:
+        f.write("        self.runs = 0\n")
+        f.write("        self.specialization = None\n")
+    if name in PROFILED:
+        f.write("        self.runs = 0\n")
+        f.write("        self.compiler = None\n")
+        f.write("        self.compiled = None\n")
+
+
+def define_ast(path, base, what, nodes, first_kind):
+    with open(path, "w+") as f:
+        f.write("# Auto-generated by tool/generate_ast.py\n\n\n")
+        f.write(BASE.format(base=base, what=what))
+
+        for kind, (name, fields) in enumerate(nodes, start=first_kind):
+            define_node(f, base, name, fields, kind)
+
+
+if __name__ == "__main__":
+    define_ast("lox/expr.py", "Expr", "expression", EXPRESSIONS, 0)
+    define_ast(
+        "lox/stmt.py", "Stmt", "statement", STATEMENTS, len(EXPRESSIONS)
+    )